@@ -9,28 +9,44 @@ login_manager = LoginManager()
 
 def create_app():
     app = Flask(__name__)
+    app.config.from_object('config.Config')
     app.config['SECRET_KEY'] = 'PASSWORD'  # Change this in production
     
-    # Use absolute path to ensure SQLite can find the database location
-    basedir = os.path.abspath(os.path.dirname(__file__))
-    db_path = os.path.join(os.path.dirname(basedir), 'instance', 'collections.db')
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    # The database comes from config.Config: DATABASE_URL if set, else the
+    # SQLite file in instance/ (always an absolute path)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
     # Initialize extensions with the app
     db.init_app(app)
+
+    # WAL, pragmas and a connection pool so data entry and exports can overlap
+    from app.utils.sqlite_tuning import init_sqlite_tuning
+    init_sqlite_tuning(app)
+
+    # Per-request query counts, slow query log and debug headers
+    from app.utils.query_stats import init_query_stats
+    init_query_stats(app)
     login_manager.login_view = 'auth.login'
     login_manager.init_app(app)
 
+    # Worker pool for background exports
+    from app.utils.export_jobs import init_export_jobs
+    init_export_jobs(app)
+
+    # Worker pool for proof thumbnails
+    from app.utils.previews import init_preview_workers
+    init_preview_workers(app)
+
     from app.models import User
     @login_manager.user_loader
     def load_user(user_id):
         return User.query.get(int(user_id))
 
     # Register blueprints
-    from app.routes import auth, team_leader, data_analyst
+    from app.routes import auth, team_leader, data_analyst, api
     app.register_blueprint(auth.bp)
     app.register_blueprint(team_leader.bp)
     app.register_blueprint(data_analyst.bp)
+    app.register_blueprint(api.bp)
 
     return app
\ No newline at end of file
@@ -1,9 +1,38 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SelectField, IntegerField, FloatField, DateField, TextAreaField, BooleanField, SubmitField, RadioField
-from wtforms.validators import DataRequired, Length, NumberRange, Optional
-from flask_wtf.file import FileField, FileAllowed, MultipleFileField
+from wtforms import StringField, PasswordField, SelectField, IntegerField, FloatField, DateField, TextAreaField, BooleanField, SubmitField, RadioField, HiddenField
+from wtforms.validators import DataRequired, Length, NumberRange, Optional, ValidationError
+from flask_wtf.file import FileField, FileAllowed, FileRequired, MultipleFileField
 from app.models import PaymentRecord  # Add this import
 from sqlalchemy.orm import joinedload  # Add this import
+from app.utils.roster import UnknownOperator, normalize_operator
+from app.utils.export_helpers import EXPORT_FORMATS
+
+# Campaigns payments can be entered for
+CAMPAIGN_CHOICES = [
+    ('LANDERS', 'LANDERS'),
+    ('MPL', 'MPL'),
+    ('MAYA CREDIT', 'MAYA CREDIT'),
+    ('TALA', 'TALA'),
+    ('OLP', 'OLP'),
+    ('KVIKU', 'KVIKU'),
+    ('SKYRO', 'SKYRO')
+]
+
+PROOF_TYPE_CHOICES = [
+    ('receipt', 'Payment Receipt'),
+    ('screenshot', 'Screenshot'),
+    ('email', 'Email Confirmation'),
+    ('message', 'Message/SMS'),
+    ('other', 'Other')
+]
+
+DISPUTE_REASON_CHOICES = [
+    ('wrong_operator', 'Wrong Operator'),
+    ('wrong_amount', 'Wrong Amount'),
+    ('wrong_date', 'Wrong Date'),
+    ('duplicate_entry', 'Duplicate Entry'),
+    ('other', 'Other'),
+]
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(max=80)])
@@ -12,15 +41,7 @@ class LoginForm(FlaskForm):
     submit = SubmitField('Login')
 
 class PaymentEntryForm(FlaskForm):
-    campaign = SelectField('Campaign', choices=[
-        ('LANDERS', 'LANDERS'),
-        ('MPL', 'MPL'),
-        ('MAYA CREDIT', 'MAYA CREDIT'),
-        ('TALA', 'TALA'),
-        ('OLP', 'OLP'),
-        ('KVIKU', 'KVIKU'),
-        ('SKYRO', 'SKYRO')
-    ], validators=[DataRequired()])
+    campaign = SelectField('Campaign', choices=CAMPAIGN_CHOICES, validators=[DataRequired()])
     dpd = IntegerField('DPD (Days Past Due)', validators=[DataRequired()])
     loan_id = StringField('Loan ID', validators=[DataRequired()])
     amount = FloatField('Amount', validators=[DataRequired()])
@@ -34,26 +55,57 @@ class PaymentEntryForm(FlaskForm):
         FileAllowed(['jpg', 'jpeg', 'png', 'pdf'], 'Only images (jpg, jpeg, png) and PDF files allowed!')
     ])
     
-    proof_types = SelectField('Proof Type', choices=[
-        ('receipt', 'Payment Receipt'),
-        ('screenshot', 'Screenshot'),
-        ('email', 'Email Confirmation'),
-        ('message', 'Message/SMS'),
-        ('other', 'Other')
-    ])
+    proof_types = SelectField('Proof Type', choices=PROOF_TYPE_CHOICES)
     
     submit = SubmitField('Submit')
+    
+    def validate_operator_name(self, field):
+        # Store the roster code whatever name the operator was entered under
+        try:
+            field.data = normalize_operator(field.data)
+        except UnknownOperator as e:
+            raise ValidationError(str(e))
+
+class PaymentImportForm(FlaskForm):
+    import_file = FileField('Payment File', validators=[
+        FileRequired(message='Choose a CSV or Excel file to import'),
+        FileAllowed(['csv', 'xlsx'], 'Only CSV and Excel (xlsx) files allowed!')
+    ])
+    submit = SubmitField('Import Payments')
+
+class AttachProofsForm(FlaskForm):
+    loan_id = StringField('Loan ID', validators=[Optional(), Length(max=100)])
+    proof_images = MultipleFileField('Proof Files', validators=[
+        DataRequired(message='At least one proof file is required'),
+        FileAllowed(['jpg', 'jpeg', 'png', 'pdf'], 'Only images (jpg, jpeg, png) and PDF files allowed!')
+    ])
+    proof_types = SelectField('Proof Type', choices=PROOF_TYPE_CHOICES)
+    submit = SubmitField('Attach Proofs')
 
 class DisputeForm(FlaskForm):
-    reason = SelectField('Reason for Dispute', choices=[
-        ('wrong_operator', 'Wrong Operator'),
-        ('wrong_amount', 'Wrong Amount'),
-        ('wrong_date', 'Wrong Date'),
-        ('duplicate_entry', 'Duplicate Entry'),
-        ('other', 'Other'),
-    ], validators=[DataRequired()])
-    corrected_details = TextAreaField('Corrected Details', validators=[Optional(), Length(max=500)])
+    entry_id = HiddenField('Record', validators=[DataRequired()])
+    reason = SelectField('Reason for Dispute', choices=DISPUTE_REASON_CHOICES, validators=[DataRequired()])
+    # Structured corrections, applied to the record when a Data Analyst approves
+    corrected_operator = StringField('Correct Operator', validators=[Optional(), Length(max=100)])
+    corrected_amount = FloatField('Correct Amount', validators=[Optional(), NumberRange(min=0.01)])
+    corrected_date_paid = DateField('Correct Date Paid', validators=[Optional()])
+    mark_duplicate = BooleanField('This record is a duplicate entry')
+    # No Optional() here: it would stop validate_corrected_details from running when blank
+    corrected_details = TextAreaField('Corrected Details', validators=[Length(max=500)])
     submit = SubmitField('Submit Dispute')
+    
+    def validate_corrected_operator(self, field):
+        if field.data:
+            try:
+                field.data = normalize_operator(field.data)
+            except UnknownOperator as e:
+                raise ValidationError(str(e))
+    
+    def validate_corrected_details(self, field):
+        has_corrections = (self.corrected_operator.data or self.corrected_amount.data is not None
+                           or self.corrected_date_paid.data or self.mark_duplicate.data)
+        if not has_corrections and not (field.data or '').strip():
+            raise ValidationError('Enter the correct values or describe the correction')
 
 class DisputeValidationForm(FlaskForm):
     dispute_id = IntegerField('Dispute ID', validators=[DataRequired()])
@@ -78,7 +130,12 @@ class ExportForm(FlaskForm):
     campaign = SelectField('Campaign', choices=[], validators=[Optional()])
     start_date = DateField('Start Date', format='%Y-%m-%d', validators=[Optional()])
     end_date = DateField('End Date', format='%Y-%m-%d', validators=[Optional()])
+    export_format = RadioField('Format', choices=list(EXPORT_FORMATS.items()), default='xlsx',
+                               validators=[DataRequired()])
     include_headers = BooleanField('Include Headers', default=True)
+    # Incremental export: only records created and disputes approved since the feed's last export
+    incremental = BooleanField('Only changes since the last export of this feed')
+    feed = StringField('Feed', validators=[Optional(), Length(max=100)])
     submit = SubmitField('Export Data')
 
 class PaymentRecordSearchForm(FlaskForm):
@@ -1,6 +1,7 @@
 from app import db
 from flask_login import UserMixin
 from datetime import datetime
+from sqlalchemy import func, select
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -10,16 +11,24 @@ class User(UserMixin, db.Model):
 
 class PaymentRecord(db.Model):
     __tablename__ = 'payment_record'
+    __table_args__ = (
+        # Listings filter by campaign and sort newest first
+        db.Index('ix_payment_record_campaign_created_at', 'campaign', 'created_at'),
+        # Exports and date filters narrow by campaign and date paid
+        db.Index('ix_payment_record_campaign_date_paid', 'campaign', 'date_paid'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     campaign = db.Column(db.String(50), nullable=False)
     dpd = db.Column(db.Integer, nullable=False)
-    loan_id = db.Column(db.String(100), nullable=False)
+    loan_id = db.Column(db.String(100), nullable=False, index=True)
     amount = db.Column(db.Float, nullable=False)
-    date_paid = db.Column(db.Date, nullable=False)
+    date_paid = db.Column(db.Date, nullable=False, index=True)
     operator_name = db.Column(db.String(100), nullable=False)
     customer_name = db.Column(db.String(100), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Set by an approved duplicate_entry dispute; left out of totals and campaign exports
+    is_duplicate = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     
     # Define relationship using back_populates instead of backref
     proofs = db.relationship('PaymentProof', back_populates='payment', lazy=True, cascade='all, delete-orphan')
@@ -29,17 +38,40 @@ class PaymentProof(db.Model):
     __tablename__ = 'payment_proof'
     
     id = db.Column(db.Integer, primary_key=True)
-    payment_id = db.Column(db.Integer, db.ForeignKey('payment_record.id', ondelete='CASCADE'), nullable=False)
+    payment_id = db.Column(db.Integer, db.ForeignKey('payment_record.id', ondelete='CASCADE'), nullable=False, index=True)
     file_path = db.Column(db.String(255), nullable=False)
     file_type = db.Column(db.String(50), nullable=False)  # 'receipt', 'email', 'screenshot', etc.
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 of the stored file, shared by duplicates
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Define the relationship from this side using back_populates
     payment = db.relationship('PaymentRecord', back_populates='proofs')
 
+# Number of proofs per record, loaded only when asked for with undefer()
+PaymentRecord.proof_count = db.column_property(
+    select(func.count(PaymentProof.id))
+    .where(PaymentProof.payment_id == PaymentRecord.id)
+    .correlate_except(PaymentProof)
+    .scalar_subquery(),
+    deferred=True
+)
+
 class Dispute(db.Model):
+    __table_args__ = (
+        # TL queue: pending disputes newest first
+        db.Index('ix_dispute_status_created_at', 'status', 'created_at'),
+        # DA queue: pending_da_review disputes by TL validation date
+        db.Index('ix_dispute_status_validated_at', 'status', 'validated_at'),
+        # The other sortable queue columns
+        db.Index('ix_dispute_status_reason', 'status', 'reason'),
+        db.Index('ix_dispute_status_created_by', 'status', 'created_by'),
+        db.Index('ix_dispute_status_validated_by', 'status', 'validated_by'),
+        # Incremental dispute exports: disputes approved since the last one
+        db.Index('ix_dispute_status_da_verified_at', 'status', 'da_verified_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
-    entry_id = db.Column(db.Integer, db.ForeignKey('payment_record.id'), nullable=False)
+    entry_id = db.Column(db.Integer, db.ForeignKey('payment_record.id'), nullable=False, index=True)
     reason = db.Column(db.String(50), nullable=False)
     corrected_details = db.Column(db.Text, nullable=False)
     # Update status options to include pending_da_review
@@ -53,6 +85,35 @@ class Dispute(db.Model):
     da_verified_by = db.Column(db.String(100))
     da_verified_at = db.Column(db.DateTime)
     da_comments = db.Column(db.Text)
+    # Structured corrections, written to the payment record when a Data Analyst approves
+    corrected_operator = db.Column(db.String(100))
+    corrected_amount = db.Column(db.Float)
+    corrected_date_paid = db.Column(db.Date)
+    mark_duplicate = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    applied_at = db.Column(db.DateTime)
+    
+    @property
+    def has_corrections(self):
+        return bool(self.corrected_operator or self.corrected_amount is not None
+                    or self.corrected_date_paid or self.mark_duplicate)
+
+class PaymentRecordVersion(db.Model):
+    """The values a payment record had before an approved dispute corrected it"""
+    __tablename__ = 'payment_record_version'
+    __table_args__ = (
+        db.UniqueConstraint('payment_id', 'version', name='uq_payment_record_version'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    payment_id = db.Column(db.Integer, db.ForeignKey('payment_record.id', ondelete='CASCADE'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)  # 1 is the record as originally entered
+    dispute_id = db.Column(db.Integer, db.ForeignKey('dispute.id'), nullable=False, index=True)
+    operator_name = db.Column(db.String(100), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    date_paid = db.Column(db.Date, nullable=False)
+    is_duplicate = db.Column(db.Boolean, nullable=False, default=False)
+    replaced_by = db.Column(db.String(100), nullable=False)
+    replaced_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class ExportHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -63,4 +124,97 @@ class ExportHistory(db.Model):
     record_count = db.Column(db.Integer, nullable=False)
     filename = db.Column(db.String(200), nullable=False)
     created_by = db.Column(db.String(100), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Background job tracking
+    status = db.Column(db.String(20), default='completed')  # queued, running, completed, failed
+    progress = db.Column(db.Integer, default=100)  # Percent complete
+    total_rows = db.Column(db.Integer)
+    error_message = db.Column(db.Text)
+    completed_at = db.Column(db.DateTime)
+    # Export cache key, together with the type, campaign and dates (see app/utils/export_cache.py)
+    export_format = db.Column(db.String(10), default='xlsx')
+    include_headers = db.Column(db.Boolean, default=True)
+    data_version = db.Column(db.String(50))  # data the file was built from; NULL = never reused
+    # Incremental exports: the feed's name and the created_at/da_verified_at window exported
+    feed = db.Column(db.String(100))
+    delta_since = db.Column(db.DateTime)  # NULL for a feed's first export
+    delta_until = db.Column(db.DateTime)
+
+class StatsCounter(db.Model):
+    """Dashboard counters kept up to date by database triggers (see app/utils/stats.py)"""
+    __tablename__ = 'stats_counter'
+    
+    name = db.Column(db.String(50), primary_key=True)  # e.g. 'total_records', 'records_on:2025-08-24'
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class DataVersion(db.Model):
+    """Write counter per table, bumped by database triggers (see app/utils/export_cache.py)"""
+    __tablename__ = 'data_version'
+    
+    name = db.Column(db.String(50), primary_key=True)  # table name
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class PaymentRollup(db.Model):
+    """Daily collection totals per campaign, operator and DPD bucket, kept up to date by triggers (see app/utils/rollups.py)"""
+    __tablename__ = 'payment_rollup'
+    # Summaries read a date paid range, so on SQLite the rows are stored
+    # clustered by the primary key, which starts with date_paid
+    __table_args__ = {'sqlite_with_rowid': False}
+    
+    date_paid = db.Column(db.Date, primary_key=True)
+    campaign = db.Column(db.String(50), primary_key=True)
+    operator_name = db.Column(db.String(100), primary_key=True)
+    dpd_bucket = db.Column(db.String(10), primary_key=True)  # '0', '1-30', ..., '180+'
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_sum = db.Column(db.Float, nullable=False, default=0)
+    amount_min = db.Column(db.Float)
+    amount_max = db.Column(db.Float)
+
+class DuplicateCandidate(db.Model):
+    """A pair of payment records the duplicate scan flagged (see app/utils/duplicates.py)"""
+    __tablename__ = 'duplicate_candidate'
+    __table_args__ = (
+        # One candidate per pair of records, under the strongest rule that matched
+        db.UniqueConstraint('entry_id', 'duplicate_of_id', name='uq_duplicate_candidate_pair'),
+        # TL dispute page: open candidates newest first
+        db.Index('ix_duplicate_candidate_status_detected_at', 'status', 'detected_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    entry_id = db.Column(db.Integer, db.ForeignKey('payment_record.id', ondelete='CASCADE'), nullable=False)  # newer record
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey('payment_record.id', ondelete='CASCADE'), nullable=False, index=True)
+    rule = db.Column(db.String(20), nullable=False)  # 'loan_amount', 'proof_hash' or 'customer_name'
+    status = db.Column(db.String(20), nullable=False, default='open')  # open, disputed, dismissed
+    detected_at = db.Column(db.DateTime, default=datetime.utcnow)
+    resolved_by = db.Column(db.String(100))
+    resolved_at = db.Column(db.DateTime)
+    
+    entry = db.relationship('PaymentRecord', foreign_keys=[entry_id])
+    duplicate_of = db.relationship('PaymentRecord', foreign_keys=[duplicate_of_id])
+
+class DuplicateScan(db.Model):
+    """One run of the duplicate scan; the latest run is the watermark for the next"""
+    __tablename__ = 'duplicate_scan'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    last_record_id = db.Column(db.Integer, nullable=False, default=0)  # highest payment_record.id scanned
+    last_proof_id = db.Column(db.Integer, nullable=False, default=0)  # highest payment_proof.id scanned
+    records_scanned = db.Column(db.Integer, nullable=False, default=0)
+    candidates_found = db.Column(db.Integer, nullable=False, default=0)
+
+class Operator(db.Model):
+    """An operator on the monthly FTE roster (see app/utils/roster.py and import_roster.py)"""
+    __tablename__ = 'operator'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    operator = db.Column(db.String(100), unique=True, nullable=False)  # code entered as payment_record.operator_name
+    employee_id = db.Column(db.String(50))
+    name = db.Column(db.String(200))
+    full_name = db.Column(db.String(200))
+    crm_name = db.Column(db.String(200))
+    supervisor_group = db.Column(db.String(50), index=True)  # GROUP column of the roster, e.g. 'SPV_5'
+    status = db.Column(db.String(20), nullable=False, default='ACTIVE')  # ACTIVE or INACTIVE
+    roster_month = db.Column(db.String(7))  # YYYY-MM of the roster file it was last seen in
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
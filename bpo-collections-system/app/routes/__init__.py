@@ -2,4 +2,4 @@ from flask import Blueprint
 
 routes_bp = Blueprint('routes', __name__)
 
-from . import auth, team_leader, data_analyst
\ No newline at end of file
+from . import auth, team_leader, data_analyst, api
\ No newline at end of file
@@ -0,0 +1,427 @@
+import gzip
+import hashlib
+import json
+import os
+import zlib
+from datetime import date, datetime
+from functools import wraps
+from flask import Blueprint, Response, abort, current_app, request, stream_with_context, url_for
+from flask_login import current_user
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+from werkzeug.security import check_password_hash
+from app import db, login_manager
+from app.forms import DisputeForm, PROOF_TYPE_CHOICES
+from app.models import Dispute, PaymentProof, PaymentRecord, User
+from app.utils.cache import TTLCache
+from app.utils.dispute_queues import invalidate_queue_counts
+from app.utils.dispute_workflow import TransitionError, apply_corrections, correction_summary, transition_dispute
+from app.utils.import_helpers import RowError, attach_proofs_by_loan_id, validate_row
+from app.utils.pagination import keyset_paginate
+from app.utils.query_stats import allow_queries
+
+# Versioned JSON API for integrations (dialer, CRM). Clients send HTTP Basic
+# credentials of an app user; the user's role decides what they may do.
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Fields clients can ask for with ?fields=a,b,c
+PAYMENT_FIELDS = ('id', 'campaign', 'dpd', 'loan_id', 'amount', 'date_paid', 'operator_name', 'customer_name',
+                  'is_duplicate', 'created_at')
+DISPUTE_FIELDS = ('id', 'entry_id', 'reason', 'corrected_details', 'status', 'created_by', 'created_at',
+                  'validated_by', 'validated_at', 'validation_comments', 'da_verified_by', 'da_verified_at',
+                  'da_comments', 'corrected_operator', 'corrected_amount', 'corrected_date_paid', 'mark_duplicate',
+                  'applied_at')
+PROOF_FIELDS = ('id', 'payment_id', 'file_type', 'content_hash', 'uploaded_at')
+
+VALID_PROOF_TYPES = {value for value, _ in PROOF_TYPE_CHOICES}
+PROOF_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.pdf'}
+
+NDJSON_CHUNK = 1000  # rows read per query while streaming
+GZIP_MIN_SIZE = 1024  # smaller JSON bodies are sent uncompressed
+
+# Checked Basic credentials, so batch clients don't pay for a password hash on
+# every call: {hash of the credentials: (user id, password hash they matched)}
+_credential_cache = TTLCache(ttl=300)
+
+@login_manager.request_loader
+def _load_api_user(req):
+    auth = req.authorization
+    if req.blueprint != 'api' or not auth or not auth.username:
+        return None
+
+    key = hashlib.sha256(f'{auth.username}\0{auth.password}'.encode()).hexdigest()
+    cached = _credential_cache.get(key)
+    if cached is not None:
+        # Only while the user still exists with the password they were checked
+        # against, so a deleted user or changed password stops working at once
+        user_id, password_hash = cached
+        user = User.query.get(user_id)
+        if user and user.password == password_hash:
+            return user
+
+    user = User.query.filter_by(username=auth.username).first()
+    if not user or not check_password_hash(user.password, auth.password or ''):
+        return None
+    _credential_cache.set(key, (user.id, user.password))
+    return user
+
+def _error(message, status, **extra):
+    return _json_response({'success': False, 'message': message, **extra}, status)
+
+@bp.errorhandler(HTTPException)
+def _http_error(e):
+    return _error(e.description, e.code)
+
+def api_login_required(*roles):
+    """Like login_required, but answers 401/403 with JSON instead of redirecting to the login page"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if not current_user.is_authenticated:
+                response = _error('Authentication required', 401)
+                response.headers['WWW-Authenticate'] = 'Basic realm="HTSS Payments API"'
+                return response
+            if roles and current_user.role not in roles:
+                return _error('Access denied', 403)
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
+
+# Serialization ---------------------------------------------------------------
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _serialize(row, fields):
+    return {field: _json_value(getattr(row, field)) for field in fields}
+
+def _accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+def _json_response(payload, status=200):
+    """JSON response, gzipped when the client accepts it and the body is worth compressing"""
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    response = Response(body, status=status, mimetype='application/json')
+    if len(body) >= GZIP_MIN_SIZE and _accepts_gzip():
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _wants_ndjson():
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+def _ndjson_response(query, model, fields):
+    """
+    Stream every row of query as newline-delimited JSON, in id order.
+
+    Rows are read NDJSON_CHUNK at a time by id range, so memory stays flat
+    and no read transaction is held open between chunks.
+    """
+    compress = _accepts_gzip()
+
+    def generate():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+        last_id = 0
+        while True:
+            rows = query.filter(model.id > last_id).order_by(model.id).limit(NDJSON_CHUNK).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            chunk = ''.join(json.dumps(_serialize(row, fields), separators=(',', ':')) + '\n' for row in rows).encode()
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+            db.session.commit()  # end the read transaction between chunks
+        if compressor:
+            yield compressor.flush()
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Request parsing -------------------------------------------------------------
+
+def _fields(allowed):
+    """Fields requested with ?fields=, all of them by default"""
+    requested = request.args.get('fields')
+    if not requested:
+        return list(allowed)
+    fields = [field.strip() for field in requested.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        abort(400, description=f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(allowed)}')
+    return fields
+
+def _projected_query(model, fields):
+    """Query only the requested columns, plus the keys pagination needs"""
+    names = list(dict.fromkeys(list(fields) + ['id', 'created_at']))
+    return db.session.query(*[getattr(model, name) for name in names])
+
+def _date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        abort(400, description=f'{name} must be a YYYY-MM-DD date')
+
+def _page_size():
+    per_page = request.args.get('limit', current_app.config.get('API_PAGE_SIZE', 100), type=int)
+    return max(1, min(per_page, current_app.config.get('API_MAX_PAGE_SIZE', 1000)))
+
+def _batch_items(key):
+    """The list under key in the JSON body, checked against API_MAX_BATCH"""
+    payload = request.get_json(silent=True)
+    items = payload.get(key) if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        abort(400, description=f'Send a JSON object with a non-empty "{key}" list')
+    limit = current_app.config.get('API_MAX_BATCH', 1000)
+    if len(items) > limit:
+        abort(413, description=f'At most {limit} {key} per call')
+    return items
+
+def _id_list(values, label):
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        abort(400, description=f'{label} must be whole numbers')
+
+def _list_response(query, model, fields):
+    """A keyset page of query (newest first), or the whole result as NDJSON"""
+    if _wants_ndjson():
+        return _ndjson_response(query, model, fields)
+
+    pagination = keyset_paginate(query, model, cursor=request.args.get('cursor'), per_page=_page_size())
+    return _json_response({
+        'success': True,
+        'items': [_serialize(row, fields) for row in pagination.items],
+        'next_cursor': pagination.next_cursor,
+        'prev_cursor': pagination.prev_cursor,
+    })
+
+# Payments --------------------------------------------------------------------
+
+@bp.route('/payments')
+@api_login_required('team_leader', 'data_analyst')
+def list_payments():
+    fields = _fields(PAYMENT_FIELDS)
+    query = _projected_query(PaymentRecord, fields)
+
+    for name in ('campaign', 'loan_id', 'operator_name'):
+        if request.args.get(name):
+            query = query.filter(getattr(PaymentRecord, name) == request.args[name])
+    date_from, date_to = _date_arg('date_from'), _date_arg('date_to')
+    if date_from:
+        query = query.filter(PaymentRecord.date_paid >= date_from)
+    if date_to:
+        query = query.filter(PaymentRecord.date_paid <= date_to)
+
+    return _list_response(query, PaymentRecord, fields)
+
+@bp.route('/payments/batch', methods=['POST'])
+@api_login_required('team_leader')
+def create_payments():
+    """Create many payments in one transaction; any invalid item rejects the whole batch"""
+    records = []
+    errors = []
+    for index, item in enumerate(_batch_items('payments')):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'message': 'Expected an object'})
+            continue
+        try:
+            records.append(PaymentRecord(**validate_row(item)))
+        except RowError as e:
+            errors.append({'index': index, 'message': str(e)})
+
+    if errors:
+        return _error('No payments were created; fix the listed items and send the batch again', 422, errors=errors)
+
+    # One INSERT per record, to get back the ids
+    allow_queries(len(records))
+    db.session.add_all(records)
+    db.session.flush()
+    ids = [record.id for record in records]
+    db.session.commit()
+    return _json_response({'success': True, 'created': len(ids), 'ids': ids}, 201)
+
+# Disputes --------------------------------------------------------------------
+
+@bp.route('/disputes')
+@api_login_required('team_leader', 'data_analyst')
+def list_disputes():
+    fields = _fields(DISPUTE_FIELDS)
+    query = _projected_query(Dispute, fields)
+
+    if request.args.get('status'):
+        query = query.filter(Dispute.status == request.args['status'])
+    if request.args.get('entry_id'):
+        query = query.filter(Dispute.entry_id == request.args.get('entry_id', type=int))
+
+    return _list_response(query, Dispute, fields)
+
+def _dispute_form(item):
+    """A DisputeForm over one JSON item, so the API checks disputes like the pages do"""
+    formdata = MultiDict({
+        key: 'y' if value is True else str(value)
+        for key, value in item.items() if value is not None and value is not False
+    })
+    return DisputeForm(formdata=formdata, meta={'csrf': False})
+
+@bp.route('/disputes/batch', methods=['POST'])
+@api_login_required('team_leader')
+def create_disputes():
+    """Raise many disputes in one transaction; any invalid item rejects the whole batch"""
+    items = _batch_items('disputes')
+    entry_ids = {item.get('entry_id') for item in items if isinstance(item, dict)}
+    existing = {row.id for row in db.session.query(PaymentRecord.id).filter(
+        PaymentRecord.id.in_([i for i in entry_ids if isinstance(i, int)])
+    )}
+
+    disputes = []
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'message': 'Expected an object'})
+            continue
+        form = _dispute_form(item)
+        if item.get('entry_id') not in existing:
+            errors.append({'index': index, 'message': f'Payment record {item.get("entry_id")} not found'})
+        elif not form.validate():
+            field, messages = next(iter(form.errors.items()))
+            errors.append({'index': index, 'message': f'{field}: {messages[0]}'})
+        else:
+            dispute = Dispute(
+                entry_id=item['entry_id'],
+                reason=form.reason.data,
+                corrected_operator=form.corrected_operator.data or None,
+                corrected_amount=form.corrected_amount.data,
+                corrected_date_paid=form.corrected_date_paid.data,
+                mark_duplicate=form.mark_duplicate.data,
+                status='pending',
+                created_by=current_user.username
+            )
+            dispute.corrected_details = (form.corrected_details.data or '').strip() or correction_summary(dispute)
+            disputes.append(dispute)
+
+    if errors:
+        return _error('No disputes were created; fix the listed items and send the batch again', 422, errors=errors)
+
+    allow_queries(len(disputes))
+    db.session.add_all(disputes)
+    db.session.flush()
+    ids = [dispute.id for dispute in disputes]
+    db.session.commit()
+    invalidate_queue_counts()
+    return _json_response({'success': True, 'created': len(ids), 'ids': ids}, 201)
+
+@bp.route('/disputes/transitions', methods=['POST'])
+@api_login_required('team_leader', 'data_analyst')
+def transition_disputes():
+    """
+    Approve or reject many disputes in one transaction. Team Leaders act on
+    pending disputes, Data Analysts on pending_da_review ones; if any item
+    can't be applied, nothing is changed.
+    """
+    items = _batch_items('transitions')
+    if not all(isinstance(item, dict) for item in items):
+        abort(400, description='Each transition must be an object with id and action')
+    ids = _id_list([item.get('id') for item in items], 'Dispute ids')
+    disputes = {dispute.id: dispute for dispute in Dispute.query.filter(Dispute.id.in_(ids))}
+
+    errors = []
+    seen = set()
+    for index, (dispute_id, item) in enumerate(zip(ids, items)):
+        dispute = disputes.get(dispute_id)
+        if dispute is None:
+            errors.append({'index': index, 'message': f'Dispute {dispute_id} not found'})
+            continue
+        if dispute_id in seen:
+            errors.append({'index': index, 'message': f'Dispute {dispute_id} is listed twice'})
+            continue
+        seen.add(dispute_id)
+        try:
+            transition_dispute(dispute, current_user.role, item.get('action'), current_user.username,
+                               str(item.get('comments') or ''))
+        except TransitionError as e:
+            errors.append({'index': index, 'message': str(e)})
+
+    if errors:
+        db.session.rollback()
+        return _error('No disputes were changed; fix the listed items and send the batch again', 422, errors=errors)
+
+    # Corrections of finally approved disputes go to their records in the same transaction
+    apply_corrections([dispute for dispute in disputes.values() if dispute.status == 'approved'],
+                      current_user.username)
+    # Read before the commit expires them, which would reload each dispute
+    statuses = [{'id': dispute_id, 'status': disputes[dispute_id].status} for dispute_id in ids]
+    db.session.commit()
+    return _json_response({
+        'success': True,
+        'updated': len(ids),
+        'disputes': statuses,
+    })
+
+# Proofs ----------------------------------------------------------------------
+
+@bp.route('/proofs')
+@api_login_required('team_leader', 'data_analyst')
+def list_proofs():
+    """Proofs of many payments at once: ?payment_ids=1,2,3"""
+    raw_ids = [value for value in request.args.get('payment_ids', '').split(',') if value.strip()]
+    if not raw_ids:
+        abort(400, description='payment_ids is required')
+    limit = current_app.config.get('API_MAX_BATCH', 1000)
+    if len(raw_ids) > limit:
+        abort(413, description=f'At most {limit} payment_ids per call')
+    payment_ids = _id_list(raw_ids, 'payment_ids')
+
+    fields = _fields(PROOF_FIELDS)
+    columns = [getattr(PaymentProof, name) for name in dict.fromkeys(fields + ['id'])]
+    proofs = db.session.query(*columns)\
+        .filter(PaymentProof.payment_id.in_(payment_ids))\
+        .order_by(PaymentProof.payment_id, PaymentProof.id)\
+        .all()
+
+    return _json_response({
+        'success': True,
+        'items': [
+            dict(_serialize(proof, fields), url=url_for('team_leader.view_proof', proof_id=proof.id))
+            for proof in proofs
+        ],
+    })
+
+@bp.route('/proofs/batch', methods=['POST'])
+@api_login_required('team_leader')
+def upload_proofs():
+    """
+    Attach many proof files in one multipart call. Each file goes to the
+    latest record of its loan: the loan_id form field, or the file name up to
+    the first underscore (LN12345_receipt.png).
+    """
+    files = [file for file in request.files.getlist('files') if file and file.filename]
+    if not files:
+        abort(400, description='Send the proof files as multipart "files" fields')
+    limit = current_app.config.get('API_MAX_BATCH', 1000)
+    if len(files) > limit:
+        abort(413, description=f'At most {limit} files per call')
+
+    proof_type = request.form.get('proof_type', 'receipt')
+    if proof_type not in VALID_PROOF_TYPES:
+        abort(400, description=f'proof_type must be one of {", ".join(sorted(VALID_PROOF_TYPES))}')
+    bad = [file.filename for file in files if os.path.splitext(file.filename)[1].lower() not in PROOF_EXTENSIONS]
+    if bad:
+        return _error('Only images (jpg, jpeg, png) and PDF files allowed', 422, files=bad)
+
+    # One INSERT per proof: each is stored and thumbnailed on its own
+    allow_queries(len(files))
+    attached, unmatched = attach_proofs_by_loan_id(files, proof_type, loan_id=request.form.get('loan_id') or None)
+    return _json_response({'success': True, 'attached': attached, 'unmatched': unmatched},
+                          201 if attached else 200)
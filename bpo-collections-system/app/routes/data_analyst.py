@@ -1,17 +1,36 @@
-from flask import Blueprint, request, render_template, redirect, url_for, flash, send_file, send_from_directory
+from flask import Blueprint, request, render_template, redirect, url_for, flash, send_file, jsonify, current_app, abort, Response, stream_with_context
 from flask_login import login_required, current_user
 from app.models import PaymentRecord, Dispute, ExportHistory
 from app import db
 from datetime import datetime, timedelta
 import json  # Add this import
+import os
 from sqlalchemy import func, and_, or_
 from sqlalchemy.orm import joinedload
-from app.utils.export_helpers import export_campaign_data, export_dispute_data
-from app.forms import CampaignFilterForm, ExportForm
+from app.utils.export_helpers import export_campaign_data, export_dispute_data, csv_export_stream, parquet_available, STREAMED_FORMATS
+from app.utils.export_jobs import submit_export_job, get_job_status
+from app.utils.export_cache import find_cached_export, reuse_export
+from app.utils.search import apply_text_filters
+from app.utils.pagination import keyset_paginate
+from app.utils.file_serving import serve_file, project_root
+from app.utils.rollups import collection_summary, GROUP_BY_CHOICES
+from app.utils.dispute_workflow import TransitionError, bulk_transition
+from app.utils.dispute_queues import AGE_CHOICES, DA_SORTS, QUEUE_PAGE_SIZE, dispute_queue, parse_queue_args, queue_counts
+from app.utils.roster import roster_index
+from werkzeug.security import safe_join
+from app.forms import CampaignFilterForm, ExportForm, CAMPAIGN_CHOICES, DISPUTE_REASON_CHOICES
 
 # Single blueprint definition with a url_prefix
 bp = Blueprint('data_analyst', __name__, url_prefix='/data-analyst')
 
+def _parse_date_arg(name):
+    """Read a YYYY-MM-DD query string argument as a date, or None"""
+    value = request.args.get(name, '')
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
 @bp.route('/campaign-filter', methods=['GET', 'POST'])
 @login_required
 def campaign_filter():
@@ -36,14 +55,30 @@ def campaign_filter():
     # Base query
     query = PaymentRecord.query
     
-    # Apply filters if form is submitted
-    if form.validate_on_submit() or request.args.get('campaign'):
-        campaign = form.campaign.data or request.args.get('campaign')
-        start_date = form.start_date.data
-        end_date = form.end_date.data
-        operator = form.operator.data
-        min_amount = form.min_amount.data
-        max_amount = form.max_amount.data
+    # Apply filters if form is submitted or carried in the query string (pagination links)
+    if form.validate_on_submit() or request.args:
+        if request.method == 'POST':
+            campaign = form.campaign.data
+            start_date = form.start_date.data
+            end_date = form.end_date.data
+            operator = form.operator.data
+            min_amount = form.min_amount.data
+            max_amount = form.max_amount.data
+        else:
+            campaign = request.args.get('campaign')
+            start_date = _parse_date_arg('start_date')
+            end_date = _parse_date_arg('end_date')
+            operator = request.args.get('operator')
+            min_amount = request.args.get('min_amount', type=float)
+            max_amount = request.args.get('max_amount', type=float)
+            
+            # Keep the form showing the active filters
+            form.campaign.data = campaign
+            form.start_date.data = start_date
+            form.end_date.data = end_date
+            form.operator.data = operator
+            form.min_amount.data = min_amount
+            form.max_amount.data = max_amount
         
         if campaign:
             query = query.filter(PaymentRecord.campaign == campaign)
@@ -52,24 +87,53 @@ def campaign_filter():
         if end_date:
             query = query.filter(PaymentRecord.date_paid <= end_date)
         if operator:
-            query = query.filter(PaymentRecord.operator_name.ilike(f'%{operator}%'))
+            query = apply_text_filters(query, operator_name=operator)
         if min_amount is not None:
             query = query.filter(PaymentRecord.amount >= min_amount)
         if max_amount is not None:
             query = query.filter(PaymentRecord.amount <= max_amount)
     
-    # Pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-    pagination = query.order_by(PaymentRecord.created_at.desc()).paginate(page=page, per_page=per_page)
+    # Keyset pagination newest first
+    pagination = keyset_paginate(
+        query,
+        PaymentRecord,
+        cursor=request.args.get('cursor'),
+        per_page=10,
+        with_total=request.args.get('count') == '1'
+    )
     records = pagination.items
     
+    filters = {
+        'campaign': campaign,
+        'start_date': start_date,
+        'end_date': end_date,
+        'operator': operator,
+        'min_amount': min_amount,
+        'max_amount': max_amount
+    }
+    
     return render_template('data_analyst/campaign_filter.html',
                           form=form,
                           records=records,
                           pagination=pagination,
+                          filters=filters,
                           selected_campaign=campaign)
 
+def _export_feed(form):
+    """Feed an incremental export belongs to: the name given, or the analyst's own; None for a full export"""
+    if not form.incremental.data:
+        return None
+    return (form.feed.data or '').strip() or current_user.username
+
+def _export_form(**kwargs):
+    """ExportForm with the campaigns on file, and Parquet only offered when pyarrow is installed"""
+    form = ExportForm(**kwargs)
+    all_campaigns = db.session.query(PaymentRecord.campaign).distinct().all()
+    form.campaign.choices = [('', 'All Campaigns')] + [(c[0], c[0]) for c in all_campaigns]
+    if not parquet_available():
+        form.export_format.choices = [choice for choice in form.export_format.choices if choice[0] != 'parquet']
+    return form
+
 @bp.route('/export-data', methods=['GET', 'POST'])
 @login_required
 def export_data():
@@ -84,44 +148,29 @@ def export_data():
     from app.utils.export_helpers import export_campaign_data, export_dispute_data
     from app.forms import ExportForm  # Add this import
     
-    form = ExportForm()
-    
-    # Get all campaigns for the dropdown
-    all_campaigns = db.session.query(PaymentRecord.campaign).distinct().all()
-    form.campaign.choices = [('', 'All Campaigns')] + [(c[0], c[0]) for c in all_campaigns]
+    form = _export_form()
     
     if form.validate_on_submit():
         export_type = form.export_type.data
-        campaign = form.campaign.data if export_type == 'campaign' else None
-        start_date = form.start_date.data
-        end_date = form.end_date.data
-        include_headers = form.include_headers.data
         
         try:
-            # Use helper functions for export
-            if export_type == 'campaign':
-                csv_path, filename, record_count = export_campaign_data(
-                    campaign, start_date, end_date, include_headers
-                )
-            else:  # disputes
-                csv_path, filename, record_count = export_dispute_data(
-                    start_date, end_date, include_headers
-                )
-            
-            # Record the export
-            export_history = ExportHistory(
-                export_type=export_type,
-                campaign=campaign if export_type == 'campaign' else None,
-                start_date=start_date,
-                end_date=end_date,
-                record_count=record_count,
-                filename=filename,
-                created_by=current_user.username
+            # Exports run on the background worker pool
+            job = submit_export_job(
+                export_type,
+                form.campaign.data if export_type == 'campaign' else None,
+                form.start_date.data,
+                form.end_date.data,
+                form.include_headers.data,
+                current_user.username,
+                form.export_format.data,
+                _export_feed(form)
             )
-            db.session.add(export_history)
-            db.session.commit()
             
-            return send_file(csv_path, as_attachment=True, download_name=filename)
+            if job.status == 'completed':
+                flash(f'Export #{job.id} is ready: the data has not changed since the same export was last run.', 'info')
+            else:
+                flash(f'Export #{job.id} queued. It will appear in the export history when ready.', 'info')
+            return redirect(url_for('data_analyst.export_data'))
             
         except Exception as e:
             db.session.rollback()
@@ -130,7 +179,123 @@ def export_data():
     # Get export history
     export_history = ExportHistory.query.order_by(ExportHistory.created_at.desc()).limit(10).all()
     
-    return render_template('data_analyst/export.html', form=form, export_history=export_history)
+    return render_template('data_analyst/export.html', form=form, export_history=export_history,
+                           streamed_formats=STREAMED_FORMATS)
+
+@bp.route('/export-jobs', methods=['POST'])
+@login_required
+def submit_export():
+    """Queue an export and return its job id"""
+    if current_user.role != 'data_analyst':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    form = _export_form()
+    
+    if not form.validate_on_submit():
+        return jsonify({'success': False, 'errors': form.errors}), 400
+    
+    export_type = form.export_type.data
+    job = submit_export_job(
+        export_type,
+        form.campaign.data if export_type == 'campaign' else None,
+        form.start_date.data,
+        form.end_date.data,
+        form.include_headers.data,
+        current_user.username,
+        form.export_format.data,
+        _export_feed(form)
+    )
+    
+    status = get_job_status(job)
+    status['status_url'] = url_for('data_analyst.export_job_status', job_id=job.id)
+    return jsonify(status), 202
+
+@bp.route('/export-data/stream')
+@login_required
+def stream_export():
+    """Download a CSV export while it is read from the database, without a background job"""
+    if current_user.role != 'data_analyst':
+        flash('Access denied: Data Analyst role required', 'danger')
+        return redirect(url_for('main.index'))
+    
+    form = _export_form(formdata=request.args, meta={'csrf': False})
+    if not form.validate() or form.export_format.data not in STREAMED_FORMATS:
+        flash('Invalid export options', 'danger')
+        return redirect(url_for('data_analyst.export_data'))
+    if form.incremental.data:
+        # The feed's watermark only moves on once the file is complete, which a download can't promise
+        flash('Incremental exports are built in the background. Please submit them from the export page.', 'warning')
+        return redirect(url_for('data_analyst.export_data'))
+    
+    export_type = form.export_type.data
+    campaign = (form.campaign.data or None) if export_type == 'campaign' else None
+    compress = form.export_format.data == 'csv.gz'
+    
+    # An identical CSV built by a background job from the current data is sent as is
+    cached = find_cached_export(export_type, campaign, form.start_date.data, form.end_date.data,
+                                form.export_format.data, form.include_headers.data)
+    if cached:
+        job = reuse_export(cached, current_user.username)
+        return redirect(url_for('data_analyst.download_export', filename=job.filename))
+    
+    finished = []
+    filename, chunks = csv_export_stream(
+        export_type, campaign, form.start_date.data, form.end_date.data, form.include_headers.data,
+        compress, progress_callback=lambda record_count, _: finished.append(record_count)
+    )
+    
+    def generate():
+        # Logged like any other export; there is no file to download again later.
+        # The row is only added once the body is sent, so a HEAD request or a
+        # client leaving before the first chunk leaves no 'running' row behind.
+        job = ExportHistory(
+            export_type=export_type,
+            campaign=campaign,
+            start_date=form.start_date.data,
+            end_date=form.end_date.data,
+            export_format=form.export_format.data,
+            include_headers=form.include_headers.data,
+            record_count=0,
+            filename='',
+            created_by=current_user.username,
+            status='running',
+            progress=0
+        )
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+        
+        try:
+            yield from chunks
+        finally:
+            # Runs after the last chunk, and also if the query fails or the client goes away
+            db.session.rollback()
+            job = ExportHistory.query.get(job_id)
+            if finished:
+                job.status = 'completed'
+                job.progress = 100
+                job.record_count = job.total_rows = finished[0]
+            else:
+                job.status = 'failed'
+                job.error_message = 'The download did not finish'
+            job.completed_at = datetime.utcnow()
+            db.session.commit()
+    
+    response = Response(stream_with_context(generate()), mimetype='application/gzip' if compress else 'text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Ask nginx to pass chunks on as they come instead of buffering the whole file
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/export-jobs/<int:job_id>')
+@login_required
+def export_job_status(job_id):
+    """Poll the progress of a queued export"""
+    if current_user.role != 'data_analyst':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    job = ExportHistory.query.get_or_404(job_id)
+    return jsonify(get_job_status(job))
 
 @bp.route('/download-export/<filename>')
 @login_required
@@ -144,9 +309,62 @@ def download_export(filename):
         flash('Invalid filename', 'danger')
         return redirect(url_for('data_analyst.export_data'))
     
-    # Path to the export file
-    export_dir = os.path.join(current_app.root_path, '..', 'exports')
-    return send_from_directory(export_dir, filename, as_attachment=True)
+    # Path to the export file; ETag and Range support let large downloads resume
+    export_path = safe_join(os.path.join(project_root(), 'exports'), filename)
+    if export_path is None:
+        abort(404)
+    return serve_file(export_path, as_attachment=True)
+
+def _summary_args():
+    """Summary filters from the query string; the date range defaults to month to date"""
+    today = datetime.utcnow().date()
+    start_date = _parse_date_arg('start_date') or today.replace(day=1)
+    end_date = _parse_date_arg('end_date') or today
+    campaign = request.args.get('campaign') or None
+    group_by = request.args.get('group_by', 'campaign')
+    if group_by not in GROUP_BY_CHOICES:
+        group_by = 'campaign'
+    return start_date, end_date, campaign, group_by
+
+@bp.route('/summary')
+@login_required
+def collection_summary_view():
+    if current_user.role != 'data_analyst':
+        flash('Access denied: Data Analyst role required', 'danger')
+        return redirect(url_for('auth.login'))
+    
+    start_date, end_date, campaign, group_by = _summary_args()
+    rows, totals = collection_summary(start_date, end_date, campaign, group_by)
+    
+    return render_template(
+        'data_analyst/summary.html',
+        rows=rows,
+        totals=totals,
+        start_date=start_date,
+        end_date=end_date,
+        campaign=campaign,
+        group_by=group_by,
+        campaigns=[value for value, _ in CAMPAIGN_CHOICES],
+        group_by_choices=GROUP_BY_CHOICES
+    )
+
+@bp.route('/summary/data')
+@login_required
+def collection_summary_data():
+    if current_user.role != 'data_analyst':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    start_date, end_date, campaign, group_by = _summary_args()
+    rows, totals = collection_summary(start_date, end_date, campaign, group_by)
+    
+    return jsonify({
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'campaign': campaign,
+        'group_by': group_by,
+        'rows': rows,
+        'totals': totals
+    })
 
 @bp.route('/dispute-review', methods=['GET', 'POST'])
 @login_required
@@ -155,40 +373,55 @@ def dispute_review():
         flash('Access denied: Data Analyst role required', 'danger')
         return redirect(url_for('auth.login'))
     
-    # Load disputes that have been approved by Team Leaders but need DA verification
-    disputes = Dispute.query.filter_by(status='pending_da_review')\
-        .join(PaymentRecord, Dispute.entry_id == PaymentRecord.id)\
-        .options(joinedload(Dispute.payment_record))\
-        .order_by(Dispute.validated_at.desc())\
-        .all()
-    
-    # Handle form submission if this is a POST request
+    # Verify or return the selected disputes (one from the row buttons, or many
+    # ticked for a bulk action) in a single transaction
     if request.method == 'POST':
-        dispute_id = request.form.get('dispute_id')
+        dispute_ids = request.form.getlist('dispute_ids', type=int) or request.form.getlist('dispute_id', type=int)
         action = request.form.get('action')
         comments = request.form.get('comments', '')
         
-        dispute = Dispute.query.get_or_404(dispute_id)
+        if not dispute_ids:
+            flash('Select at least one dispute', 'warning')
+            return redirect(url_for('data_analyst.dispute_review', **request.args))
         
         try:
-            if action == 'approve':
-                dispute.status = 'approved'
-                dispute.da_verified_by = current_user.username
-                dispute.da_comments = comments
-                dispute.da_verified_at = datetime.utcnow()
-                flash('Dispute verified and finalized', 'success')
-            elif action == 'reject':
-                # Sending back to Team Leader for reconsideration
-                dispute.status = 'pending'
-                dispute.da_verified_by = current_user.username
-                dispute.da_comments = comments
-                dispute.da_verified_at = datetime.utcnow()
-                flash('Dispute returned to Team Leader for reconsideration', 'warning')
-            
+            updated = bulk_transition('data_analyst', action, dispute_ids, current_user.username, comments)
             db.session.commit()
-            return redirect(url_for('data_analyst.dispute_review'))
+            if action == 'approve':
+                flash(f'{updated} dispute(s) verified and finalized', 'success')
+            else:
+                # Sent back to the Team Leader for reconsideration
+                flash(f'{updated} dispute(s) returned to Team Leader for reconsideration', 'warning')
+            if updated < len(set(dispute_ids)):
+                flash(f'{len(set(dispute_ids)) - updated} dispute(s) were already handled and were skipped', 'info')
+        except TransitionError as e:
+            flash(str(e), 'danger')
         except Exception as e:
             db.session.rollback()
-            flash(f'Error processing dispute: {str(e)}', 'danger')
+            flash(f'Error processing disputes: {str(e)}', 'danger')
+        return redirect(url_for('data_analyst.dispute_review', **request.args))
+    
+    # Disputes approved by Team Leaders that need DA verification, one page at a time;
+    # age counts from the TL approval
+    filters, sort, descending = parse_queue_args(request.args, DA_SORTS)
+    pagination = keyset_paginate(
+        dispute_queue('pending_da_review', filters, age_column='validated_at'),
+        Dispute,
+        cursor=request.args.get('cursor'),
+        per_page=QUEUE_PAGE_SIZE,
+        with_total=bool(filters),
+        sort=sort,
+        descending=descending
+    )
     
-    return render_template('data_analyst/dispute_review.html', disputes=disputes)
\ No newline at end of file
+    return render_template('data_analyst/dispute_review.html',
+                           disputes=pagination.items,
+                           pagination=pagination,
+                           filters=filters,
+                           queue_args=dict(filters, sort=sort, order='desc' if descending else 'asc'),
+                           sorts=DA_SORTS,
+                           counts=queue_counts(),
+                           campaigns=CAMPAIGN_CHOICES,
+                           reasons=DISPUTE_REASON_CHOICES,
+                           age_choices=AGE_CHOICES,
+                           operators=roster_index().active_codes())
\ No newline at end of file
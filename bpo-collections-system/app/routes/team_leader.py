@@ -1,12 +1,25 @@
-from flask import Blueprint, request, render_template, redirect, url_for, flash, jsonify, send_from_directory
+from flask import Blueprint, request, render_template, redirect, url_for, flash, jsonify, abort
 from flask_login import login_required, current_user
-from app.models import PaymentRecord, Dispute, PaymentProof
-from app.forms import PaymentEntryForm, PaymentRecordSearchForm  # Add this import
+from app.models import PaymentRecord, Dispute, PaymentProof, DuplicateCandidate
+from app.forms import PaymentEntryForm, PaymentRecordSearchForm, PaymentImportForm, AttachProofsForm, DisputeForm, CAMPAIGN_CHOICES, DISPUTE_REASON_CHOICES
 from app import db
 from datetime import datetime
 from sqlalchemy import or_
-from sqlalchemy.orm import joinedload  # Add this import at the top
+from sqlalchemy.orm import joinedload, undefer  # Add this import at the top
 from app.utils.file_helpers import save_payment_proofs
+from app.utils.search import apply_text_filters
+from app.utils.pagination import keyset_paginate
+from app.utils.query_stats import allow_queries
+from app.utils.stats import get_dashboard_stats
+from app.utils.import_helpers import import_payments, attach_proofs_by_loan_id
+from app.utils.previews import get_proof_preview
+from app.utils.file_serving import serve_file, project_root
+from app.utils.roster import roster_index
+from app.utils.duplicates import RULES, ScanInProgress, scan_duplicates, open_candidates, last_scan
+from app.utils.dispute_workflow import TransitionError, bulk_transition, correction_summary, transition_dispute
+from app.utils.dispute_queues import (AGE_CHOICES, QUEUE_PAGE_SIZE, TL_SORTS, dispute_queue, invalidate_queue_counts,
+                                      parse_queue_args, queue_counts)
+from werkzeug.security import safe_join
 import os
 from flask import current_app
 
@@ -26,7 +39,7 @@ def data_entry():
         # Check if proof files were provided
         if not form.proof_images.data or not form.proof_images.data[0]:
             flash('At least one proof of payment is required', 'danger')
-            return render_template('team_leader/data_entry.html', form=form)
+            return render_template('team_leader/data_entry.html', form=form, dispute_form=DisputeForm(formdata=None))
         
         try:
             # Create the payment record first
@@ -54,7 +67,8 @@ def data_entry():
                 proof_record = PaymentProof(
                     payment_id=new_record.id,
                     file_path=proof['path'],
-                    file_type=proof['type']
+                    file_type=proof['type'],
+                    content_hash=proof['hash']
                 )
                 db.session.add(proof_record)
             
@@ -66,33 +80,80 @@ def data_entry():
             db.session.rollback()
             flash(f'Error adding record: {str(e)}', 'danger')
     
-    # Get recent entries for display
-    recent_entries = PaymentRecord.query.order_by(PaymentRecord.created_at.desc()).limit(10).all()
+    # Get recent entries for display, with their proof counts in the same query
+    recent_entries = PaymentRecord.query\
+        .options(undefer(PaymentRecord.proof_count))\
+        .order_by(PaymentRecord.created_at.desc())\
+        .limit(10).all()
     
-    # Add these stats queries
+    # Dashboard counters are maintained incrementally and cached
     from datetime import date
-    from sqlalchemy import func
     
     today_date = date.today().strftime("%B %d, %Y")
-    total_records = PaymentRecord.query.count()
-    today_records = PaymentRecord.query.filter(func.date(PaymentRecord.created_at) == date.today()).count()
-    
-    # Count records with proofs
-    records_with_proofs = db.session.query(PaymentRecord.id)\
-        .join(PaymentProof, PaymentRecord.id == PaymentProof.payment_id)\
-        .group_by(PaymentRecord.id).count()
-    
-    # Count pending disputes
-    pending_disputes = Dispute.query.filter_by(status='pending').count()
+    stats = get_dashboard_stats()
     
     return render_template('team_leader/data_entry.html',
                           form=form,
+                          dispute_form=DisputeForm(formdata=None),
                           recent_entries=recent_entries,
                           today_date=today_date,
-                          total_records=total_records,
-                          today_records=today_records,
-                          records_with_proofs=records_with_proofs,
-                          pending_disputes=pending_disputes)
+                          total_records=stats['total_records'],
+                          today_records=stats['today_records'],
+                          records_with_proofs=stats['records_with_proofs'],
+                          pending_disputes=stats['pending_disputes'])
+
+@bp.route('/import-payments', methods=['GET', 'POST'])
+@login_required
+def import_payment_file():
+    if current_user.role != 'team_leader':
+        flash('Access denied: Team Leader role required', 'danger')
+        return redirect(url_for('auth.login'))
+    
+    form = PaymentImportForm()
+    proofs_form = AttachProofsForm(prefix='proofs')
+    result = None
+    
+    if form.validate_on_submit():
+        upload = form.import_file.data
+        try:
+            result = import_payments(upload.stream, upload.filename)
+            flash(f'Imported {result.inserted} payment records ({result.rejected} rows rejected)',
+                  'success' if not result.rejected else 'warning')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error importing payments: {str(e)}', 'danger')
+    
+    return render_template('team_leader/import_payments.html', form=form, proofs_form=proofs_form, result=result)
+
+@bp.route('/attach-proofs', methods=['POST'])
+@login_required
+def attach_proofs():
+    if current_user.role != 'team_leader':
+        flash('Access denied: Team Leader role required', 'danger')
+        return redirect(url_for('auth.login'))
+    
+    proofs_form = AttachProofsForm(prefix='proofs')
+    
+    if proofs_form.validate_on_submit():
+        try:
+            allow_queries(len(proofs_form.proof_images.data))
+            attached, unmatched = attach_proofs_by_loan_id(
+                proofs_form.proof_images.data,
+                proofs_form.proof_types.data,
+                proofs_form.loan_id.data.strip() or None
+            )
+            flash(f'Attached {attached} proof file(s)', 'success')
+            if unmatched:
+                flash(f'No payment record found for: {", ".join(unmatched)}', 'warning')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error attaching proofs: {str(e)}', 'danger')
+    else:
+        for errors in proofs_form.errors.values():
+            for error in errors:
+                flash(error, 'danger')
+    
+    return redirect(url_for('team_leader.import_payment_file'))
 
 @bp.route('/dispute-validation', methods=['GET', 'POST'])
 @login_required
@@ -101,43 +162,113 @@ def dispute_validation():
         flash('Access denied: Team Leader role required', 'danger')
         return redirect(url_for('main.index'))
     
-    # Load disputes with their payment records in one query to avoid N+1 queries
-    disputes = Dispute.query.filter_by(status='pending')\
-        .join(PaymentRecord, Dispute.entry_id == PaymentRecord.id)\
-        .options(joinedload(Dispute.payment_record))\
-        .order_by(Dispute.created_at.desc())\
-        .all()
-    
-    # Handle form submission if this is a POST request
+    # Approve or reject the selected disputes (one from the row buttons, or many
+    # ticked for a bulk action) in a single transaction
     if request.method == 'POST':
-        dispute_id = request.form.get('dispute_id')
+        dispute_ids = request.form.getlist('dispute_ids', type=int) or request.form.getlist('dispute_id', type=int)
         action = request.form.get('action')
         comments = request.form.get('comments', '')
         
-        dispute = Dispute.query.get_or_404(dispute_id)
+        if not dispute_ids:
+            flash('Select at least one dispute', 'warning')
+            return redirect(url_for('team_leader.dispute_validation', **request.args))
         
         try:
-            if action == 'approve':
-                # Change status to pending_da_review instead of approved
-                dispute.status = 'pending_da_review'
-                dispute.validated_by = current_user.username
-                dispute.validation_comments = comments
-                dispute.validated_at = datetime.utcnow()
-                flash('Dispute approved and sent to Data Analysts for final verification', 'success')
-            elif action == 'reject':
-                dispute.status = 'rejected'
-                dispute.validated_by = current_user.username
-                dispute.validation_comments = comments
-                dispute.validated_at = datetime.utcnow()
-                flash('Dispute rejected', 'warning')
-            
+            updated = bulk_transition('team_leader', action, dispute_ids, current_user.username, comments)
             db.session.commit()
-            return redirect(url_for('team_leader.dispute_validation'))
+            if action == 'approve':
+                flash(f'{updated} dispute(s) approved and sent to Data Analysts for final verification', 'success')
+            else:
+                flash(f'{updated} dispute(s) rejected', 'warning')
+            if updated < len(set(dispute_ids)):
+                flash(f'{len(set(dispute_ids)) - updated} dispute(s) were already handled and were skipped', 'info')
+        except TransitionError as e:
+            flash(str(e), 'danger')
         except Exception as e:
             db.session.rollback()
-            flash(f'Error processing dispute: {str(e)}', 'danger')
+            flash(f'Error processing disputes: {str(e)}', 'danger')
+        return redirect(url_for('team_leader.dispute_validation', **request.args))
+    
+    # One page of the filtered queue; the total is only counted when filtering
+    filters, sort, descending = parse_queue_args(request.args, TL_SORTS)
+    pagination = keyset_paginate(
+        dispute_queue('pending', filters),
+        Dispute,
+        cursor=request.args.get('cursor'),
+        per_page=QUEUE_PAGE_SIZE,
+        with_total=bool(filters),
+        sort=sort,
+        descending=descending
+    )
+    
+    return render_template('team_leader/dispute_validation.html',
+                           disputes=pagination.items,
+                           pagination=pagination,
+                           filters=filters,
+                           queue_args=dict(filters, sort=sort, order='desc' if descending else 'asc'),
+                           sorts=TL_SORTS,
+                           counts=queue_counts(),
+                           campaigns=CAMPAIGN_CHOICES,
+                           reasons=DISPUTE_REASON_CHOICES,
+                           age_choices=AGE_CHOICES,
+                           duplicates=open_candidates(), duplicate_rules=RULES, last_scan=last_scan())
+
+@bp.route('/duplicates/scan', methods=['POST'])
+@login_required
+def scan_for_duplicates():
+    if current_user.role != 'team_leader':
+        flash('Access denied: Team Leader role required', 'danger')
+        return redirect(url_for('main.index'))
     
-    return render_template('team_leader/dispute_validation.html', disputes=disputes)
+    try:
+        result = scan_duplicates(db.engine, window_days=current_app.config.get('DUPLICATE_WINDOW_DAYS', 3))
+        flash(f'Scanned {result.records_scanned} new records: {result.total} possible duplicates found', 'info')
+    except ScanInProgress:
+        flash('A duplicate scan is already running, try again in a moment', 'warning')
+    
+    return redirect(url_for('team_leader.dispute_validation'))
+
+@bp.route('/duplicates/<int:candidate_id>/<action>', methods=['POST'])
+@login_required
+def resolve_duplicate(candidate_id, action):
+    if current_user.role != 'team_leader':
+        flash('Access denied: Team Leader role required', 'danger')
+        return redirect(url_for('main.index'))
+    if action not in ('dispute', 'dismiss'):
+        abort(404)
+    
+    candidate = DuplicateCandidate.query.get_or_404(candidate_id)
+    if candidate.status != 'open':
+        flash('This possible duplicate was already handled', 'warning')
+        return redirect(url_for('team_leader.dispute_validation'))
+    
+    try:
+        if action == 'dispute':
+            original = candidate.duplicate_of
+            db.session.add(Dispute(
+                entry_id=candidate.entry_id,
+                reason='duplicate_entry',
+                corrected_details=(f'Possible duplicate of record #{original.id} '
+                                   f'(loan {original.loan_id}, {original.amount} paid {original.date_paid}): '
+                                   f'{RULES[candidate.rule]}'),
+                status='pending',
+                created_by=current_user.username
+            ))
+            candidate.status = 'disputed'
+            flash('Duplicate entry dispute created', 'success')
+        else:
+            candidate.status = 'dismissed'
+            flash('Possible duplicate dismissed', 'info')
+        
+        candidate.resolved_by = current_user.username
+        candidate.resolved_at = datetime.utcnow()
+        db.session.commit()
+        invalidate_queue_counts()
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error handling possible duplicate: {str(e)}', 'danger')
+    
+    return redirect(url_for('team_leader.dispute_validation'))
 
 @bp.route('/create-dispute', methods=['POST'])
 @login_required
@@ -145,22 +276,29 @@ def create_dispute():
     if current_user.role != 'team_leader':
         return {'success': False, 'message': 'Access denied'}, 403
     
-    entry_id = request.form.get('entry_id')
-    reason = request.form.get('reason')
-    corrected_details = request.form.get('corrected_details')
+    form = DisputeForm()
+    if not form.validate_on_submit():
+        for field, errors in form.errors.items():
+            flash(f'{getattr(form, field).label.text}: {errors[0]}', 'danger')
+        return redirect(url_for('team_leader.data_entry'))
     
-    entry = PaymentRecord.query.get_or_404(entry_id)
+    entry = PaymentRecord.query.get_or_404(form.entry_id.data)
     
     try:
         new_dispute = Dispute(
-            entry_id=entry_id,
-            reason=reason,
-            corrected_details=corrected_details,
+            entry_id=entry.id,
+            reason=form.reason.data,
+            corrected_operator=form.corrected_operator.data or None,
+            corrected_amount=form.corrected_amount.data,
+            corrected_date_paid=form.corrected_date_paid.data,
+            mark_duplicate=form.mark_duplicate.data,
             status='pending',
             created_by=current_user.username
         )
+        new_dispute.corrected_details = (form.corrected_details.data or '').strip() or correction_summary(new_dispute)
         db.session.add(new_dispute)
         db.session.commit()
+        invalidate_queue_counts()
         flash('Dispute created successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -181,21 +319,16 @@ def validate_dispute():
     
     dispute = Dispute.query.get_or_404(dispute_id)
     
+    # Same workflow as the queue page: approving sends the dispute on to the Data Analysts
     try:
+        transition_dispute(dispute, 'team_leader', action, current_user.username, comments)
+        db.session.commit()
         if action == 'approve':
-            dispute.status = 'approved'
-            dispute.validated_by = current_user.username
-            dispute.validation_comments = comments
-            dispute.validated_at = datetime.utcnow()
-            flash('Dispute approved successfully', 'success')
-        elif action == 'reject':
-            dispute.status = 'rejected'
-            dispute.validated_by = current_user.username
-            dispute.validation_comments = comments
-            dispute.validated_at = datetime.utcnow()
+            flash('Dispute approved and sent to Data Analysts for final verification', 'success')
+        else:
             flash('Dispute rejected', 'warning')
-        
-        db.session.commit()
+    except TransitionError as e:
+        flash(str(e), 'danger')
     except Exception as e:
         db.session.rollback()
         flash(f'Error processing dispute: {str(e)}', 'danger')
@@ -216,7 +349,8 @@ def search_records():
     search_form.campaign.choices = [('', 'All Campaigns')] + [(c[0], c[0]) for c in campaigns if c[0]]
     
     # Build the base query - USE CLASS ATTRIBUTE NOT STRING
-    query = PaymentRecord.query.options(joinedload(PaymentRecord.proofs))
+    # Only the number of proofs is shown, so count them in the same query instead of loading them
+    query = PaymentRecord.query.options(undefer(PaymentRecord.proof_count))
     
     # Apply filters if form is submitted or GET parameters exist
     if search_form.validate_on_submit() or request.args:
@@ -264,35 +398,57 @@ def search_records():
         # Apply filters
         if campaign:
             query = query.filter(PaymentRecord.campaign == campaign)
-        if operator_name:
-            query = query.filter(PaymentRecord.operator_name.ilike(f'%{operator_name}%'))
-        if loan_id:
-            query = query.filter(PaymentRecord.loan_id.ilike(f'%{loan_id}%'))
-        if customer_name:
-            query = query.filter(PaymentRecord.customer_name.ilike(f'%{customer_name}%'))
+        # Partial matches on the text columns use the full-text index
+        query = apply_text_filters(
+            query,
+            operator_name=operator_name,
+            loan_id=loan_id,
+            customer_name=customer_name
+        )
         if date_from:
             query = query.filter(PaymentRecord.date_paid >= date_from)
         if date_to:
             query = query.filter(PaymentRecord.date_paid <= date_to)
     
-    # Pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    pagination = query.order_by(PaymentRecord.created_at.desc()).paginate(page=page, per_page=per_page)
+    # Keyset pagination newest first; the total is approximate and cached
+    pagination = keyset_paginate(
+        query,
+        PaymentRecord,
+        cursor=request.args.get('cursor'),
+        per_page=20,
+        with_total=request.args.get('count', '1') != '0'
+    )
     records = pagination.items
     
-    # Get unique operator names for autocomplete
-    operators = db.session.query(PaymentRecord.operator_name).distinct().all()
-    operator_names = [op[0] for op in operators if op[0]]
-    
     return render_template(
         'team_leader/search_records.html',
         search_form=search_form,
+        dispute_form=DisputeForm(formdata=None),
         records=records,
         pagination=pagination,
-        operators=operator_names
+        # Autocomplete from the in-memory roster rather than a DISTINCT over every payment
+        operators=roster_index().active_codes()
     )
 
+@bp.route('/operators')
+@login_required
+def operator_autocomplete():
+    if current_user.role != 'team_leader':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    matches = roster_index().complete(request.args.get('q', ''), limit=limit)
+    return jsonify({
+        'operators': [
+            {
+                'operator': op['operator'],
+                'full_name': op['full_name'] or op['name'],
+                'supervisor_group': op['supervisor_group'],
+            }
+            for op in matches
+        ]
+    })
+
 @bp.route('/view-proof/<int:proof_id>')
 @login_required
 def view_proof(proof_id):
@@ -307,11 +463,30 @@ def view_proof(proof_id):
         flash('No proof image available for this record', 'warning')
         return redirect(url_for('team_leader.data_entry'))
     
-    # Extract directory and filename from the stored path
-    directory = os.path.dirname(os.path.join(current_app.root_path, '..', proof.file_path))
-    filename = os.path.basename(proof.file_path)
+    # Content-addressed proofs use their hash as ETag; older ones fall back to mtime and size
+    path = safe_join(project_root(), proof.file_path)
+    if path is None:
+        abort(404)
     
-    return send_from_directory(directory, filename)
+    return serve_file(path, etag=proof.content_hash, max_age=86400)
+
+@bp.route('/proof-preview/<int:proof_id>')
+@login_required
+def proof_preview(proof_id):
+    # Same access rule as view_proof
+    if current_user.role not in ['team_leader', 'data_analyst']:
+        flash('Access denied', 'danger')
+        return redirect(url_for('auth.login'))
+
+    proof = PaymentProof.query.get_or_404(proof_id)
+
+    preview = get_proof_preview(proof)
+    if preview is None:
+        abort(404)
+
+    # A proof's content never changes, so its preview can be cached for good
+    return serve_file(preview, etag=f"preview-{proof.content_hash}", mimetype='image/jpeg',
+                      max_age=31536000, immutable=True)
 
 @bp.route('/record-proofs/<int:record_id>')
 @login_required
@@ -324,7 +499,7 @@ def record_proofs(record_id):
     # Get the source parameter (defaults to data_entry for team leaders)
     source = request.args.get('source', 'data_entry')
     
-    payment = PaymentRecord.query.get_or_404(record_id)
-    proofs = PaymentProof.query.filter_by(payment_id=record_id).all()
+    # The record and its proofs in one query
+    payment = PaymentRecord.query.options(joinedload(PaymentRecord.proofs)).get_or_404(record_id)
     
-    return render_template('team_leader/view_proofs.html', payment=payment, proofs=proofs, source=source)
\ No newline at end of file
+    return render_template('team_leader/view_proofs.html', payment=payment, proofs=payment.proofs, source=source)
\ No newline at end of file
@@ -0,0 +1,186 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+# Defaults for the BACKUP_* settings in config.Config
+BACKUP_DEFAULTS = {
+    'BACKUP_DIR': None,               # defaults to instance/backups next to the database
+    'BACKUP_KEEP': 10,                # backups kept per label, oldest are removed
+    'BACKUP_COMPRESS': False,         # gzip finished backups
+    'BACKUP_PAGES_PER_STEP': 1024,    # pages copied before the source lock is released
+    'BACKUP_STEP_SLEEP': 0.01,        # seconds to pause between steps so writers get in
+    'BACKUP_INTERVAL_HOURS': 24,      # scheduled mode
+}
+
+BACKUP_PREFIX = 'collections_backup_'
+
+class BackupError(Exception):
+    """A backup could not be made or failed verification"""
+
+def backup_settings(config):
+    """Merge the BACKUP_* settings from a config mapping over the defaults"""
+    return {key: config.get(key, default) for key, default in BACKUP_DEFAULTS.items()}
+
+def default_backup_dir(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'backups')
+
+def verify_backup(path):
+    """Run PRAGMA integrity_check on a backup (plain or gzipped); raise BackupError if it fails"""
+    check_path = path
+    if path.endswith('.gz'):
+        check_path = path[:-3] + '.verify'
+        with gzip.open(path, 'rb') as src, open(check_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+
+    try:
+        conn = sqlite3.connect(f'file:{check_path}?mode=ro', uri=True)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"{path} is not a readable SQLite database: {e}")
+    finally:
+        if check_path != path and os.path.exists(check_path):
+            os.remove(check_path)
+
+    if result != 'ok':
+        raise BackupError(f"{path} failed the integrity check: {result}")
+
+# Stepped copies restart whenever another connection writes; give up stepping after this many
+MAX_RESTARTS = 5
+
+class _TooManyRestarts(Exception):
+    pass
+
+def _copy(source, tmp_path, pages, step_sleep, progress):
+    """Copy source into a fresh file at tmp_path with the backup API"""
+    state = {'copied': 0, 'restarts': 0}
+
+    def step(status, remaining, total):
+        copied = total - remaining
+        # A step that succeeded without moving forward means the copy started over
+        if status == sqlite3.SQLITE_OK and remaining and copied <= state['copied']:
+            state['restarts'] += 1
+            if state['restarts'] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state['copied'] = copied
+        if progress:
+            progress(copied, total)
+        if remaining and step_sleep:
+            # Release the source between steps so writers are not starved
+            time.sleep(step_sleep)
+
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    target = sqlite3.connect(tmp_path)
+    try:
+        source.backup(target, pages=pages, progress=step)
+        # The copy inherits WAL mode; make it a standalone single file
+        target.execute("PRAGMA journal_mode=DELETE")
+    except BaseException:
+        target.close()
+        os.remove(tmp_path)
+        raise
+    target.close()
+
+def backup_database(db_path, backup_dir=None, label='manual', pages_per_step=1024, step_sleep=0.01,
+                    compress=False, keep=10, progress=None):
+    """
+    Take a consistent copy of a live SQLite database with the online backup API.
+
+    Pages are copied in steps of pages_per_step with a pause in between, so
+    the app can keep writing. In WAL mode every step reads the same snapshot,
+    held open for the whole copy; writers aren't blocked by it, and their
+    commits don't restart the copy. With a rollback journal, writes restart
+    the copy, and if that happens too often it finishes in one step. The copy
+    is integrity-checked, optionally gzipped, and older backups with the same
+    label beyond `keep` are removed.
+
+    Returns:
+        Path of the new backup
+    """
+    if not os.path.exists(db_path):
+        raise BackupError(f"Database file not found at {db_path}")
+
+    backup_dir = backup_dir or default_backup_dir(db_path)
+    os.makedirs(backup_dir, exist_ok=True)
+
+    # Microseconds, so backups taken within the same second don't overwrite each other
+    name = f'{BACKUP_PREFIX}{label}_{datetime.now().strftime("%Y%m%d%H%M%S_%f")}.db'
+    final_path = os.path.join(backup_dir, name + ('.gz' if compress else ''))
+    tmp_path = os.path.join(backup_dir, f'.{name}.partial')
+
+    source = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        wal = source.execute("PRAGMA journal_mode").fetchone()[0].lower() == 'wal'
+        if wal:
+            # Steps run inside this read transaction, so they all see one snapshot
+            # and the app's commits don't restart the copy. A WAL reader never
+            # blocks writers.
+            source.execute("BEGIN")
+            source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+            try:
+                _copy(source, tmp_path, pages_per_step, step_sleep, progress)
+            finally:
+                source.execute("COMMIT")
+        else:
+            try:
+                _copy(source, tmp_path, pages_per_step, step_sleep, progress)
+            except _TooManyRestarts:
+                # Writes keep invalidating the stepped copy, finish in one go
+                _copy(source, tmp_path, -1, 0, progress)
+    finally:
+        source.close()
+
+    try:
+        verify_backup(tmp_path)
+        if compress:
+            with open(tmp_path, 'rb') as src, gzip.open(final_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    rotate_backups(backup_dir, label, keep)
+    return final_path
+
+def list_backups(backup_dir, label=None):
+    """Backups in a directory, newest first"""
+    if not os.path.isdir(backup_dir):
+        return []
+    prefix = BACKUP_PREFIX + (f'{label}_' if label else '')
+    names = [n for n in os.listdir(backup_dir)
+             if n.startswith(prefix) and (n.endswith('.db') or n.endswith('.db.gz'))]
+    paths = [os.path.join(backup_dir, n) for n in names]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+def rotate_backups(backup_dir, label, keep):
+    """Delete all but the newest `keep` backups with this label"""
+    if not keep:
+        return []
+    removed = list_backups(backup_dir, label)[keep:]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+def backup_from_config(db_path, config, label='manual', progress=None):
+    """backup_database() with the BACKUP_* settings from a config mapping"""
+    settings = backup_settings(config)
+    return backup_database(
+        db_path,
+        backup_dir=settings['BACKUP_DIR'],
+        label=label,
+        pages_per_step=settings['BACKUP_PAGES_PER_STEP'],
+        step_sleep=settings['BACKUP_STEP_SLEEP'],
+        compress=settings['BACKUP_COMPRESS'],
+        keep=settings['BACKUP_KEEP'],
+        progress=progress
+    )
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager
+from app import db
+from app.models import Dispute, PaymentRecord
+from app.utils.cache import TTLCache
+
+QUEUE_PAGE_SIZE = 25
+
+# "Waiting longer than" filter, in days
+AGE_CHOICES = [
+    ('', 'Any age'),
+    ('1', 'Over 1 day'),
+    ('3', 'Over 3 days'),
+    ('7', 'Over a week'),
+    ('14', 'Over 2 weeks'),
+    ('30', 'Over 30 days'),
+]
+
+# Sortable columns of each queue. Every one leads a (status, column) index on
+# Dispute, so any page of any sort is a single index range scan.
+TL_SORTS = {'created_at': 'Created At', 'reason': 'Dispute Reason', 'created_by': 'Created By'}
+DA_SORTS = {'validated_at': 'Approved On', 'reason': 'Reason', 'validated_by': 'Team Leader'}
+
+FILTER_ARGS = ('campaign', 'reason', 'min_age', 'creator', 'operator')
+
+# Disputes per status for the queue badges; dropped whenever a dispute is added or moves
+_count_cache = TTLCache(ttl=60, max_entries=1)
+
+def queue_counts():
+    """Number of disputes in each status, cached for a minute"""
+    def count():
+        rows = db.session.query(Dispute.status, func.count(Dispute.id)).group_by(Dispute.status).all()
+        return dict(rows)
+    return _count_cache.get_or_set('counts', count)
+
+def invalidate_queue_counts():
+    _count_cache.invalidate()
+
+def parse_queue_args(args, sorts):
+    """
+    Read a queue page's query string.
+
+    Returns:
+        (filters, sort column, descending), with filters holding only the ones given
+    """
+    filters = {name: args.get(name, '').strip() for name in FILTER_ARGS}
+    filters = {name: value for name, value in filters.items() if value}
+    if 'min_age' in filters and not filters['min_age'].isdigit():
+        del filters['min_age']
+
+    sort = args.get('sort')
+    if sort not in sorts:
+        sort = next(iter(sorts))
+    return filters, sort, args.get('order') != 'asc'
+
+def dispute_queue(status, filters, age_column='created_at'):
+    """
+    Disputes in one status matching a queue's filters, with their payment
+    records and proof counts loaded alongside (no per-row queries while rendering).
+
+    Age is measured from age_column: when the dispute was raised for the TL
+    queue, when the TL approved it for the DA queue.
+    """
+    query = Dispute.query.filter(Dispute.status == status)\
+        .join(PaymentRecord, Dispute.entry_id == PaymentRecord.id)\
+        .options(contains_eager(Dispute.payment_record).undefer(PaymentRecord.proof_count))
+
+    if filters.get('campaign'):
+        query = query.filter(PaymentRecord.campaign == filters['campaign'])
+    if filters.get('operator'):
+        query = query.filter(PaymentRecord.operator_name == filters['operator'])
+    if filters.get('reason'):
+        query = query.filter(Dispute.reason == filters['reason'])
+    if filters.get('creator'):
+        query = query.filter(Dispute.created_by == filters['creator'])
+    if filters.get('min_age'):
+        cutoff = datetime.utcnow() - timedelta(days=int(filters['min_age']))
+        query = query.filter(getattr(Dispute, age_column) <= cutoff)
+    return query
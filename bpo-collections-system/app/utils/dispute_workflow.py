@@ -0,0 +1,171 @@
+from datetime import datetime
+from sqlalchemy import func
+from app import db
+from app.models import Dispute, PaymentRecord, PaymentRecordVersion
+from app.utils.dispute_queues import invalidate_queue_counts
+from app.utils.stats import invalidate_stats
+
+# (role, current status, action) -> new status
+TRANSITIONS = {
+    # Team Leader validation sends approved disputes on to the Data Analysts
+    ('team_leader', 'pending', 'approve'): 'pending_da_review',
+    ('team_leader', 'pending', 'reject'): 'rejected',
+    # Data Analyst verification finalizes, or returns the dispute to the TL
+    ('data_analyst', 'pending_da_review', 'approve'): 'approved',
+    ('data_analyst', 'pending_da_review', 'reject'): 'pending',
+}
+
+# Ids per UPDATE in bulk transitions, well under SQLite's bound parameter limit
+BULK_CHUNK = 500
+
+# Dispute correction fields and the PaymentRecord columns they replace
+CORRECTIONS = {
+    'corrected_operator': 'operator_name',
+    'corrected_amount': 'amount',
+    'corrected_date_paid': 'date_paid',
+    'mark_duplicate': 'is_duplicate',
+}
+
+class TransitionError(ValueError):
+    """A dispute can't take this action in its current status"""
+
+def _audit_values(role, username, comments):
+    """Who acted on a dispute, and when, in the columns of their role"""
+    now = datetime.utcnow()
+    if role == 'team_leader':
+        return {'validated_by': username, 'validation_comments': comments, 'validated_at': now}
+    return {'da_verified_by': username, 'da_comments': comments, 'da_verified_at': now}
+
+def transition_dispute(dispute, role, action, username, comments=''):
+    """
+    Move a dispute to its next status and record who did it.
+
+    Approving does not apply the dispute's corrections; call
+    apply_corrections() for the disputes that reached 'approved'.
+
+    Raises:
+        TransitionError: the action isn't allowed for this role and status
+    """
+    new_status = TRANSITIONS.get((role, dispute.status, action))
+    if new_status is None:
+        raise TransitionError(f'Dispute {dispute.id} is {dispute.status} and cannot be {action}d by a '
+                              f'{role.replace("_", " ")}')
+
+    for column, value in _audit_values(role, username, comments).items():
+        setattr(dispute, column, value)
+    dispute.status = new_status
+    invalidate_queue_counts()
+    return new_status
+
+def bulk_transition(role, action, dispute_ids, username, comments=''):
+    """
+    Apply one action, with shared comments, to many disputes using bulk UPDATEs.
+
+    Only disputes still in the status the action applies to are changed, so
+    any that another reviewer handled in the meantime are skipped instead of being
+    moved twice. Disputes a Data Analyst approves have their corrections
+    applied in the same transaction. The caller commits.
+
+    Returns:
+        number of disputes updated
+
+    Raises:
+        TransitionError: the role can't take this action at all
+    """
+    steps = [(status, new_status) for (step_role, status, step_action), new_status in TRANSITIONS.items()
+             if step_role == role and step_action == action]
+    if not steps:
+        raise TransitionError(f'A {role.replace("_", " ")} cannot {action} disputes')
+    from_status, new_status = steps[0]
+
+    values = dict(_audit_values(role, username, comments), status=new_status)
+    dispute_ids = sorted(set(dispute_ids))
+    updated = 0
+    for start in range(0, len(dispute_ids), BULK_CHUNK):
+        chunk = dispute_ids[start:start + BULK_CHUNK]
+        # The disputes this action moves, locked on PostgreSQL. On SQLite the
+        # UPDATE can't commit over a write made since this read, so the two agree.
+        ids = [dispute_id for (dispute_id,) in db.session.query(Dispute.id)
+               .filter(Dispute.id.in_(chunk), Dispute.status == from_status)
+               .with_for_update()]
+        if not ids:
+            continue
+        updated += Dispute.query\
+            .filter(Dispute.id.in_(ids), Dispute.status == from_status)\
+            .update(values, synchronize_session=False)
+        
+        if new_status == 'approved':
+            approved = Dispute.query.filter(Dispute.id.in_(ids)).populate_existing().all()
+            apply_corrections(approved, username)
+    invalidate_queue_counts()
+    # Bulk UPDATEs leave no dirty objects for the after_commit hook in
+    # app/utils/stats.py, so drop the dashboard numbers now and again once committed
+    invalidate_stats()
+    db.session.info['stats_dirty'] = True
+    return updated
+
+def correction_summary(dispute):
+    """The structured corrections as text, for disputes raised without a description"""
+    parts = []
+    if dispute.corrected_operator:
+        parts.append(f'Operator: {dispute.corrected_operator}')
+    if dispute.corrected_amount is not None:
+        parts.append(f'Amount: {dispute.corrected_amount:,.2f}')
+    if dispute.corrected_date_paid:
+        parts.append(f'Date paid: {dispute.corrected_date_paid.isoformat()}')
+    if dispute.mark_duplicate:
+        parts.append('Duplicate entry')
+    return '; '.join(parts)
+
+def apply_corrections(disputes, username):
+    """
+    Write the structured corrections of approved disputes to their payment records.
+
+    Before a record changes, the values being replaced are kept as a
+    PaymentRecordVersion, numbered per record. Disputes are applied in id
+    order, so two disputes on one record leave two versions. Disputes without
+    corrections, or already applied, are skipped. Runs in the caller's
+    transaction.
+
+    Returns:
+        number of disputes applied
+    """
+    disputes = sorted((d for d in disputes if d.applied_at is None and d.has_corrections), key=lambda d: d.id)
+    applied = 0
+    for start in range(0, len(disputes), BULK_CHUNK):
+        chunk = disputes[start:start + BULK_CHUNK]
+        payment_ids = {dispute.entry_id for dispute in chunk}
+        records = {record.id: record for record in PaymentRecord.query.filter(PaymentRecord.id.in_(payment_ids))}
+        versions = dict(
+            db.session.query(PaymentRecordVersion.payment_id, func.max(PaymentRecordVersion.version))
+            .filter(PaymentRecordVersion.payment_id.in_(payment_ids))
+            .group_by(PaymentRecordVersion.payment_id)
+        )
+        
+        now = datetime.utcnow()
+        history = []
+        for dispute in chunk:
+            record = records[dispute.entry_id]
+            versions[record.id] = versions.get(record.id, 0) + 1
+            history.append({
+                'payment_id': record.id,
+                'version': versions[record.id],
+                'dispute_id': dispute.id,
+                'operator_name': record.operator_name,
+                'amount': record.amount,
+                'date_paid': record.date_paid,
+                'is_duplicate': record.is_duplicate,
+                'replaced_by': username,
+                'replaced_at': now,
+            })
+            for field, column in CORRECTIONS.items():
+                value = getattr(dispute, field)
+                # An unticked duplicate box leaves the flag as it is
+                if value is not None and value is not False:
+                    setattr(record, column, value)
+            dispute.applied_at = now
+            applied += 1
+        
+        # One executemany per chunk; ORM inserts would run one statement per version to fetch its id
+        db.session.execute(PaymentRecordVersion.__table__.insert(), history)
+    return applied
@@ -0,0 +1,279 @@
+import re
+import threading
+import unicodedata
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import String, func, select, type_coerce
+from sqlalchemy.orm import joinedload
+from app.models import DuplicateCandidate, DuplicateScan, PaymentProof, PaymentRecord
+
+# Rules in order of strength; a pair matched by several keeps the first.
+# Keys are stored in duplicate_candidate.rule.
+RULES = {
+    'proof_hash': 'Same payment proof file',
+    'loan_amount': 'Same loan ID and amount',
+    'customer_name': 'Same customer name and amount, different loan ID',
+}
+
+DEFAULT_WINDOW_DAYS = 3  # max days between date paid of two duplicates
+FETCH_SIZE = 100000  # rows read per batch
+INSERT_BATCH_SIZE = 1000
+
+records = PaymentRecord.__table__
+proofs = PaymentProof.__table__
+candidates = DuplicateCandidate.__table__
+scans = DuplicateScan.__table__
+
+RECORD_COLUMNS = ['id', 'loan', 'cents', 'day', 'name']
+PAIR_COLUMNS = ['entry_id', 'duplicate_of_id', 'rule']
+
+_EPOCH = date(1970, 1, 1)
+_scan_lock = threading.Lock()
+
+class ScanInProgress(Exception):
+    """Another duplicate scan is already running in this process"""
+
+class ScanResult:
+    """Outcome of a duplicate scan: rows looked at and new candidates per rule"""
+
+    def __init__(self):
+        self.records_scanned = 0
+        self.proofs_scanned = 0
+        self.found = {rule: 0 for rule in RULES}
+
+    @property
+    def total(self):
+        return sum(self.found.values())
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+def normalize_name(name):
+    """
+    Customer name reduced for comparison: accents, case, punctuation and word
+    order are ignored, so 'DELA CRUZ, Juan' matches 'Juan dela Cruz'.
+    """
+    if not name.isascii():
+        name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sorted(_NON_WORD.sub(' ', name.lower()).split()))
+
+def _hash_keys(values, normalize=None):
+    """
+    64-bit keys for strings, so batches hold numbers instead of Python objects.
+    Each distinct value is normalized and hashed once.
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    if normalize:
+        uniques = [normalize(str(value)) for value in uniques.tolist()]
+    return pd.util.hash_array(np.asarray(uniques, dtype=object))[codes]
+
+# Key of a blank customer name, which never counts as a match
+_NO_NAME = _hash_keys([''])[0]
+
+def _day_numbers(values):
+    """Days since 1970-01-01 for ISO date strings (SQLite) or date objects"""
+    return np.array(values, dtype='datetime64[D]').astype(np.int64)
+
+def _to_date(day_number):
+    return _EPOCH + timedelta(days=int(day_number))
+
+def _record_frame(connection, condition, fetch_size):
+    """Read matching payment records in batches into a numeric frame"""
+    query = select(
+        records.c.id, records.c.loan_id, records.c.amount,
+        # Read dates as stored; parsing them one by one is the slow part
+        type_coerce(records.c.date_paid, String).label('date_paid'),
+        records.c.customer_name
+    ).where(condition)
+    result = connection.execution_options(stream_results=True).execute(query)
+
+    parts = []
+    for rows in result.partitions(fetch_size):
+        ids, loan_ids, amounts, dates_paid, customer_names = zip(*rows)
+        parts.append(pd.DataFrame({
+            'id': np.array(ids, dtype=np.int64),
+            'loan': _hash_keys(loan_ids, lambda loan_id: loan_id.strip().upper()),
+            'cents': np.rint(np.array(amounts, dtype=float) * 100).astype(np.int64),
+            'day': _day_numbers(dates_paid),
+            'name': _hash_keys(customer_names, normalize_name),
+        }))
+
+    if not parts:
+        return pd.DataFrame({column: np.array([], dtype=np.int64) for column in RECORD_COLUMNS})
+    return pd.concat(parts, ignore_index=True)
+
+def _adjacent_pairs(frame, same, differ, window_days, rule):
+    """
+    Pairs of records equal on the `same` columns, different on `differ`, and
+    paid within window_days of each other. Rows are sorted so that each record
+    only has to be compared with its neighbour.
+    """
+    if len(frame) < 2:
+        return pd.DataFrame(columns=PAIR_COLUMNS)
+
+    ordered = frame.sort_values(same + ['day', 'id'])
+    column = {name: ordered[name].to_numpy() for name in same + differ + ['day', 'id']}
+
+    match = (column['day'][1:] - column['day'][:-1]) <= window_days
+    for name in same:
+        match &= column[name][1:] == column[name][:-1]
+    for name in differ:
+        match &= column[name][1:] != column[name][:-1]
+
+    current, previous = column['id'][1:][match], column['id'][:-1][match]
+    return pd.DataFrame({
+        'entry_id': np.maximum(current, previous),
+        'duplicate_of_id': np.minimum(current, previous),
+        'rule': rule,
+    })
+
+def _record_pairs(connection, last_record_id, max_record_id, window_days, fetch_size, result):
+    """Loan/amount and customer name matches involving records added since the last scan"""
+    new = _record_frame(connection, records.c.id.between(last_record_id + 1, max_record_id), fetch_size)
+    result.records_scanned = len(new)
+    if new.empty:
+        return []
+
+    frame = new
+    if last_record_id:
+        # Earlier records can only match if paid within the window of a new one.
+        # Filtered on date alone so the date_paid index is used; new rows it
+        # returns again are dropped.
+        earlier = _record_frame(connection, records.c.date_paid.between(
+            _to_date(new['day'].min() - window_days), _to_date(new['day'].max() + window_days)
+        ), fetch_size)
+        frame = pd.concat([earlier[earlier['id'] <= last_record_id], new], ignore_index=True)
+
+    found = [
+        _adjacent_pairs(frame, ['loan', 'cents'], [], window_days, 'loan_amount'),
+        _adjacent_pairs(frame[frame['name'] != _NO_NAME], ['name', 'cents'], ['loan'], window_days, 'customer_name'),
+    ]
+    # Pairs of two earlier records were settled by a previous scan
+    return [pairs[pairs['entry_id'] > last_record_id] for pairs in found]
+
+def _proof_pairs(connection, last_proof_id, max_proof_id, result):
+    """Records sharing a proof file with a proof uploaded since the last scan"""
+    in_range = proofs.c.id.between(last_proof_id + 1, max_proof_id)
+    result.proofs_scanned = connection.execute(select(func.count()).where(in_range)).scalar()
+    if not result.proofs_scanned:
+        return pd.DataFrame(columns=PAIR_COLUMNS)
+
+    # Only hashes on more than one record are read, found with the content_hash index
+    shared = select(proofs.c.content_hash).where(proofs.c.content_hash.isnot(None))
+    if last_proof_id:
+        new_hashes = select(proofs.c.content_hash).where(in_range)
+        shared = shared.where(proofs.c.content_hash.in_(new_hashes))
+    shared = shared.group_by(proofs.c.content_hash).having(func.count(proofs.c.payment_id.distinct()) > 1)
+
+    frame = pd.DataFrame(connection.execute(
+        select(proofs.c.payment_id, proofs.c.content_hash)
+        .where(proofs.c.content_hash.in_(shared) & (proofs.c.id <= max_proof_id))
+    ).fetchall(), columns=['payment_id', 'content_hash'])
+    if frame.empty:
+        return pd.DataFrame(columns=PAIR_COLUMNS)
+
+    ordered = pd.DataFrame({
+        'hash': _hash_keys(frame['content_hash']),
+        'id': frame['payment_id'].to_numpy(dtype=np.int64),
+    }).drop_duplicates().sort_values(['hash', 'id'])
+    hash_key, record_id = ordered['hash'].to_numpy(), ordered['id'].to_numpy()
+
+    # Sorted by record id within a hash, so each record pairs with the one before it
+    match = hash_key[1:] == hash_key[:-1]
+    return pd.DataFrame({
+        'entry_id': record_id[1:][match],
+        'duplicate_of_id': record_id[:-1][match],
+        'rule': 'proof_hash',
+    })
+
+def _drop_known(connection, pairs):
+    """Remove pairs already recorded, whatever their status"""
+    if pairs.empty:
+        return pairs
+    known = pd.DataFrame(connection.execute(
+        select(candidates.c.entry_id, candidates.c.duplicate_of_id)
+        .where(candidates.c.entry_id >= int(pairs['entry_id'].min()))
+    ).fetchall(), columns=['entry_id', 'duplicate_of_id'])
+    if known.empty:
+        return pairs
+
+    merged = pairs.merge(known.astype(np.int64), on=['entry_id', 'duplicate_of_id'], how='left', indicator=True)
+    return merged[merged['_merge'] == 'left_only'][PAIR_COLUMNS]
+
+def scan_duplicates(engine, window_days=DEFAULT_WINDOW_DAYS, full=False, fetch_size=FETCH_SIZE):
+    """
+    Flag likely duplicate payment records as DuplicateCandidate rows.
+
+    Only records and proofs added since the previous scan are compared, against
+    each other and against earlier rows that could match them; full=True
+    compares everything again (pairs already flagged or dismissed are kept
+    as they are). A pair is flagged when the two records:
+      - share a proof file (same content hash)
+      - have the same loan ID and amount, paid within window_days
+      - have near-identical customer names and the same amount, paid within
+        window_days, under different loan IDs
+
+    Returns:
+        ScanResult
+    """
+    if not _scan_lock.acquire(blocking=False):
+        raise ScanInProgress("A duplicate scan is already running")
+
+    try:
+        result = ScanResult()
+        started_at = datetime.utcnow()
+        with engine.begin() as connection:
+            last = None if full else connection.execute(
+                select(scans.c.last_record_id, scans.c.last_proof_id).order_by(scans.c.id.desc()).limit(1)
+            ).first()
+            last_record_id, last_proof_id = last if last else (0, 0)
+            # Rows added while the scan runs are left for the next one
+            max_record_id = connection.execute(select(func.max(records.c.id))).scalar() or 0
+            max_proof_id = connection.execute(select(func.max(proofs.c.id))).scalar() or 0
+
+            found = [_proof_pairs(connection, last_proof_id, max_proof_id, result)]
+            found.extend(_record_pairs(connection, last_record_id, max_record_id, window_days, fetch_size, result))
+            found = [pairs for pairs in found if not pairs.empty]
+
+            pairs = pd.DataFrame(columns=PAIR_COLUMNS)
+            if found:
+                # Strongest rule first, so it is the one kept for the pair
+                pairs = pd.concat(found, ignore_index=True)
+                pairs = pairs.astype({'entry_id': np.int64, 'duplicate_of_id': np.int64})
+                pairs = pairs.drop_duplicates(['entry_id', 'duplicate_of_id'])
+                pairs = _drop_known(connection, pairs)
+
+            rows = [
+                {'entry_id': entry_id, 'duplicate_of_id': duplicate_of_id, 'rule': rule,
+                 'status': 'open', 'detected_at': started_at}
+                for entry_id, duplicate_of_id, rule in zip(
+                    pairs['entry_id'].tolist(), pairs['duplicate_of_id'].tolist(), pairs['rule'].tolist()
+                )
+            ]
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                connection.execute(candidates.insert(), rows[start:start + INSERT_BATCH_SIZE])
+            for row in rows:
+                result.found[row['rule']] += 1
+
+            connection.execute(scans.insert().values(
+                started_at=started_at,
+                finished_at=datetime.utcnow(),
+                last_record_id=max(max_record_id, last_record_id),
+                last_proof_id=max(max_proof_id, last_proof_id),
+                records_scanned=result.records_scanned,
+                candidates_found=result.total
+            ))
+        return result
+    finally:
+        _scan_lock.release()
+
+def open_candidates(limit=50):
+    """Open candidates for the TL dispute page, newest first, with both records loaded"""
+    return DuplicateCandidate.query.filter_by(status='open')\
+        .options(joinedload(DuplicateCandidate.entry), joinedload(DuplicateCandidate.duplicate_of))\
+        .order_by(DuplicateCandidate.detected_at.desc(), DuplicateCandidate.id.desc())\
+        .limit(limit)\
+        .all()
+
+def last_scan():
+    return DuplicateScan.query.order_by(DuplicateScan.id.desc()).first()
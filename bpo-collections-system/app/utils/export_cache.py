@@ -0,0 +1,165 @@
+"""
+Reuse of finished export files.
+
+SQLite triggers bump a counter in data_version on every write to
+payment_record and dispute, including bulk statements that bypass the ORM.
+Each export records the counters it was built from. A later export of the
+same type, campaign, dates, format and headers at the same counters is
+given the earlier file instead of being rebuilt.
+
+Files in exports/ are deleted once unused for EXPORT_CACHE_MAX_AGE_DAYS, and
+least recently used first while the folder is over EXPORT_CACHE_MAX_MB.
+"""
+import os
+import time
+from datetime import datetime
+from sqlalchemy import event, text
+from flask import current_app
+from app import db
+from app.models import DataVersion, ExportHistory
+from app.utils.export_helpers import EXPORT_FORMATS
+from app.utils.file_serving import project_root
+
+VERSIONED_TABLES = ('payment_record', 'dispute')
+
+# Tables each export type reads
+EXPORT_TABLES = {
+    'campaign': ('payment_record',),
+    'dispute': ('dispute', 'payment_record'),
+}
+
+DATA_VERSION_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS data_version_{table}_{suffix} AFTER {operation} ON {table} BEGIN
+        UPDATE data_version SET version = version + 1 WHERE name = '{table}';
+    END
+    """
+    for table in VERSIONED_TABLES
+    for suffix, operation in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))
+]
+
+# Files touched this recently may still be being written, and are never deleted
+RECENT_SECONDS = 600
+
+def install_data_version(connection):
+    """Create the data_version rows and triggers if missing"""
+    for table in VERSIONED_TABLES:
+        connection.execute(text("INSERT OR IGNORE INTO data_version (name, version) VALUES (:name, 0)"),
+                           {'name': table})
+    for statement in DATA_VERSION_TRIGGERS:
+        connection.execute(text(statement))
+
+@event.listens_for(db.Model.metadata, 'after_create')
+def _create_data_version(target, connection, tables=(), **kw):
+    if connection.dialect.name == 'sqlite' and DataVersion.__table__ in tables:
+        install_data_version(connection)
+
+def data_version(export_type):
+    """
+    Stamp of the data an export of this type reads, e.g. 'dispute:12,payment_record:40',
+    or None when writes aren't tracked (the triggers only exist on SQLite)
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return None
+
+    tables = EXPORT_TABLES[export_type]
+    versions = dict(db.session.query(DataVersion.name, DataVersion.version).filter(DataVersion.name.in_(tables)))
+    if len(versions) < len(tables):
+        return None
+    return ','.join(f'{table}:{versions[table]}' for table in tables)
+
+def _export_path(filename):
+    return os.path.join(project_root(), 'exports', filename)
+
+def find_cached_export(export_type, campaign, start_date, end_date, export_format, include_headers):
+    """
+    Return the newest finished export with these options built from the
+    current data whose file is still on disk, or None
+    """
+    version = data_version(export_type)
+    if version is None:
+        return None
+
+    candidates = ExportHistory.query.filter_by(
+        export_type=export_type,
+        campaign=campaign or None,
+        start_date=start_date,
+        end_date=end_date,
+        export_format=export_format,
+        include_headers=include_headers,
+        data_version=version,
+        feed=None,  # incremental exports depend on when they ran, so are never reused
+        status='completed'
+    ).filter(ExportHistory.filename != '').order_by(ExportHistory.id.desc())
+
+    for job in candidates:
+        path = _export_path(job.filename)
+        if os.path.exists(path):
+            # Being served counts as a use, so clean_export_dir keeps it longer
+            os.utime(path)
+            return job
+    return None
+
+def reuse_export(cached, created_by):
+    """Log an export answered with an earlier export's file, and return the new ExportHistory row"""
+    job = ExportHistory(
+        export_type=cached.export_type,
+        campaign=cached.campaign,
+        start_date=cached.start_date,
+        end_date=cached.end_date,
+        export_format=cached.export_format,
+        include_headers=cached.include_headers,
+        data_version=cached.data_version,
+        record_count=cached.record_count,
+        total_rows=cached.total_rows,
+        filename=cached.filename,
+        created_by=created_by,
+        status='completed',
+        progress=100,
+        completed_at=datetime.utcnow()
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def clean_export_dir():
+    """
+    Delete export files unused for EXPORT_CACHE_MAX_AGE_DAYS, then the least
+    recently used ones while exports/ is over EXPORT_CACHE_MAX_MB, and mark
+    their history entries expired.
+
+    Returns:
+        Names of the deleted files
+    """
+    max_age = current_app.config.get('EXPORT_CACHE_MAX_AGE_DAYS', 7) * 86400
+    max_bytes = current_app.config.get('EXPORT_CACHE_MAX_MB', 2048) * 1024 * 1024
+    export_dir = os.path.join(project_root(), 'exports')
+    if not os.path.isdir(export_dir):
+        return []
+
+    files = []
+    for entry in os.scandir(export_dir):
+        if entry.is_file() and entry.name.endswith(tuple('.' + extension for extension in EXPORT_FORMATS)):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.name))
+
+    now = time.time()
+    total = sum(size for _, size, _ in files)
+    removed = []
+    # Least recently used first; every later file is newer, so stop at the first one kept
+    for modified, size, name in sorted(files):
+        if now - modified < RECENT_SECONDS or (now - modified < max_age and total <= max_bytes):
+            break
+        try:
+            os.remove(os.path.join(export_dir, name))
+        except OSError:
+            continue
+        total -= size
+        removed.append(name)
+
+    for start in range(0, len(removed), 500):
+        ExportHistory.query.filter(ExportHistory.filename.in_(removed[start:start + 500]))\
+            .update({'status': 'expired'}, synchronize_session=False)
+    if removed:
+        db.session.commit()
+    return removed
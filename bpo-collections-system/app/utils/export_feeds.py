@@ -0,0 +1,66 @@
+"""
+Incremental exports for downstream feeds.
+
+An incremental export only holds what changed since the previous export of
+the same feed: payment records created (created_at) and disputes approved
+(da_verified_at) since then. Each export of a feed stores the window it
+covered in ExportHistory.delta_since and delta_until. The next export starts
+at the delta_until of the last one that finished, so a failed export is
+simply covered by the next. A feed is a name shared by whoever exports it,
+or the analyst's own username when none is given.
+
+An export still queued or running after EXPORT_JOB_TIMEOUT_MINUTES was lost
+to a restart or a crashed worker. It is marked failed the next time its feed
+is exported, so it doesn't hold the feed up for good.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import ExportHistory
+
+def _feed_exports(export_type, feed, campaign):
+    return ExportHistory.query.filter(
+        ExportHistory.feed == feed,
+        ExportHistory.export_type == export_type,
+        ExportHistory.campaign.is_(None) if campaign is None else ExportHistory.campaign == campaign
+    )
+
+def pending_feed_export(export_type, feed, campaign=None):
+    """The feed's export that is still queued or running, if any. Abandoned ones are marked failed."""
+    timeout = current_app.config.get('EXPORT_JOB_TIMEOUT_MINUTES', 120)
+    cutoff = datetime.utcnow() - timedelta(minutes=timeout)
+
+    pending = _feed_exports(export_type, feed, campaign)\
+        .filter(ExportHistory.status.in_(('queued', 'running')))\
+        .order_by(ExportHistory.id.desc())\
+        .all()
+    live = [job for job in pending if job.created_at is None or job.created_at >= cutoff]
+
+    abandoned = [job for job in pending if job not in live]
+    for job in abandoned:
+        job.error_message = f"Still {job.status} after {timeout} minutes; its worker was stopped"
+        job.status = 'failed'
+        job.completed_at = datetime.utcnow()
+    if abandoned:
+        db.session.commit()
+
+    return live[0] if live else None
+
+def feed_window(export_type, feed, campaign=None):
+    """
+    Window the next incremental export of a feed covers.
+
+    Returns:
+        (since, until): since is None for the feed's first export, which
+        then holds everything up to until
+    """
+    last = _feed_exports(export_type, feed, campaign)\
+        .filter(ExportHistory.status.in_(('completed', 'expired')), ExportHistory.delta_until.isnot(None))\
+        .order_by(ExportHistory.delta_until.desc())\
+        .first()
+    since = last.delta_until if last else None
+
+    until = datetime.utcnow() - timedelta(seconds=current_app.config.get('EXPORT_DELTA_LAG_SECONDS', 60))
+    if since and until < since:
+        until = since
+    return since, until
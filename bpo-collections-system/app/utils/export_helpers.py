@@ -1,160 +1,506 @@
+import csv
+import io
 import os
+import secrets
+import zlib
 import pandas as pd
-from datetime import datetime
+import xlsxwriter
+from datetime import date, datetime
 from flask import current_app
+from sqlalchemy.orm import contains_eager
 
-def export_to_excel(data_dict, filename):
+# Output formats offered on the export page: {format: label}. The format is
+# also the file extension.
+EXPORT_FORMATS = {
+    'xlsx': 'Excel workbook (.xlsx)',
+    'csv': 'CSV',
+    'csv.gz': 'CSV, gzip compressed',
+    'parquet': 'Parquet',
+}
+
+# CSV formats can be sent to the browser while the query is still running
+STREAMED_FORMATS = ('csv', 'csv.gz')
+
+def _export_dir():
+    """Return the exports directory, creating it if it doesn't exist"""
+    export_dir = os.path.join(current_app.root_path, '..', 'exports')
+    os.makedirs(export_dir, exist_ok=True)
+    return export_dir
+
+def _safe_sheet_name(sheet_name):
+    """Clean sheet name (Excel has 31 character limit and no special chars)"""
+    safe_sheet_name = str(sheet_name)[:31]
+    safe_sheet_name = ''.join(c if c.isalnum() or c in [' ', '_'] else '_' for c in safe_sheet_name)
+    return safe_sheet_name or "Sheet1"
+
+def _export_filename(prefix, export_format):
+    """Timestamped file name, with a random suffix so exports started in the same second never share a file"""
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{secrets.token_hex(3)}.{export_format}"
+
+def export_to_excel(data_dict, filename, include_headers=True):
     """
     Export data dictionary to Excel file with multiple sheets
     
     Args:
         data_dict: Dictionary where keys are sheet names and values are DataFrames
         filename: Name of the Excel file to create
+        include_headers: Write the column names as the first row of each sheet
     
     Returns:
         Path to the created Excel file
     """
-    # Create exports directory if it doesn't exist
-    export_dir = os.path.join(current_app.root_path, '..', 'exports')
-    os.makedirs(export_dir, exist_ok=True)
-    
     # Full path for the export file
-    export_path = os.path.join(export_dir, filename)
+    export_path = os.path.join(_export_dir(), filename)
     
     # Create Excel file with multiple sheets
     with pd.ExcelWriter(export_path, engine='xlsxwriter') as writer:
         for sheet_name, df in data_dict.items():
-            # Clean sheet name (Excel has 31 character limit and no special chars)
-            safe_sheet_name = str(sheet_name)[:31]
-            safe_sheet_name = ''.join(c if c.isalnum() or c in [' ', '_'] else '_' for c in safe_sheet_name)
-            if not safe_sheet_name:
-                safe_sheet_name = "Sheet1"
+            safe_sheet_name = _safe_sheet_name(sheet_name)
             
             # Write dataframe to sheet
-            df.to_excel(writer, sheet_name=safe_sheet_name, index=False)
+            df.to_excel(writer, sheet_name=safe_sheet_name, index=False, header=include_headers)
             
             # Auto-adjust columns width
             worksheet = writer.sheets[safe_sheet_name]
             for i, col in enumerate(df.columns):
                 max_width = max(
-                    df[col].astype(str).map(len).max(),
+                    df[col].fillna('').astype(str).map(len).max(),
                     len(col)
                 ) + 2  # Add a little extra space
                 worksheet.set_column(i, i, max_width)
     
     return export_path
 
-def export_campaign_data(campaign=None, start_date=None, end_date=None, include_headers=True):
+class StreamingExcelWriter:
     """
-    Export campaign data to Excel file with multiple sheets by campaign
+    Write rows straight into an xlsxwriter workbook in constant-memory mode.
+    
+    Rows are flushed to disk as soon as the next row is started, so memory use
+    stays flat no matter how many records are exported. Column widths are
+    tracked as running maxima and applied when the workbook is closed.
     """
+    
+    def __init__(self, export_path, columns, include_headers=True):
+        self.columns = columns
+        self.include_headers = include_headers
+        # Payment data is plain text: don't turn values that look like URLs into links
+        self.workbook = xlsxwriter.Workbook(export_path, {'constant_memory': True, 'strings_to_urls': False})
+        self.header_format = self.workbook.add_format({
+            'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'
+        })
+        self.date_format = self.workbook.add_format({'num_format': 'yyyy-mm-dd'})
+        self.datetime_format = self.workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+        # Number the formats now rather than in order of first use, so every
+        # workbook has the same style table and sheet XML rendered in one can be
+        # moved into another (see app/utils/parallel_export.py). xlsxwriter has
+        # no public call for this; _get_xf_index is private, hence the version
+        # pinned in requirements.txt. Check parallel exports still match the
+        # in-process ones (tests/test_parallel_export.py) before moving it.
+        for cell_format in (self.header_format, self.date_format, self.datetime_format):
+            cell_format._get_xf_index()
+        self.sheets = {}
+    
+    def add_sheet(self, sheet_name, first_row=None):
+        """
+        Add a sheet with the header row already written (unless the writer
+        was made without headers).
+        
+        Given first_row, the sheet has no header and rows are written from that
+        (0-based) row on instead, for rendering one slice of a larger sheet.
+        """
+        worksheet = self.workbook.add_worksheet(_safe_sheet_name(sheet_name))
+        if first_row is None and self.include_headers:
+            for col, header in enumerate(self.columns):
+                worksheet.write_string(0, col, header, self.header_format)
+            first_row = 1
+        elif first_row is None:
+            first_row = 0
+        
+        # Track [worksheet, next row, column widths]
+        self.sheets[sheet_name] = [worksheet, first_row, [len(header) for header in self.columns]]
+        return worksheet
+    
+    def write_row(self, sheet_name, values):
+        """Append one row of values to the given sheet"""
+        sheet = self.sheets[sheet_name]
+        worksheet, row, widths = sheet
+        
+        for col, value in enumerate(values):
+            if value is None:
+                # An empty cell doesn't widen its column
+                continue
+            if isinstance(value, datetime):
+                worksheet.write_datetime(row, col, value, self.datetime_format)
+            elif isinstance(value, date):
+                worksheet.write_datetime(row, col, value, self.date_format)
+            else:
+                worksheet.write(row, col, value)
+            widths[col] = max(widths[col], len(str(value)))
+        
+        sheet[1] = row + 1
+    
+    def widen(self, sheet_name, widths):
+        """Raise a sheet's column widths to at least the given ones"""
+        sheet = self.sheets[sheet_name]
+        sheet[2] = [max(current, width) for current, width in zip(sheet[2], widths)]
+    
+    def column_widths(self, sheet_name):
+        """Widest value seen so far in each column of a sheet"""
+        return list(self.sheets[sheet_name][2])
+    
+    def close(self):
+        """Apply the column widths and finish the workbook"""
+        for worksheet, _, widths in self.sheets.values():
+            for i, width in enumerate(widths):
+                worksheet.set_column(i, i, width + 2)  # Add a little extra space
+        self.workbook.close()
+
+# Column layout for campaign exports: (header, PaymentRecord attribute)
+CAMPAIGN_EXPORT_COLUMNS = [
+    ('Loan ID', 'loan_id'),
+    ('Customer Name', 'customer_name'),
+    ('Amount', 'amount'),
+    ('Date Paid', 'date_paid'),
+    ('Operator', 'operator_name'),
+    ('Campaign', 'campaign'),
+    ('DPD', 'dpd'),
+    ('Entry Date', 'created_at'),
+]
+
+# Column layout for dispute exports: (header, value type). Excel has a sheet
+# per campaign; CSV and Parquet have one table with a Campaign column first.
+DISPUTE_EXPORT_COLUMNS = [
+    ('Dispute ID', int),
+    ('Loan ID', str),
+    ('Customer Name', str),
+    ('Amount', float),
+    ('Original Operator', str),
+    ('Original Date Paid', date),
+    ('Reason', str),
+    ('Corrected Operator', str),
+    ('Corrected Amount', float),
+    ('Corrected Date Paid', date),
+    ('Duplicate', str),
+    ('Applied At', datetime),
+    ('Corrected Details', str),
+    ('Validated By', str),
+    ('Validation Date', datetime),
+    ('DA Verified By', str),
+    ('DA Verification Date', datetime),
+]
+
+# Number of rows fetched from the database per round trip while exporting
+EXPORT_BATCH_SIZE = 2000
+
+def campaign_export_columns():
+    """CAMPAIGN_EXPORT_COLUMNS as (header, value type), the types read from PaymentRecord"""
     from app.models import PaymentRecord
-    from sqlalchemy import func
     
-    # Build base query
-    query = PaymentRecord.query
+    return [(header, getattr(PaymentRecord, attr).type.python_type) for header, attr in CAMPAIGN_EXPORT_COLUMNS]
+
+def iter_csv(headers, rows, include_headers=True, compress=False):
+    """
+    Encode rows as UTF-8 CSV, gzipped if compress is set.
+    
+    Yields bytes after every EXPORT_BATCH_SIZE rows, so a response can start
+    sending while rows are still being read.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    
+    def take():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+    
+    if include_headers:
+        writer.writerow(headers)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            chunk = take()
+            if chunk:
+                yield chunk
+    
+    chunk = take()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+def parquet_available():
+    """Parquet exports need pyarrow, which is an optional dependency"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def write_parquet(export_path, columns, rows):
+    """
+    Write rows to a Parquet file, one row group per EXPORT_BATCH_SIZE rows.
+    
+    Args:
+        columns: List of (header, value type) giving the column names and types
+        rows: Iterable of value tuples in column order
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError('Parquet exports need pyarrow: pip install pyarrow')
+    
+    arrow_types = {str: pa.string(), int: pa.int64(), float: pa.float64(), bool: pa.bool_(),
+                   date: pa.date32(), datetime: pa.timestamp('us')}
+    schema = pa.schema([(header, arrow_types[value_type]) for header, value_type in columns])
+    
+    def flush(batch):
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+    
+    with pq.ParquetWriter(export_path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == EXPORT_BATCH_SIZE:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+def _write_flat_file(export_path, export_format, columns, rows, include_headers):
+    """Write rows to a CSV, gzipped CSV or Parquet file"""
+    if export_format == 'parquet':
+        write_parquet(export_path, columns, rows)
+        return
+    
+    chunks = iter_csv([header for header, _ in columns], rows, include_headers, export_format == 'csv.gz')
+    with open(export_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+def _counted(rows, counter, progress_callback=None, total=None):
+    """Pass rows through, counting them in counter[0] and reporting progress every batch"""
+    for row in rows:
+        yield row
+        counter[0] += 1
+        if progress_callback and counter[0] % EXPORT_BATCH_SIZE == 0:
+            progress_callback(counter[0], total)
+
+def campaign_export_criteria(campaign=None, start_date=None, end_date=None, since=None, until=None):
+    """
+    Filter conditions on PaymentRecord selecting the rows of a campaign export.
+    An incremental export only takes records created after since, up to until.
+    """
+    from app.models import PaymentRecord
+    
+    # Records an approved dispute marked as duplicates are not collections
+    criteria = [PaymentRecord.is_duplicate.is_(False)]
     
-    # Apply filters
     if campaign:
-        query = query.filter_by(campaign=campaign)
+        criteria.append(PaymentRecord.campaign == campaign)
     if start_date:
-        query = query.filter(PaymentRecord.date_paid >= start_date)
+        criteria.append(PaymentRecord.date_paid >= start_date)
     if end_date:
-        query = query.filter(PaymentRecord.date_paid <= end_date)
+        criteria.append(PaymentRecord.date_paid <= end_date)
+    if since:
+        criteria.append(PaymentRecord.created_at > since)
+    if until:
+        criteria.append(PaymentRecord.created_at <= until)
     
-    # Get all records
-    records = query.all()
+    return criteria
+
+def _campaign_export_query(campaign=None, start_date=None, end_date=None, since=None, until=None):
+    """Build the filtered PaymentRecord query shared by the campaign export steps"""
+    from app.models import PaymentRecord
     
-    # Group records by campaign
-    campaigns = {}
-    for record in records:
-        campaign_name = record.campaign or "No Campaign"
-        if campaign_name not in campaigns:
-            campaigns[campaign_name] = []
-        
-        campaigns[campaign_name].append({
-            'Loan ID': record.loan_id,
-            'Customer Name': record.customer_name,
-            'Amount': record.amount,
-            'Date Paid': record.date_paid,
-            'Operator': record.operator_name,
-            'Campaign': record.campaign,
-            'DPD': record.dpd,
-            'Entry Date': record.created_at
-        })
+    return PaymentRecord.query.filter(*campaign_export_criteria(campaign, start_date, end_date, since, until))
+
+def _campaign_export_rows(query):
+    """The exported columns of every record the query selects, in id order, fetched in batches"""
+    from app.models import PaymentRecord
     
-    # Create a dictionary of DataFrames by campaign
-    data_dict = {}
-    record_count = 0
+    return query.with_entities(*[getattr(PaymentRecord, attr) for _, attr in CAMPAIGN_EXPORT_COLUMNS])\
+        .order_by(PaymentRecord.id)\
+        .execution_options(stream_results=True)\
+        .yield_per(EXPORT_BATCH_SIZE)
+
+def campaign_sheet_order(query):
+    """
+    Campaigns of a campaign export query, in order of each one's first record.
+
+    Sheets are created up front in this order, which keeps the same sheet
+    order as building them while iterating.
+    """
+    from app.models import PaymentRecord
+    from sqlalchemy import func
     
-    # Create the summary data with the same column structure
-    summary_data = []
+    return [
+        row[0] for row in query.with_entities(PaymentRecord.campaign)
+        .group_by(PaymentRecord.campaign)
+        .order_by(func.min(PaymentRecord.id))
+    ]
+
+def export_campaign_data(campaign=None, start_date=None, end_date=None, include_headers=True,
+                         progress_callback=None, processes=None, export_format='xlsx', since=None, until=None):
+    """
+    Export campaign data to Excel file with multiple sheets by campaign, or
+    to a single CSV or Parquet table (export_format).
     
-    # Process each campaign
-    for campaign_name, campaign_records in campaigns.items():
-        # Convert records to DataFrame
-        df = pd.DataFrame(campaign_records)
-        data_dict[campaign_name] = df
-        record_count += len(campaign_records)
+    With until set, only records created after since (if any) and up to
+    until are exported, see app/utils/export_feeds.py.
+    
+    Records are streamed from the database in batches and written directly to
+    the file, so the full result set is never held in memory. If given,
+    progress_callback(processed, total) is called after every batch.
+    
+    Exports of at least EXPORT_PARALLEL_MIN_ROWS records are rendered on a pool
+    of `processes` worker processes (EXPORT_PROCESSES by default) when that is
+    more than one, see app/utils/parallel_export.py.
+    """
+    query = _campaign_export_query(campaign, start_date, end_date, since, until)
+    prefix = f"{campaign}_records" if campaign else "all_records"
+    filename = _export_filename(f"{prefix}_delta" if until else prefix, export_format)
+    export_path = os.path.join(_export_dir(), filename)
+    
+    if export_format != 'xlsx':
+        counter = [0]
+        total = query.count() if progress_callback else None
+        rows = _counted(_campaign_export_rows(query), counter, progress_callback, total)
+        _write_flat_file(export_path, export_format, campaign_export_columns(), rows, include_headers)
+        if progress_callback:
+            progress_callback(counter[0], counter[0])
+        return export_path, filename, counter[0]
+    
+    campaign_names = campaign_sheet_order(query)
+    
+    if processes is None:
+        processes = current_app.config.get('EXPORT_PROCESSES', 0)
+    if processes > 1 and campaign_names:
+        from app.utils.parallel_export import worker_database_url, write_campaign_workbook
         
-        # Add all records to summary
-        summary_data.extend(campaign_records)
+        if worker_database_url() and query.count() >= current_app.config.get('EXPORT_PARALLEL_MIN_ROWS', 0):
+            record_count = write_campaign_workbook(
+                export_path, query, campaign_names, (campaign, start_date, end_date, since, until), processes,
+                current_app.config.get('EXPORT_PART_ROWS', 20000), include_headers, progress_callback
+            )
+            if progress_callback:
+                progress_callback(record_count, record_count)
+            return export_path, filename, record_count
     
-    # Create summary DataFrame with the same columns
-    if summary_data:
-        summary_df = pd.DataFrame(summary_data)
-        data_dict['Summary'] = summary_df
+    writer = StreamingExcelWriter(export_path, [header for header, _ in CAMPAIGN_EXPORT_COLUMNS], include_headers)
     
-    # Generate filename
-    if campaign:
-        filename = f"{campaign}_records_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx"
-    else:
-        filename = f"all_records_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx"
+    for campaign_name in campaign_names:
+        writer.add_sheet(campaign_name or "No Campaign")
+    if campaign_names:
+        writer.add_sheet('Summary')
     
-    # Export to Excel with multiple sheets
-    export_path = export_to_excel(data_dict, filename)
+    # Only fetch the exported columns, in batches
+    rows = _campaign_export_rows(query)
+    
+    campaign_index = [attr for _, attr in CAMPAIGN_EXPORT_COLUMNS].index('campaign')
+    record_count = 0
+    total = query.count() if progress_callback else None
+    
+    for row in rows:
+        writer.write_row(row[campaign_index] or "No Campaign", row)
+        # Every record is also listed on the summary sheet
+        writer.write_row('Summary', row)
+        record_count += 1
+        
+        if progress_callback and record_count % EXPORT_BATCH_SIZE == 0:
+            progress_callback(record_count, total)
+    
+    writer.close()
+    
+    if progress_callback:
+        progress_callback(record_count, record_count)
     
     return export_path, filename, record_count
 
-def export_dispute_data(start_date=None, end_date=None, include_headers=True):
-    """Export approved dispute data to Excel file"""
-    from app.models import Dispute, PaymentRecord
+def _dispute_export_query(start_date=None, end_date=None, since=None, until=None):
+    """
+    Approved disputes, with the record values each applied dispute replaced.
+    An incremental export only takes disputes approved after since, up to until.
+    """
+    from app.models import Dispute, PaymentRecord, PaymentRecordVersion
     
-    # Build query
-    query = Dispute.query.filter_by(status='approved')
+    # Each dispute's payment record comes from the same join, not a query per dispute
+    query = Dispute.query.filter_by(status='approved')\
+        .join(Dispute.payment_record)\
+        .options(contains_eager(Dispute.payment_record))\
+        .outerjoin(PaymentRecordVersion, PaymentRecordVersion.dispute_id == Dispute.id)\
+        .add_entity(PaymentRecordVersion)\
+        .order_by(Dispute.id)
     
-    if start_date or end_date:
-        query = query.join(Dispute.payment_record)
-        
-        if start_date:
-            query = query.filter(PaymentRecord.date_paid >= start_date)
-        if end_date:
-            query = query.filter(PaymentRecord.date_paid <= end_date)
+    if since:
+        query = query.filter(Dispute.da_verified_at > since)
+    if until:
+        query = query.filter(Dispute.da_verified_at <= until)
+    if start_date:
+        query = query.filter(PaymentRecord.date_paid >= start_date)
+    if end_date:
+        query = query.filter(PaymentRecord.date_paid <= end_date)
+    
+    return query
+
+def _dispute_export_rows(query):
+    """(campaign, values in DISPUTE_EXPORT_COLUMNS order) for each dispute, fetched in batches"""
+    for dispute, original in query.yield_per(EXPORT_BATCH_SIZE):
+        record = dispute.payment_record
+        # Once applied, the record holds the corrected values and the version the original ones
+        original = original or record
+        yield record.campaign or "No Campaign", (
+            dispute.id,
+            record.loan_id,
+            record.customer_name,
+            original.amount,
+            original.operator_name,
+            original.date_paid,
+            dispute.reason,
+            dispute.corrected_operator,
+            dispute.corrected_amount,
+            dispute.corrected_date_paid,
+            'Yes' if dispute.mark_duplicate else '',
+            dispute.applied_at,
+            dispute.corrected_details,
+            dispute.validated_by,
+            dispute.validated_at,
+            dispute.da_verified_by,
+            dispute.da_verified_at,
+        )
+
+def export_dispute_data(start_date=None, end_date=None, include_headers=True, progress_callback=None,
+                        export_format='xlsx', since=None, until=None):
+    """
+    Export approved dispute data to Excel file, or to a CSV or Parquet table
+    (export_format). With until set, only disputes approved after since (if
+    any) and up to until are exported.
+    """
+    query = _dispute_export_query(start_date, end_date, since, until)
+    filename = _export_filename('validated_disputes_delta' if until else 'validated_disputes', export_format)
     
-    records = query.all()
+    if export_format != 'xlsx':
+        export_path = os.path.join(_export_dir(), filename)
+        counter = [0]
+        total = query.count() if progress_callback else None
+        rows = ((campaign_name,) + values for campaign_name, values in _dispute_export_rows(query))
+        _write_flat_file(export_path, export_format, [('Campaign', str)] + DISPUTE_EXPORT_COLUMNS,
+                         _counted(rows, counter, progress_callback, total), include_headers)
+        if progress_callback:
+            progress_callback(counter[0], counter[0])
+        return export_path, filename, counter[0]
     
     # Group disputes by campaign
     campaigns = {}
-    for dispute in records:
-        campaign_name = dispute.payment_record.campaign or "No Campaign"
-        if campaign_name not in campaigns:
-            campaigns[campaign_name] = []
-        
-        campaigns[campaign_name].append({
-            'Dispute ID': dispute.id,
-            'Loan ID': dispute.payment_record.loan_id,
-            'Customer Name': dispute.payment_record.customer_name,
-            'Amount': dispute.payment_record.amount,
-            'Original Operator': dispute.payment_record.operator_name,
-            'Reason': dispute.reason,
-            'Corrected Details': dispute.corrected_details,
-            'Validated By': dispute.validated_by,
-            'Validation Date': dispute.validated_at,
-            'DA Verified By': dispute.da_verified_by,
-            'DA Verification Date': dispute.da_verified_at
-        })
+    for campaign_name, values in _dispute_export_rows(query):
+        campaigns.setdefault(campaign_name, []).append(values)
     
     # Create DataFrames by campaign
+    headers = [header for header, _ in DISPUTE_EXPORT_COLUMNS]
     data_dict = {}
     record_count = 0
     
@@ -162,7 +508,7 @@ def export_dispute_data(start_date=None, end_date=None, include_headers=True):
     summary_data = []
     
     for campaign_name, campaign_disputes in campaigns.items():
-        df = pd.DataFrame(campaign_disputes)
+        df = pd.DataFrame(campaign_disputes, columns=headers)
         data_dict[campaign_name] = df
         count = len(campaign_disputes)
         record_count += count
@@ -178,10 +524,41 @@ def export_dispute_data(start_date=None, end_date=None, include_headers=True):
         summary_df = pd.DataFrame(summary_data)
         data_dict['Summary'] = summary_df
     
-    # Generate filename
-    filename = f"validated_disputes_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx"
-    
     # Export to Excel with multiple sheets
-    export_path = export_to_excel(data_dict, filename)
+    export_path = export_to_excel(data_dict, filename, include_headers)
+    
+    if progress_callback:
+        progress_callback(record_count, record_count)
+    
+    return export_path, filename, record_count
+
+def csv_export_stream(export_type, campaign=None, start_date=None, end_date=None, include_headers=True,
+                      compress=False, progress_callback=None):
+    """
+    Stream a campaign or dispute export as CSV without writing a file.
+    
+    Returns:
+        (filename, generator of bytes). The query runs as the generator is
+        consumed, so the first rows go out before the last are read.
+        progress_callback(record_count, record_count) is called once it is done.
+    """
+    export_format = 'csv.gz' if compress else 'csv'
+    
+    if export_type == 'campaign':
+        query = _campaign_export_query(campaign, start_date, end_date)
+        filename = _export_filename(f"{campaign}_records" if campaign else "all_records", export_format)
+        columns = campaign_export_columns()
+        rows = _campaign_export_rows(query)
+    else:
+        query = _dispute_export_query(start_date, end_date)
+        filename = _export_filename('validated_disputes', export_format)
+        columns = [('Campaign', str)] + DISPUTE_EXPORT_COLUMNS
+        rows = ((campaign_name,) + values for campaign_name, values in _dispute_export_rows(query))
+    
+    def generate():
+        counter = [0]
+        yield from iter_csv([header for header, _ in columns], _counted(rows, counter), include_headers, compress)
+        if progress_callback:
+            progress_callback(counter[0], counter[0])
     
-    return export_path, filename, record_count
\ No newline at end of file
+    return filename, generate()
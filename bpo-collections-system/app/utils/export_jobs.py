@@ -0,0 +1,184 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from app import db
+from app.utils.export_cache import clean_export_dir, data_version, find_cached_export, reuse_export
+from app.utils.export_feeds import feed_window, pending_feed_export
+
+# Live progress of jobs running in this process: {job_id: (processed, total)}
+# Only state transitions are written to ExportHistory, so the export's
+# streaming read never has to wait on its own progress writes.
+_live_progress = {}
+_live_lock = threading.Lock()
+
+def init_export_jobs(app):
+    """Create the export worker pool for this app"""
+    workers = app.config.get('EXPORT_WORKERS', 2)
+    app.extensions['export_jobs'] = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix='export-job'
+    )
+
+def submit_export_job(export_type, campaign, start_date, end_date, include_headers, created_by,
+                      export_format='xlsx', feed=None, background=True):
+    """
+    Queue an export and return its ExportHistory row.
+
+    The export runs on the app's worker pool; poll it with get_job_status.
+    If an identical export was already built from the current data, the row
+    returned is completed straight away with that export's file.
+
+    With a feed name, only what changed since the feed's last export is
+    exported (see app/utils/export_feeds.py). If that feed already has an
+    export queued or running, that one is returned instead.
+
+    With background=False the export runs in this thread before returning.
+    """
+    from flask import current_app
+    from app.models import ExportHistory
+
+    campaign = (campaign or None) if export_type == 'campaign' else None
+    since = until = None
+    if feed:
+        pending = pending_feed_export(export_type, feed, campaign)
+        if pending:
+            return pending
+        since, until = feed_window(export_type, feed, campaign)
+    else:
+        cached = find_cached_export(export_type, campaign, start_date, end_date, export_format, include_headers)
+        if cached:
+            return reuse_export(cached, created_by)
+
+    job = ExportHistory(
+        export_type=export_type,
+        campaign=campaign,
+        start_date=start_date,
+        end_date=end_date,
+        export_format=export_format,
+        include_headers=include_headers,
+        feed=feed,
+        delta_since=since,
+        delta_until=until,
+        record_count=0,
+        filename='',
+        created_by=created_by,
+        status='queued',
+        progress=0
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    job_id = job.id
+    with _live_lock:
+        _live_progress[job_id] = (0, None)
+
+    app = current_app._get_current_object()
+    if background:
+        app.extensions['export_jobs'].submit(_run_export_job, app, job_id)
+        return job
+
+    _run_export_job(app, job_id)
+    return ExportHistory.query.get(job_id)
+
+def _run_export_job(app, job_id):
+    """
+    Worker entry point: run one export and record the outcome.
+
+    Whatever fails (loading the job, marking it running, the export itself or
+    the final commit), the job ends 'completed' or 'failed', never stuck in
+    'running'. The outcome is written from a fresh session, so a broken one
+    can't take the failure with it.
+    """
+    def report(processed, total):
+        with _live_lock:
+            _live_progress[job_id] = (processed, total)
+
+    with app.app_context():
+        try:
+            try:
+                _record_outcome(job_id, status='completed', **_build_export(job_id, report))
+            except Exception as e:
+                app.logger.warning(f"Export job {job_id} failed: {e}")
+                try:
+                    _record_outcome(job_id, status='failed', error_message=str(e))
+                except Exception as e:
+                    app.logger.error(f"Could not record the failure of export job {job_id}: {e}")
+        finally:
+            with _live_lock:
+                _live_progress.pop(job_id, None)
+            db.session.remove()
+
+        # Housekeeping only; a failure here doesn't change the job's outcome
+        try:
+            clean_export_dir()
+        except Exception as e:
+            app.logger.warning(f"Cleaning up exports/ failed: {e}")
+        finally:
+            db.session.remove()
+
+def _build_export(job_id, report):
+    """Mark the job running and write its file. Returns the ExportHistory fields to set on completion."""
+    from app.models import ExportHistory
+    from app.utils.export_helpers import export_campaign_data, export_dispute_data
+
+    job = ExportHistory.query.get(job_id)
+    job.status = 'running'
+    # Read before the export, so a write made while it runs makes the file stale, never the reverse
+    job.data_version = data_version(job.export_type)
+    db.session.commit()
+
+    if job.export_type == 'campaign':
+        _, filename, record_count = export_campaign_data(
+            job.campaign, job.start_date, job.end_date, job.include_headers,
+            progress_callback=report, export_format=job.export_format,
+            since=job.delta_since, until=job.delta_until
+        )
+    else:  # disputes
+        _, filename, record_count = export_dispute_data(
+            job.start_date, job.end_date, job.include_headers,
+            progress_callback=report, export_format=job.export_format,
+            since=job.delta_since, until=job.delta_until
+        )
+    return {'filename': filename, 'record_count': record_count, 'total_rows': record_count, 'progress': 100}
+
+def _record_outcome(job_id, **values):
+    """Set the job's final state and completion time in a fresh session"""
+    from app.models import ExportHistory
+
+    db.session.remove()
+    job = ExportHistory.query.get(job_id)
+    if job is None:
+        return
+    for name, value in values.items():
+        setattr(job, name, value)
+    job.completed_at = datetime.utcnow()
+    db.session.commit()
+
+def get_job_status(job):
+    """Return a JSON-ready status dict for an ExportHistory job"""
+    from flask import url_for
+
+    progress = job.progress or 0
+    processed = job.record_count
+    total = job.total_rows
+
+    with _live_lock:
+        live = _live_progress.get(job.id)
+    if live and job.status in ('queued', 'running'):
+        processed, total = live
+        if total:
+            progress = min(99, processed * 100 // total)
+
+    status = {
+        'job_id': job.id,
+        'status': job.status,
+        'progress': progress,
+        'processed_rows': processed,
+        'total_rows': total,
+        'record_count': job.record_count,
+        'error': job.error_message,
+        'download_url': None
+    }
+    if job.status == 'completed':
+        status['download_url'] = url_for('data_analyst.download_export', filename=job.filename)
+
+    return status
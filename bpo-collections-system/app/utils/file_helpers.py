@@ -1,7 +1,80 @@
 import os
-import uuid
+import hashlib
+import tempfile
+import time
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
 from werkzeug.utils import secure_filename
 from flask import current_app
+from app import db
+from app.models import PaymentProof
+from app.utils.previews import queue_preview, remove_preview
+
+# Read uploads in 64 KB chunks while hashing
+CHUNK_SIZE = 64 * 1024
+
+# Hashes checked per query when releasing blobs
+RELEASE_CHUNK = 500
+
+# Blobs being deleted are renamed with this suffix first
+REMOVING_SUFFIX = '.removing'
+
+def proofs_root():
+    """Absolute path of the proof store, created if missing"""
+    uploads_dir = os.path.join(current_app.root_path, '..', 'uploads', 'payment_proofs')
+    os.makedirs(uploads_dir, exist_ok=True)
+    return uploads_dir
+
+def blob_relative_path(content_hash, extension):
+    """
+    Relative path of a stored proof, sharded by the first bytes of its hash
+    (uploads/payment_proofs/ab/cd/abcd...ef.png) so no directory grows too large
+    """
+    return os.path.join('uploads', 'payment_proofs', content_hash[:2], content_hash[2:4],
+                        f"{content_hash}{extension}")
+
+def store_proof_file(file):
+    """
+    Stream one upload into the content-addressed store.
+
+    The file is written to a temporary file while its SHA-256 is computed, then
+    moved to its hashed location. If identical content is already stored, the
+    existing blob is reused and the temporary copy discarded. Either way the
+    blob's modification time is now, which keeps it through the grace period
+    of release_proof_blobs while the caller's PaymentProof row is uncommitted.
+
+    Returns:
+        (relative path, sha256 hex digest)
+    """
+    uploads_dir = proofs_root()
+    extension = os.path.splitext(secure_filename(file.filename))[1].lower()
+    digest = hashlib.sha256()
+
+    tmp = tempfile.NamedTemporaryFile(dir=uploads_dir, prefix='.upload-', delete=False)
+    try:
+        with tmp:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        content_hash = digest.hexdigest()
+        relative_path = blob_relative_path(content_hash, extension)
+        blob_path = os.path.join(current_app.root_path, '..', relative_path)
+
+        try:
+            # Same content uploaded before, keep the existing blob
+            os.utime(blob_path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(tmp.name, blob_path)
+    finally:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+
+    return relative_path, content_hash
 
 def save_payment_proofs(files, proof_type):
     """
@@ -9,23 +82,125 @@ def save_payment_proofs(files, proof_type):
     """
     if not files or not files[0]:
         return []
-        
+
     proofs = []
-    uploads_dir = os.path.join(current_app.root_path, '..', 'uploads', 'payment_proofs')
-    os.makedirs(uploads_dir, exist_ok=True)
-    
+
     for file in files:
         if file and file.filename:
-            filename = secure_filename(file.filename)
-            unique_filename = f"{uuid.uuid4().hex}_{filename}"
-            file_path = os.path.join(uploads_dir, unique_filename)
-            file.save(file_path)
-            
-            # Return the relative path to store in the database
-            relative_path = os.path.join('uploads', 'payment_proofs', unique_filename)
+            relative_path, content_hash = store_proof_file(file)
+            # Render the list thumbnail now rather than on the first page view
+            queue_preview(os.path.join(current_app.root_path, '..', relative_path), content_hash)
             proofs.append({
                 'path': relative_path,
-                'type': proof_type
+                'type': proof_type,
+                'hash': content_hash
             })
-            
-    return proofs
\ No newline at end of file
+
+    return proofs
+
+def release_proof_blobs(content_hashes):
+    """
+    Delete stored blobs that are no longer referenced by any PaymentProof.
+
+    The reference count of a blob is the number of PaymentProof rows sharing
+    its content_hash, so this must run after the deleting transaction commits.
+    A blob stored or reused in the last PROOF_BLOB_GRACE_SECONDS is kept even
+    when unreferenced: an upload still being committed may point at it.
+    sweep_proof_blobs collects it later.
+
+    Returns:
+        number of files deleted
+    """
+    cutoff = time.time() - current_app.config.get('PROOF_BLOB_GRACE_SECONDS', 3600)
+    content_hashes = sorted(set(h for h in content_hashes if h))
+    deleted = 0
+    with db.engine.connect() as connection:
+        for start in range(0, len(content_hashes), RELEASE_CHUNK):
+            chunk = content_hashes[start:start + RELEASE_CHUNK]
+            in_use = set(connection.execute(
+                select(PaymentProof.content_hash).where(PaymentProof.content_hash.in_(chunk)).distinct()
+            ).scalars())
+            for content_hash in chunk:
+                if content_hash not in in_use:
+                    deleted += _remove_blob(content_hash, cutoff)
+    return deleted
+
+def sweep_proof_blobs():
+    """
+    Delete every unreferenced blob older than the grace period: those whose
+    upload was rolled back, those released while still in their grace period,
+    and temporary files left by interrupted uploads.
+
+    Returns:
+        number of files deleted
+    """
+    root = proofs_root()
+    cutoff = time.time() - current_app.config.get('PROOF_BLOB_GRACE_SECONDS', 3600)
+    candidates = set()
+    deleted = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                if os.stat(path).st_mtime >= cutoff:
+                    continue
+                if name.startswith('.upload-') or name.endswith(REMOVING_SUFFIX):
+                    os.remove(path)
+                    deleted += 1
+                    continue
+            except FileNotFoundError:
+                # Deleted or moved aside by a release running at the same time
+                continue
+            if directory != root:
+                candidates.add(name.split('.', 1)[0])
+    return deleted + release_proof_blobs(candidates)
+
+def _remove_blob(content_hash, cutoff):
+    """
+    Delete every stored file for a hash not used since cutoff, and its preview.
+
+    An upload reusing a blob touches it before its row is committed, so each
+    file is moved aside first and put back if it turns out to have been
+    touched. An upload arriving once it is moved aside stores its own copy.
+    """
+    shard_dir = os.path.join(proofs_root(), content_hash[:2], content_hash[2:4])
+    if not os.path.isdir(shard_dir):
+        return 0
+
+    deleted = kept = 0
+    for name in os.listdir(shard_dir):
+        if not name.startswith(content_hash) or name.endswith(REMOVING_SUFFIX):
+            continue
+        path = os.path.join(shard_dir, name)
+        aside = path + REMOVING_SUFFIX
+        try:
+            os.replace(path, aside)
+            if os.stat(aside).st_mtime >= cutoff:
+                os.replace(aside, path)
+                kept += 1
+            else:
+                os.remove(aside)
+                deleted += 1
+        except FileNotFoundError:
+            # Another release or sweep got to it first
+            continue
+
+    if deleted and not kept:
+        remove_preview(content_hash)
+    return deleted
+
+@event.listens_for(Session, 'after_flush')
+def _collect_released_blobs(session, flush_context):
+    for obj in session.deleted:
+        if isinstance(obj, PaymentProof) and obj.content_hash:
+            session.info.setdefault('released_blobs', set()).add(obj.content_hash)
+
+@event.listens_for(Session, 'after_commit')
+def _release_blobs_after_commit(session):
+    released = session.info.pop('released_blobs', None)
+    if released:
+        release_proof_blobs(released)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_released_blobs(session):
+    session.info.pop('released_blobs', None)
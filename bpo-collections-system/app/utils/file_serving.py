@@ -0,0 +1,95 @@
+import os
+from urllib.parse import quote
+from flask import current_app, request, abort
+from werkzeug.utils import send_file
+
+# Supported values of the SENDFILE_MODE setting
+SENDFILE_MODES = (None, 'x-sendfile', 'x-accel-redirect')
+
+def project_root():
+    """Directory that holds uploads/ and exports/"""
+    return os.path.abspath(os.path.join(current_app.root_path, '..'))
+
+def _accel_response(path, mimetype, as_attachment, download_name, etag):
+    """
+    Build an empty response carrying X-Accel-Redirect so nginx sends the file.
+
+    The internal URI is SENDFILE_INTERNAL_PREFIX followed by the path relative
+    to the project root, e.g. /protected/uploads/payment_proofs/ab/cd/...
+    nginx answers Range requests itself.
+    """
+    relative_path = os.path.relpath(path, project_root())
+    if relative_path.startswith('..'):
+        abort(404)
+
+    prefix = current_app.config.get('SENDFILE_INTERNAL_PREFIX', '/protected').rstrip('/')
+    stat = os.stat(path)
+
+    response = current_app.response_class(mimetype=mimetype or 'application/octet-stream')
+    response.headers['X-Accel-Redirect'] = quote(f"{prefix}/{relative_path.replace(os.sep, '/')}")
+    if as_attachment:
+        response.headers.set('Content-Disposition', 'attachment',
+                             filename=download_name or os.path.basename(path))
+    response.last_modified = int(stat.st_mtime)
+    response.set_etag(etag or f"{int(stat.st_mtime)}-{stat.st_size}")
+
+    # Only the 304 check is done here; nginx handles the body and ranges
+    response = response.make_conditional(request, accept_ranges=False)
+    response.headers.pop('Content-Length', None)
+    return response
+
+def serve_file(path, etag=None, mimetype=None, as_attachment=False, download_name=None,
+               max_age=0, immutable=False):
+    """
+    Send a file with validators, conditional GET and Range support.
+
+    Args:
+        path: Absolute path of the file
+        etag: Stable entity tag (e.g. a content hash); defaults to mtime and size
+        mimetype: Content type, guessed from the name if omitted
+        as_attachment: Send with Content-Disposition: attachment
+        download_name: File name offered to the browser
+        max_age: Seconds the browser may reuse the file without asking (0 = always revalidate)
+        immutable: The URL always refers to the same bytes
+
+    With SENDFILE_MODE set to 'x-sendfile' (Apache, lighttpd) or
+    'x-accel-redirect' (nginx) the front proxy streams the file instead.
+    """
+    if not os.path.isfile(path):
+        abort(404)
+
+    mode = current_app.config.get('SENDFILE_MODE')
+    if mode not in SENDFILE_MODES:
+        raise ValueError(f"Unknown SENDFILE_MODE {mode!r}")
+
+    if mode == 'x-accel-redirect':
+        response = _accel_response(path, mimetype, as_attachment, download_name, etag)
+    else:
+        # werkzeug answers If-None-Match / If-Modified-Since with 304 and
+        # Range / If-Range with 206 when conditional is on
+        response = send_file(
+            path,
+            request.environ,
+            mimetype=mimetype,
+            as_attachment=as_attachment,
+            download_name=download_name,
+            conditional=True,
+            etag=etag if etag else True,
+            max_age=max_age or None,
+            use_x_sendfile=(mode == 'x-sendfile'),
+            response_class=current_app.response_class,
+            _root_path=current_app.root_path,
+        )
+
+    # Proofs and exports are only for logged-in users, so no shared caches
+    response.cache_control.public = None
+    response.cache_control.private = True
+    if max_age:
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = max_age
+        if immutable:
+            response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+
+    return response
@@ -0,0 +1,254 @@
+import csv
+import io
+import os
+from datetime import date, datetime
+from app import db
+from app.forms import CAMPAIGN_CHOICES
+from app.models import PaymentRecord, PaymentProof
+from app.utils.stats import invalidate_stats
+from app.utils.roster import UnknownOperator, normalize_operator
+
+# Rows inserted per executemany/transaction
+IMPORT_BATCH_SIZE = 1000
+
+# Only the first errors are kept for the report
+MAX_REPORTED_ERRORS = 500
+
+VALID_CAMPAIGNS = {value for value, _ in CAMPAIGN_CHOICES}
+
+# Accepted header spellings (lower-cased, spaces as underscores), including the
+# headers used by our own campaign export
+HEADER_ALIASES = {
+    'campaign': 'campaign',
+    'dpd': 'dpd',
+    'loan_id': 'loan_id',
+    'amount': 'amount',
+    'date_paid': 'date_paid',
+    'operator_name': 'operator_name',
+    'operator': 'operator_name',
+    'customer_name': 'customer_name',
+    'customer': 'customer_name',
+}
+
+REQUIRED_COLUMNS = ('campaign', 'dpd', 'loan_id', 'amount', 'date_paid', 'operator_name', 'customer_name')
+
+class ImportResult:
+    """Outcome of a bulk import: inserted row count and per-row errors"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []  # (row number, message)
+
+    def add_error(self, row_number, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+class RowError(ValueError):
+    """A single import row failed validation"""
+
+def _normalize_header(header):
+    key = str(header or '').strip().lower().replace(' ', '_')
+    return HEADER_ALIASES.get(key)
+
+def _read_csv(stream):
+    """Yield rows from a CSV file as lists of values, header first"""
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text_stream)
+    finally:
+        text_stream.detach()
+
+def _read_xlsx(stream):
+    """Yield rows from the first sheet of an xlsx file, header first"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def read_rows(stream, filename):
+    """Rows of a CSV or xlsx file as sequences of values, header first, reader picked by extension"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        return _read_csv(stream)
+    if extension == '.xlsx':
+        return _read_xlsx(stream)
+    raise ValueError('Only CSV and Excel (xlsx) files can be imported')
+
+def _text(value, label, max_length=100):
+    value = '' if value is None else str(value).strip()
+    if not value:
+        raise RowError(f'{label} is required')
+    if len(value) > max_length:
+        raise RowError(f'{label} must be at most {max_length} characters')
+    return value
+
+def _operator(value):
+    """Operator name, normalized to its roster code when a roster is loaded"""
+    try:
+        return normalize_operator(_text(value, 'Operator Name'))
+    except UnknownOperator as e:
+        raise RowError(str(e))
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = '' if value is None else str(value).strip()
+    if not value:
+        raise RowError('Date Paid is required')
+    try:
+        return datetime.strptime(value[:10], '%Y-%m-%d').date()
+    except ValueError:
+        raise RowError(f'Date Paid "{value}" is not a valid YYYY-MM-DD date')
+
+def validate_row(values):
+    """
+    Check one row against the PaymentEntryForm rules and return the column values.
+
+    Raises RowError with a readable message if the row is invalid.
+    """
+    campaign = _text(values.get('campaign'), 'Campaign', 50).upper()
+    if campaign not in VALID_CAMPAIGNS:
+        raise RowError(f'Campaign "{campaign}" is not one of {", ".join(sorted(VALID_CAMPAIGNS))}')
+
+    # Like the form's DataRequired validators, zero counts as missing
+    try:
+        dpd = int(float(values.get('dpd')))
+    except (TypeError, ValueError):
+        raise RowError(f'DPD "{values.get("dpd")}" is not a whole number')
+    if not dpd:
+        raise RowError('DPD is required')
+
+    try:
+        amount = float(str(values.get('amount')).replace(',', ''))
+    except (TypeError, ValueError):
+        raise RowError(f'Amount "{values.get("amount")}" is not a number')
+    if not amount:
+        raise RowError('Amount is required')
+
+    return {
+        'campaign': campaign,
+        'dpd': dpd,
+        'loan_id': _text(values.get('loan_id'), 'Loan ID'),
+        'amount': amount,
+        'date_paid': _parse_date(values.get('date_paid')),
+        'operator_name': _operator(values.get('operator_name')),
+        'customer_name': _text(values.get('customer_name'), 'Customer Name'),
+    }
+
+def _insert_batch(batch):
+    # Stamped as the batch goes in, so incremental exports taken while a long
+    # import runs still pick up the batches committed after them
+    inserted_at = datetime.utcnow()
+    for record in batch:
+        record['created_at'] = inserted_at
+    db.session.execute(PaymentRecord.__table__.insert(), batch)
+    db.session.commit()
+
+def import_payments(stream, filename, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Stream a CSV or xlsx payment file into payment_record.
+
+    Rows are validated one by one and inserted in executemany batches, one
+    transaction per batch. Invalid rows are skipped and reported.
+
+    Args:
+        stream: Binary file object
+        filename: Original file name, used to pick the reader
+        batch_size: Rows per insert batch
+
+    Returns:
+        ImportResult
+    """
+    rows = read_rows(stream, filename)
+    result = ImportResult()
+
+    header = next(rows, None)
+    if header is None:
+        raise ValueError('The file is empty')
+    columns = [_normalize_header(h) for h in header]
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f'Missing columns: {", ".join(missing)}')
+
+    batch = []
+
+    # Row 1 is the header, so data starts on row 2 like in a spreadsheet
+    for row_number, row in enumerate(rows, start=2):
+        if not row or all(v is None or str(v).strip() == '' for v in row):
+            continue
+
+        values = {column: value for column, value in zip(columns, row) if column}
+        try:
+            record = validate_row(values)
+        except RowError as e:
+            result.add_error(row_number, str(e))
+            continue
+
+        batch.append(record)
+
+        if len(batch) >= batch_size:
+            _insert_batch(batch)
+            result.inserted += len(batch)
+            batch = []
+
+    if batch:
+        _insert_batch(batch)
+        result.inserted += len(batch)
+
+    # Core inserts skip the ORM session events that normally refresh the dashboard
+    invalidate_stats()
+
+    return result
+
+def attach_proofs_by_loan_id(files, proof_type, loan_id=None):
+    """
+    Attach uploaded proof files to existing payment records by loan ID.
+
+    With a loan_id every file goes to that loan's latest record; otherwise
+    each file's loan ID is taken from its name up to the first underscore
+    (e.g. LN12345_receipt.png).
+
+    Returns:
+        (number of files attached, list of unmatched file names)
+    """
+    from app.utils.file_helpers import save_payment_proofs
+
+    attached = 0
+    unmatched = []
+    files = [file for file in files if file and file.filename]
+    file_loan_ids = [loan_id or os.path.splitext(file.filename)[0].split('_')[0] for file in files]
+
+    # Latest record of every loan named, a chunk of loans per query rather than one query per loan
+    records = {}
+    distinct_loan_ids = list(dict.fromkeys(file_loan_ids))
+    for start in range(0, len(distinct_loan_ids), 500):
+        found = PaymentRecord.query\
+            .filter(PaymentRecord.loan_id.in_(distinct_loan_ids[start:start + 500]))\
+            .order_by(PaymentRecord.created_at, PaymentRecord.id)
+        for record in found:
+            records[record.loan_id] = record
+
+    for file, file_loan_id in zip(files, file_loan_ids):
+        record = records.get(file_loan_id)
+        if record is None:
+            unmatched.append(file.filename)
+            continue
+
+        for proof in save_payment_proofs([file], proof_type):
+            db.session.add(PaymentProof(
+                payment_id=record.id,
+                file_path=proof['path'],
+                file_type=proof['type'],
+                content_hash=proof['hash']
+            ))
+            attached += 1
+
+    db.session.commit()
+    return attached, unmatched
@@ -0,0 +1,142 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import DateTime, and_, or_
+from app.utils.cache import TTLCache
+
+# Filtered totals are shown as approximate and refreshed at most once a minute
+_count_cache = TTLCache(ttl=60)
+
+class KeysetPagination:
+    """
+    One page of results ordered newest first by (created_at, id).
+    
+    Pages are addressed by opaque cursors instead of page numbers, so every
+    page costs the same single indexed range query no matter how deep it is.
+    """
+    
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+    
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def encode_cursor(direction, item, sort='created_at'):
+    """Build an opaque cursor pointing before ('prev') or after ('next') an item"""
+    value = getattr(item, sort)
+    payload = [direction, value.isoformat() if isinstance(value, datetime) else value, item.id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (direction, sort value, id) for a cursor, or None if it is invalid"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, value, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, value, int(item_id)
+    except (ValueError, TypeError):
+        return None
+
+def cached_count(query):
+    """Count a query's rows, reusing the result for identical filters for a minute"""
+    count_query = query.enable_eagerloads(False).order_by(None)
+    compiled = count_query.statement.compile()
+    key = (str(compiled), tuple(sorted((k, str(v)) for k, v in compiled.params.items())))
+    return _count_cache.get_or_set(key, count_query.count)
+
+def keyset_paginate(query, model, cursor=None, per_page=20, with_total=False, sort='created_at', descending=True):
+    """
+    Return a KeysetPagination for query, ordered by model.<sort>, model.id (newest first by default).
+    
+    Args:
+        query: Filtered query (without ordering) over model
+        model: Mapped class with an id column and the sort column
+        cursor: Cursor from a previous page's next_cursor or prev_cursor
+        per_page: Number of items per page
+        with_total: Also return an approximate total (cached for a minute)
+        sort: Column to order by; an index starting with it keeps deep pages cheap.
+            NULLs sort below every value, so they come last when descending.
+        descending: Largest values first
+    """
+    column = getattr(model, sort)
+    nullable = column.expression.nullable
+    position = decode_cursor(cursor)
+    
+    if position:
+        direction, value, item_id = position
+        if value is not None and isinstance(column.type, DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                direction, value = None, None
+    else:
+        direction = value = None
+    
+    # Fetch one extra row to find out whether there is another page
+    if direction is None:
+        items = query.order_by(*_ordering(column, model, descending, nullable)).limit(per_page + 1).all()
+    else:
+        # 'next' walks on in display order, 'prev' walks back towards the start
+        smaller = (direction == 'next') == descending
+        items = []
+        for after in _conditions_after(column, model, value, item_id, smaller, nullable):
+            items += query.filter(after)\
+                .order_by(*_ordering(column, model, smaller, nullable))\
+                .limit(per_page + 1 - len(items))\
+                .all()
+            if len(items) > per_page:
+                break
+    
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    
+    if direction == 'prev':
+        items.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, direction == 'next'
+    
+    return KeysetPagination(
+        items,
+        per_page,
+        next_cursor=encode_cursor('next', items[-1], sort) if items and has_next else None,
+        prev_cursor=encode_cursor('prev', items[0], sort) if items and has_prev else None,
+        total=cached_count(query) if with_total else None
+    )
+
+def _conditions_after(column, model, value, item_id, smaller, nullable):
+    """
+    Conditions for the rows after (value, item_id) walking towards smaller or
+    larger values, in the order they are reached.
+    
+    The OR that breaks ties on id is ANDed with a plain bound on the column
+    (column <= value), which is what lets SQLite search the index instead of
+    scanning it. NULLs sort below every value. They get a condition of their
+    own instead of another OR, for the same reason.
+    """
+    if value is None:
+        if smaller:
+            return [and_(column.is_(None), model.id < item_id)]
+        return [and_(column.is_(None), model.id > item_id), column.isnot(None)]
+    if smaller:
+        after = and_(column <= value, or_(column < value, and_(column == value, model.id < item_id)))
+        return [after, column.is_(None)] if nullable else [after]
+    return [and_(column >= value, or_(column > value, and_(column == value, model.id > item_id)))]
+
+def _ordering(column, model, descending, nullable=False):
+    # Spelled out for nullable columns, as PostgreSQL otherwise puts NULLs above every value
+    if descending:
+        return (column.desc().nullslast() if nullable else column.desc()), model.id.desc()
+    return (column.asc().nullsfirst() if nullable else column.asc()), model.id.asc()
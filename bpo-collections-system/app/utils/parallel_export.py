@@ -0,0 +1,287 @@
+"""
+Campaign exports rendered on a pool of worker processes.
+
+Writing the workbook XML is CPU bound and runs on one core in-process, so a
+large export is cut into parts of up to EXPORT_PART_ROWS consecutive rows of
+one sheet. Each worker reads its part straight from the database and renders
+it with StreamingExcelWriter into a scratch workbook. The parent then copies
+the rendered rows into a skeleton workbook that holds the sheets, header rows
+and column widths. StreamingExcelWriter gives every workbook the same style
+table, so the result is the same file export_campaign_data writes in-process.
+
+Workers read at a later moment than the plan was made. Each part's row count
+is checked against the plan, and if records were written in between, the
+export is planned and rendered again.
+"""
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from flask import current_app
+from sqlalchemy import create_engine, event, func, or_, select
+from xlsxwriter.utility import xl_rowcol_to_cell
+from app import db
+from app.utils.export_helpers import (CAMPAIGN_EXPORT_COLUMNS, StreamingExcelWriter, campaign_export_criteria,
+                                      campaign_sheet_order)
+from app.utils.sqlite_tuning import apply_pragmas, connection_pragmas, sqlite_settings
+
+SUMMARY_SHEET = 'Summary'
+
+# Times an export is planned and rendered before giving up on data that keeps changing
+RENDER_ATTEMPTS = 3
+
+class ExportDataChanged(Exception):
+    """Records were written while the parts of an export were being rendered"""
+
+# Engines opened by a worker process, one per database URL
+_engines = {}
+
+def worker_database_url():
+    """
+    URL the worker processes connect with, or None when they can't reach the
+    app's database (an in-memory SQLite database only exists in this process)
+    """
+    url = db.engine.url
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return None
+    return url.render_as_string(hide_password=False)
+
+def worker_connection_settings():
+    """
+    (connect_args, pragmas) for the worker engines: the busy timeout and
+    per-connection pragmas init_sqlite_tuning gives the app's own engine on
+    SQLite, nothing on other databases
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return {}, []
+    settings = sqlite_settings(current_app.config)
+    return {'timeout': settings['SQLITE_BUSY_TIMEOUT'] / 1000}, connection_pragmas(settings)
+
+def _plan_parts(query, campaign_names, part_rows, include_headers):
+    """
+    Split an export into parts of up to part_rows rows of one sheet.
+
+    Returns:
+        List of (sheet name, campaign or None for the summary, first id,
+        id the part stops before, first row, rows in the part)
+    """
+    from app.models import PaymentRecord
+
+    by_campaign = {'partition_by': PaymentRecord.campaign}
+    numbered = query.with_entities(
+        PaymentRecord.id,
+        PaymentRecord.campaign,
+        func.row_number().over(order_by=PaymentRecord.id, **by_campaign).label('sheet_row'),
+        func.row_number().over(order_by=PaymentRecord.id).label('summary_row'),
+        # Read in the same statement, so the plan is one consistent snapshot
+        func.count().over(**by_campaign).label('sheet_total'),
+        func.max(PaymentRecord.id).over(**by_campaign).label('sheet_last_id'),
+        func.count().over().label('summary_total'),
+        func.max(PaymentRecord.id).over().label('summary_last_id'),
+    ).subquery()
+
+    # Only the first row of each part comes back
+    starts = db.session.query(numbered).filter(or_(
+        (numbered.c.sheet_row - 1) % part_rows == 0,
+        (numbered.c.summary_row - 1) % part_rows == 0,
+    )).order_by(numbered.c.id)
+
+    # {campaign: [(first id, first row), ...]} with the summary under None,
+    # and {campaign: (rows, last id)}
+    boundaries = {campaign_name: [] for campaign_name in campaign_names}
+    boundaries[None] = []
+    totals = {}
+    for record_id, campaign_name, sheet_row, summary_row, sheet_total, sheet_last_id, summary_total, \
+            summary_last_id in starts:
+        if campaign_name not in boundaries:
+            raise ExportDataChanged(f"Campaign {campaign_name} was added while the export was planned")
+        if (sheet_row - 1) % part_rows == 0:
+            boundaries[campaign_name].append((record_id, sheet_row))
+        if (summary_row - 1) % part_rows == 0:
+            boundaries[None].append((record_id, summary_row))
+        totals[campaign_name] = (sheet_total, sheet_last_id)
+        totals[None] = (summary_total, summary_last_id)
+
+    # Data rows start below the header row, if there is one
+    offset = 0 if include_headers else 1
+    parts = []
+    for campaign_name, sheet_starts in boundaries.items():
+        if not sheet_starts:
+            continue
+        sheet_name = SUMMARY_SHEET if campaign_name is None else (campaign_name or "No Campaign")
+        total, last_id = totals[campaign_name]
+        ends = sheet_starts[1:] + [(last_id + 1, total + 1)]
+        for (first_id, first_row), (end_id, end_row) in zip(sheet_starts, ends):
+            parts.append((sheet_name, campaign_name, first_id, end_id, first_row - offset, end_row - first_row))
+    return parts
+
+def _engine(database_url, connect_args, pragmas):
+    if database_url not in _engines:
+        engine = create_engine(database_url, connect_args=connect_args)
+        if pragmas:
+            event.listen(engine, 'connect', lambda dbapi_connection, record: apply_pragmas(dbapi_connection, pragmas))
+        _engines[database_url] = engine
+    return _engines[database_url]
+
+def _render_part(database, filters, part, scratch_dir):
+    """
+    Worker entry point: render one part's rows to a file of <row> XML.
+
+    Args:
+        database: (URL, connect_args, pragmas) from worker_database_url
+            and worker_connection_settings
+
+    Returns:
+        (sheet name, first row, path of the rows file, rows written, column widths)
+    """
+    from app.models import PaymentRecord
+
+    sheet_name, campaign_name, first_id, end_id, first_row, _ = part
+    criteria = campaign_export_criteria(*filters) + [PaymentRecord.id >= first_id, PaymentRecord.id < end_id]
+    if sheet_name != SUMMARY_SHEET:
+        criteria.append(PaymentRecord.campaign.is_(None) if campaign_name is None
+                        else PaymentRecord.campaign == campaign_name)
+
+    statement = select(*[getattr(PaymentRecord, attr) for _, attr in CAMPAIGN_EXPORT_COLUMNS])\
+        .where(*criteria)\
+        .order_by(PaymentRecord.id)
+
+    fd, workbook_path = tempfile.mkstemp(suffix='.xlsx', dir=scratch_dir)
+    os.close(fd)
+    writer = StreamingExcelWriter(workbook_path, [header for header, _ in CAMPAIGN_EXPORT_COLUMNS])
+    # xlsxwriter selects the first sheet; a blank one keeps the part's sheet unselected
+    writer.workbook.add_worksheet()
+    writer.add_sheet('part', first_row=first_row)
+
+    row_count = 0
+    with _engine(*database).connect() as conn:
+        for row in conn.execute(statement):
+            writer.write_row('part', row)
+            row_count += 1
+    widths = writer.column_widths('part')
+    writer.close()
+
+    # Keep only what sits between <sheetData> and </sheetData>
+    with zipfile.ZipFile(workbook_path) as workbook:
+        sheet_xml = workbook.read('xl/worksheets/sheet2.xml')
+    os.remove(workbook_path)
+    start = sheet_xml.find(b'<sheetData>')
+    rows_xml = sheet_xml[start + len(b'<sheetData>'):sheet_xml.rindex(b'</sheetData>')] if start >= 0 else b''
+
+    rows_path = workbook_path[:-len('.xlsx')] + '.rows'
+    with open(rows_path, 'wb') as f:
+        f.write(rows_xml)
+    return sheet_name, first_row, rows_path, row_count, widths
+
+def _assemble(skeleton_path, export_path, sheet_names, sheet_rows, sheet_parts, include_headers):
+    """Copy the skeleton workbook to export_path with each sheet's rendered rows spliced in"""
+    last_column = len(CAMPAIGN_EXPORT_COLUMNS) - 1
+    # Sheets are stored as xl/worksheets/sheet1.xml, sheet2.xml, ... in the order they were added
+    sheet_files = {f'xl/worksheets/sheet{i}.xml': name for i, name in enumerate(sheet_names, start=1)}
+
+    with zipfile.ZipFile(skeleton_path) as skeleton, \
+            zipfile.ZipFile(export_path, 'w', zipfile.ZIP_DEFLATED) as export:
+        for info in skeleton.infolist():
+            data = skeleton.read(info)
+            sheet_name = sheet_files.get(info.filename)
+            if sheet_name is None or not sheet_parts[sheet_name]:
+                export.writestr(info, data)
+                continue
+
+            # The skeleton sheet has at most the header row, so its range has to be widened
+            last_row = sheet_rows[sheet_name] - (0 if include_headers else 1)
+            dimension = f'<dimension ref="A1:{xl_rowcol_to_cell(last_row, last_column)}"/>'
+            data = re.sub(rb'<dimension ref="[^"]*"/>', dimension.encode(), data, count=1)\
+                .replace(b'<sheetData/>', b'<sheetData></sheetData>')
+            head, tail = data.rsplit(b'</sheetData>', 1)
+            parts = sorted(sheet_parts[sheet_name])
+            size = len(data) + sum(os.path.getsize(rows_path) for _, rows_path in parts)
+
+            with export.open(info, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as sheet:
+                sheet.write(head)
+                for _, rows_path in parts:
+                    with open(rows_path, 'rb') as rows:
+                        shutil.copyfileobj(rows, sheet)
+                sheet.write(b'</sheetData>' + tail)
+
+def write_campaign_workbook(export_path, query, campaign_names, filters, processes, part_rows,
+                            include_headers=True, progress_callback=None):
+    """
+    Write the campaign export workbook using a pool of worker processes.
+
+    Args:
+        export_path: File to create
+        query: The export's filtered PaymentRecord query
+        campaign_names: Campaigns in sheet order
+        filters: (campaign, start_date, end_date, since, until) the query was built from
+        processes: Size of the process pool
+        part_rows: Most rows of one sheet rendered by a single task
+        include_headers: Start each sheet with the column names
+
+    Returns:
+        Number of records exported
+
+    Raises:
+        ExportDataChanged: records kept changing under the export for
+            RENDER_ATTEMPTS attempts
+    """
+    database = (worker_database_url(),) + worker_connection_settings()
+    for attempt in range(1, RENDER_ATTEMPTS + 1):
+        try:
+            return _write_workbook(export_path, query, campaign_names, filters, processes, part_rows,
+                                   include_headers, progress_callback, database)
+        except ExportDataChanged as e:
+            if attempt == RENDER_ATTEMPTS:
+                raise ExportDataChanged(f"{e}; gave up after {attempt} attempts")
+            current_app.logger.warning(f"{e}; planning the export again")
+            campaign_names = campaign_sheet_order(query)
+
+def _write_workbook(export_path, query, campaign_names, filters, processes, part_rows, include_headers,
+                    progress_callback, database):
+    """One attempt of write_campaign_workbook"""
+    parts = _plan_parts(query, campaign_names, part_rows, include_headers)
+    sheet_names = [campaign_name or "No Campaign" for campaign_name in campaign_names] + [SUMMARY_SHEET]
+    sheet_rows = dict.fromkeys(sheet_names, 0)
+    sheet_parts = {name: [] for name in sheet_names}
+    sheet_widths = {name: [] for name in sheet_names}
+
+    # Every record is written twice: once on its campaign sheet, once on the summary
+    total = sum(part[5] for part in parts if part[0] == SUMMARY_SHEET) if progress_callback else None
+    rendered = 0
+
+    scratch_dir = tempfile.mkdtemp(prefix='export-parts-')
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(_render_part, database, filters, part, scratch_dir): part for part in parts}
+            for future in as_completed(futures):
+                sheet_name, first_row, rows_path, row_count, widths = future.result()
+                expected = futures[future][5]
+                if row_count != expected:
+                    for pending in futures:
+                        pending.cancel()
+                    raise ExportDataChanged(f"Sheet {sheet_name} from row {first_row} had {row_count} rows "
+                                            f"instead of the {expected} planned")
+                sheet_parts[sheet_name].append((first_row, rows_path))
+                sheet_rows[sheet_name] += row_count
+                sheet_widths[sheet_name].append(widths)
+
+                rendered += row_count
+                if progress_callback:
+                    progress_callback(rendered // 2, total)
+
+        skeleton_path = os.path.join(scratch_dir, 'skeleton.xlsx')
+        skeleton = StreamingExcelWriter(skeleton_path, [header for header, _ in CAMPAIGN_EXPORT_COLUMNS],
+                                        include_headers)
+        for sheet_name in sheet_names:
+            skeleton.add_sheet(sheet_name)
+            for widths in sheet_widths[sheet_name]:
+                skeleton.widen(sheet_name, widths)
+        skeleton.close()
+
+        _assemble(skeleton_path, export_path, sheet_names, sheet_rows, sheet_parts, include_headers)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    return sheet_rows[SUMMARY_SHEET]
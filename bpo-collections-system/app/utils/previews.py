@@ -0,0 +1,181 @@
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Longest side of a generated preview, in pixels
+PREVIEW_MAX_SIZE = (480, 480)
+PREVIEW_QUALITY = 70
+
+# A proof whose preview failed to render is not tried again for this long
+PREVIEW_RETRY_SECONDS = 24 * 3600
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+PDF_EXTENSIONS = ('.pdf',)
+
+def init_preview_workers(app):
+    """Create the worker pool that renders previews right after an upload"""
+    workers = app.config.get('PREVIEW_WORKERS', 2)
+    app.extensions['preview_workers'] = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix='proof-preview'
+    )
+
+def previews_root():
+    """Absolute path of the preview cache"""
+    return os.path.join(current_app.root_path, '..', 'uploads', 'previews')
+
+def preview_path(content_hash):
+    """
+    Absolute path of the preview for a stored blob. Previews are keyed by the
+    blob's content hash, so deduplicated uploads share one preview too.
+    """
+    return os.path.join(previews_root(), content_hash[:2], content_hash[2:4], f"{content_hash}.jpg")
+
+def _failure_marker(target_path):
+    return target_path + '.failed'
+
+def _recently_failed(target_path):
+    try:
+        return time.time() - os.path.getmtime(_failure_marker(target_path)) < PREVIEW_RETRY_SECONDS
+    except OSError:
+        return False
+
+def _remember_failure(target_path):
+    try:
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        with open(_failure_marker(target_path), 'w'):
+            pass
+    except OSError as e:
+        logger.warning(f"Could not record the failed preview {target_path}: {e}")
+
+def remove_preview(content_hash):
+    """Delete a blob's preview, and the record of a failed render if there is one"""
+    target_path = preview_path(content_hash)
+    for path in (target_path, _failure_marker(target_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+def can_preview(file_path):
+    """Return True if a preview can be made for this kind of file"""
+    extension = os.path.splitext(file_path or '')[1].lower()
+    return extension in IMAGE_EXTENSIONS or extension in PDF_EXTENSIONS
+
+def _open_source(source_path):
+    """Open a proof as a PIL image (the first page for PDFs), or None"""
+    from PIL import Image
+
+    extension = os.path.splitext(source_path)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        return Image.open(source_path)
+
+    if extension in PDF_EXTENSIONS:
+        # PDF rendering needs PyMuPDF (requirements.txt); without it PDFs keep the file icon
+        try:
+            import fitz
+        except ImportError:
+            logger.warning(f"PyMuPDF is not installed, so {source_path} gets no preview")
+            return None
+        with fitz.open(source_path) as document:
+            if document.page_count == 0:
+                return None
+            pixmap = document[0].get_pixmap(dpi=72)
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    return None
+
+def render_preview(source_path, target_path):
+    """
+    Write a compressed JPEG preview of source_path to target_path.
+
+    Returns True if a preview was written.
+    """
+    from PIL import ImageOps
+
+    image = _open_source(source_path)
+    if image is None:
+        return False
+
+    with image:
+        # Phone screenshots often rely on EXIF rotation
+        preview = ImageOps.exif_transpose(image)
+        preview.thumbnail(PREVIEW_MAX_SIZE)
+        if preview.mode != 'RGB':
+            preview = preview.convert('RGB')
+
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        # Write next to the target and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), prefix='.preview-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                preview.save(tmp, 'JPEG', quality=PREVIEW_QUALITY, optimize=True)
+            os.replace(tmp_path, target_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    return True
+
+def _render_or_remember(source_path, target_path):
+    """
+    render_preview, leaving a marker next to the target when no preview could
+    be made, so views of the proof don't render it again until
+    PREVIEW_RETRY_SECONDS have passed
+    """
+    try:
+        rendered = render_preview(source_path, target_path)
+    except Exception:
+        _remember_failure(target_path)
+        raise
+    if not rendered:
+        _remember_failure(target_path)
+    return rendered
+
+def _render_quietly(source_path, target_path):
+    """Worker entry point: a failed render is retried after PREVIEW_RETRY_SECONDS"""
+    try:
+        if not os.path.exists(target_path) and not _recently_failed(target_path):
+            _render_or_remember(source_path, target_path)
+    except Exception:
+        # Runs on a worker thread, outside the app context
+        logger.exception(f"Preview generation failed for {source_path}")
+
+def queue_preview(source_path, content_hash):
+    """Render a preview in the background after an upload"""
+    if not can_preview(source_path):
+        return
+    workers = current_app.extensions.get('preview_workers')
+    if workers is None:
+        return
+    workers.submit(_render_quietly, source_path, preview_path(content_hash))
+
+def get_proof_preview(proof):
+    """
+    Return the absolute path of a proof's preview, rendering it on first access.
+
+    Returns None when no preview can be made (unsupported type, missing file,
+    PDF without a renderer, a render that failed in the last
+    PREVIEW_RETRY_SECONDS, or a proof stored before content hashing).
+    """
+    if not proof.content_hash or not can_preview(proof.file_path):
+        return None
+
+    target_path = preview_path(proof.content_hash)
+    if os.path.exists(target_path):
+        return target_path
+    if _recently_failed(target_path):
+        return None
+
+    source_path = os.path.join(current_app.root_path, '..', proof.file_path)
+    if not os.path.exists(source_path):
+        return None
+
+    try:
+        if _render_or_remember(source_path, target_path):
+            return target_path
+    except Exception as e:
+        current_app.logger.warning(f"Preview generation failed for proof {proof.id}: {e}")
+    return None
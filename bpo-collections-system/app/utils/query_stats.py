@@ -0,0 +1,64 @@
+"""
+Per-request SQL instrumentation.
+
+Every statement run while handling a request is counted and timed in
+flask.g. Statements slower than SLOW_QUERY_MS are logged with their SQL. So
+are requests that run more than QUERY_COUNT_WARN statements, which is how a
+query per row shows up; routes that run a statement per item on purpose
+declare it with allow_queries(). With QUERY_STATS_HEADERS on, every response carries
+X-Query-Count and X-Query-Time (milliseconds).
+"""
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'handle_error')
+def _failed_query(exception_context):
+    started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    # Export jobs and scripts run outside a request and aren't counted
+    if not has_request_context() or 'query_count' not in g:
+        return
+
+    g.query_count += 1
+    g.query_time += elapsed
+    if elapsed * 1000 >= current_app.config.get('SLOW_QUERY_MS', 200):
+        current_app.logger.warning(f"Slow query ({elapsed * 1000:.0f} ms) in {request.method} {request.path}: "
+                                   f"{' '.join(statement.split())}")
+
+def allow_queries(extra):
+    """Raise this request's QUERY_COUNT_WARN budget, for work that runs a statement per input item by design"""
+    g.query_allowance = g.get('query_allowance', 0) + extra
+
+def query_stats():
+    """(statements run, seconds spent in them) so far in this request"""
+    return g.get('query_count', 0), g.get('query_time', 0.0)
+
+def init_query_stats(app):
+    """Count the statements of each request, and report them per QUERY_STATS_HEADERS and QUERY_COUNT_WARN"""
+    @app.before_request
+    def _reset_query_stats():
+        g.query_count = 0
+        g.query_time = 0.0
+
+    @app.after_request
+    def _report_query_stats(response):
+        count, seconds = query_stats()
+        budget = app.config.get('QUERY_COUNT_WARN', 30)
+        if budget and count > budget + g.get('query_allowance', 0):
+            app.logger.warning(f"{request.method} {request.path} ran {count} queries "
+                               f"({seconds * 1000:.0f} ms), more than QUERY_COUNT_WARN={budget}")
+        if app.config.get('QUERY_STATS_HEADERS'):
+            response.headers['X-Query-Count'] = str(count)
+            response.headers['X-Query-Time'] = f'{seconds * 1000:.1f}'
+        return response
@@ -0,0 +1,226 @@
+from datetime import date
+from sqlalchemy import case, event, func, text
+from app import db
+from app.models import Operator, PaymentRecord, PaymentRollup
+
+# DPD buckets used by the rollup, as (label, upper bound inclusive)
+DPD_BUCKETS = [
+    ('0', 0),
+    ('1-30', 30),
+    ('31-60', 60),
+    ('61-90', 90),
+    ('91-120', 120),
+    ('121-180', 180),
+]
+DPD_OVERFLOW_BUCKET = '180+'
+
+# Ways the summary can be broken down, mapped to rollup columns
+GROUP_BY_CHOICES = {
+    'campaign': 'campaign',
+    'operator': 'operator_name',
+    'dpd_bucket': 'dpd_bucket',
+    'date_paid': 'date_paid',
+    'supervisor_group': 'supervisor_group',  # on the operator roster, joined by operator_name
+}
+
+# Payments by operators missing from the roster, or without a group on it
+UNASSIGNED_GROUP = 'Unassigned'
+
+def dpd_bucket_sql(column):
+    """SQL CASE expression mapping a DPD column to its bucket label"""
+    whens = ' '.join(f"WHEN {column} <= {upper} THEN '{label}'" for label, upper in DPD_BUCKETS)
+    return f"CASE {whens} ELSE '{DPD_OVERFLOW_BUCKET}' END"
+
+def dpd_bucket(dpd):
+    """Bucket label for a DPD value, same rules as dpd_bucket_sql"""
+    for label, upper in DPD_BUCKETS:
+        if dpd <= upper:
+            return label
+    return DPD_OVERFLOW_BUCKET
+
+def _add_row(prefix):
+    """Trigger body adding one payment_record row (new/old) to its rollup group, unless it's a duplicate"""
+    bucket = dpd_bucket_sql(f'{prefix}.dpd')
+    return f"""
+        INSERT OR IGNORE INTO payment_rollup
+            (campaign, operator_name, date_paid, dpd_bucket, record_count, amount_sum, amount_min, amount_max)
+        SELECT {prefix}.campaign, {prefix}.operator_name, {prefix}.date_paid, {bucket}, 0, 0, {prefix}.amount, {prefix}.amount
+        WHERE NOT {prefix}.is_duplicate;
+        UPDATE payment_rollup SET
+            record_count = record_count + 1,
+            amount_sum = amount_sum + {prefix}.amount,
+            amount_min = min(amount_min, {prefix}.amount),
+            amount_max = max(amount_max, {prefix}.amount)
+        WHERE campaign = {prefix}.campaign AND operator_name = {prefix}.operator_name
+            AND date_paid = {prefix}.date_paid AND dpd_bucket = {bucket} AND NOT {prefix}.is_duplicate;
+    """
+
+def _remove_row(prefix):
+    """
+    Trigger body removing one payment_record row from its rollup group (duplicates were never added).
+    Min and max can't be undone incrementally, so they are recomputed for the
+    group from payment_record (a narrow lookup on campaign and date paid).
+    """
+    bucket = dpd_bucket_sql(f'{prefix}.dpd')
+    group = (f"campaign = {prefix}.campaign AND operator_name = {prefix}.operator_name "
+             f"AND date_paid = {prefix}.date_paid")
+    members = f"{group} AND {dpd_bucket_sql('dpd')} = {bucket} AND NOT is_duplicate"
+    return f"""
+        UPDATE payment_rollup SET
+            record_count = record_count - 1,
+            amount_sum = amount_sum - {prefix}.amount,
+            amount_min = (SELECT min(amount) FROM payment_record WHERE {members}),
+            amount_max = (SELECT max(amount) FROM payment_record WHERE {members})
+        WHERE {group} AND dpd_bucket = {bucket} AND NOT {prefix}.is_duplicate;
+        DELETE FROM payment_rollup WHERE {group} AND dpd_bucket = {bucket} AND record_count <= 0;
+    """
+
+# Triggers keep payment_rollup in step with every change to payment_record,
+# including bulk imports and corrections applied by approved disputes.
+# Records flagged as duplicates are left out.
+ROLLUP_TRIGGER_NAMES = ('rollup_payment_record_ai', 'rollup_payment_record_ad', 'rollup_payment_record_au')
+ROLLUP_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS rollup_payment_record_ai AFTER INSERT ON payment_record BEGIN
+        {_add_row('new')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS rollup_payment_record_ad AFTER DELETE ON payment_record BEGIN
+        {_remove_row('old')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS rollup_payment_record_au
+    AFTER UPDATE OF campaign, operator_name, date_paid, dpd, amount, is_duplicate ON payment_record BEGIN
+        {_remove_row('old')}
+        {_add_row('new')}
+    END
+    """,
+]
+
+def rebuild_rollup(connection):
+    """(Re)create the triggers and recompute payment_rollup from payment_record"""
+    for name in ROLLUP_TRIGGER_NAMES:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    for statement in ROLLUP_TRIGGERS:
+        connection.execute(text(statement))
+
+    connection.execute(text("DELETE FROM payment_rollup"))
+    connection.execute(text(f"""
+        INSERT INTO payment_rollup
+            (campaign, operator_name, date_paid, dpd_bucket, record_count, amount_sum, amount_min, amount_max)
+        SELECT campaign, operator_name, date_paid, {dpd_bucket_sql('dpd')},
+            count(*), sum(amount), min(amount), max(amount)
+        FROM payment_record
+        WHERE NOT is_duplicate
+        GROUP BY campaign, operator_name, date_paid, {dpd_bucket_sql('dpd')}
+    """))
+    _rollup_present.clear()
+
+@event.listens_for(db.Model.metadata, 'after_create')
+def _create_rollup(target, connection, tables=(), **kw):
+    # Only fill the rollup when create_all() has just made the table
+    if connection.dialect.name == 'sqlite' and PaymentRollup.__table__ in tables:
+        rebuild_rollup(connection)
+
+# Cache of whether the rollup triggers exist, per database URL
+_rollup_present = {}
+
+def rollup_available():
+    """Return True if payment_rollup is maintained by triggers on this database"""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    key = str(engine.url)
+    if key not in _rollup_present:
+        found = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'rollup_payment_record_ai'")
+        ).first()
+        _rollup_present[key] = found is not None
+    return _rollup_present[key]
+
+def _record_bucket_expression():
+    """dpd_bucket as a SQLAlchemy expression over PaymentRecord (direct aggregation)"""
+    return case(
+        *[(PaymentRecord.dpd <= upper, label) for label, upper in DPD_BUCKETS],
+        else_=DPD_OVERFLOW_BUCKET
+    )
+
+def collection_summary(start_date=None, end_date=None, campaign=None, group_by='campaign'):
+    """
+    Collection totals per group for a date paid range.
+
+    Read from payment_rollup when it is maintained, otherwise aggregated
+    directly from payment_record.
+
+    Returns:
+        (rows, totals) where rows are dicts with key, record_count,
+        amount_sum, amount_min and amount_max, largest amount first
+    """
+    if group_by not in GROUP_BY_CHOICES:
+        raise ValueError(f"Cannot group by {group_by}")
+
+    if rollup_available():
+        source = PaymentRollup
+        aggregates = [
+            func.sum(PaymentRollup.record_count),
+            func.sum(PaymentRollup.amount_sum),
+            func.min(PaymentRollup.amount_min),
+            func.max(PaymentRollup.amount_max),
+        ]
+    else:
+        source = PaymentRecord
+        aggregates = [
+            func.count(PaymentRecord.id),
+            func.sum(PaymentRecord.amount),
+            func.min(PaymentRecord.amount),
+            func.max(PaymentRecord.amount),
+        ]
+
+    if group_by == 'supervisor_group':
+        key = func.coalesce(Operator.supervisor_group, UNASSIGNED_GROUP)
+    elif group_by == 'dpd_bucket' and source is PaymentRecord:
+        key = _record_bucket_expression()
+    else:
+        key = getattr(source, GROUP_BY_CHOICES[group_by])
+
+    query = db.session.query(key, *aggregates).select_from(source)
+    if source is PaymentRecord:
+        query = query.filter(PaymentRecord.is_duplicate.is_(False))
+    if group_by == 'supervisor_group':
+        # Operator totals rolled up to their supervisor on the roster
+        query = query.outerjoin(Operator, Operator.operator == source.operator_name)
+    if start_date:
+        query = query.filter(source.date_paid >= start_date)
+    if end_date:
+        query = query.filter(source.date_paid <= end_date)
+    if campaign:
+        query = query.filter(source.campaign == campaign)
+
+    rows = []
+    for group_key, count, amount_sum, amount_min, amount_max in query.group_by(key).all():
+        if isinstance(group_key, date):
+            group_key = group_key.isoformat()
+        rows.append({
+            'key': group_key,
+            'record_count': int(count or 0),
+            'amount_sum': round(float(amount_sum or 0), 2),
+            'amount_min': amount_min,
+            'amount_max': amount_max,
+        })
+
+    # Dates read chronologically, everything else by amount collected
+    if group_by == 'date_paid':
+        rows.sort(key=lambda row: row['key'])
+    else:
+        rows.sort(key=lambda row: row['amount_sum'], reverse=True)
+
+    totals = {
+        'record_count': sum(row['record_count'] for row in rows),
+        'amount_sum': round(sum(row['amount_sum'] for row in rows), 2),
+        'amount_min': min((row['amount_min'] for row in rows if row['amount_min'] is not None), default=None),
+        'amount_max': max((row['amount_max'] for row in rows if row['amount_max'] is not None), default=None),
+    }
+    return rows, totals
@@ -0,0 +1,210 @@
+import re
+from bisect import bisect_left
+from datetime import datetime
+from app import db
+from app.models import Operator
+from app.utils.cache import TTLCache
+
+# Roster headers (AUGUST_FTE.csv and later months) mapped to Operator columns
+ROSTER_COLUMNS = {
+    'OPERATOR': 'operator',
+    'STATUS': 'status',
+    'EMPLOYEE_ID': 'employee_id',
+    'NAME': 'name',
+    'FULL_NAME': 'full_name',
+    'CRM_NAME': 'crm_name',
+    'GROUP': 'supervisor_group',
+}
+
+# Spreadsheet placeholders that mean "no value"
+EMPTY_VALUES = {'', '-', '#N/A', 'N/A'}
+
+# Other processes (import_roster.py) may replace the roster; pick that up within this many seconds
+ROSTER_CACHE_SECONDS = 300
+
+_NON_WORD = re.compile(r'[^A-Z0-9]+')
+_index_cache = TTLCache(ttl=ROSTER_CACHE_SECONDS, max_entries=1)
+
+class UnknownOperator(ValueError):
+    """An operator name that is not on the loaded roster"""
+
+class RosterImportResult:
+    """Outcome of a roster import: operators added, updated and no longer listed, plus skipped rows"""
+
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.deactivated = 0
+        self.errors = []  # (row number, message)
+
+def name_key(value):
+    """Comparison key for operator names: case, spacing and punctuation ignored ('Agent_Maila' -> 'AGENT MAILA')"""
+    return _NON_WORD.sub(' ', str(value or '').upper()).strip()
+
+def _clean(value):
+    value = '' if value is None else ' '.join(str(value).split())
+    return None if value.upper() in EMPTY_VALUES else value
+
+class OperatorIndex:
+    """
+    The roster held in memory for entry-time lookups and autocomplete.
+
+    Exact lookups go through a dict keyed by every name an operator is known
+    by (code, name, full name, CRM name). Autocomplete is a binary search over
+    a sorted array of those keys plus each word of the names, so typing a
+    surname finds the operator too.
+    """
+
+    def __init__(self, operators):
+        self.operators = {op['operator']: op for op in operators}
+        # Codes first, so a code always wins over someone else's name
+        codes = {name_key(op['operator']): op['operator'] for op in operators}
+        self._exact = dict(codes)
+        ambiguous = set()
+        entries = set()
+
+        for op in operators:
+            names = [name_key(op[column]) for column in ('operator', 'name', 'full_name', 'crm_name') if op[column]]
+            for key in names[1:]:
+                if key not in codes and self._exact.setdefault(key, op['operator']) != op['operator']:
+                    ambiguous.add(key)
+            if op['status'] == 'ACTIVE':
+                for key in names:
+                    entries.add((key, op['operator']))
+                    entries.update((word, op['operator']) for word in key.split()[1:] if len(word) > 1)
+
+        # A name shared by two operators can't be resolved to either
+        for key in ambiguous:
+            del self._exact[key]
+
+        self._entries = sorted(entries)
+        self._keys = [key for key, _ in self._entries]
+
+    def __len__(self):
+        return len(self.operators)
+
+    def lookup(self, value):
+        """The operator row for a code or any of the operator's names, or None"""
+        code = self._exact.get(name_key(value))
+        return self.operators.get(code) if code else None
+
+    def complete(self, prefix, limit=10):
+        """Active operators with a name or name word starting with prefix, in key order"""
+        prefix = name_key(prefix)
+        if not prefix:
+            return []
+
+        found = []
+        position = bisect_left(self._keys, prefix)
+        while position < len(self._keys) and self._keys[position].startswith(prefix) and len(found) < limit:
+            code = self._entries[position][1]
+            if code not in found:
+                found.append(code)
+            position += 1
+        return [self.operators[code] for code in found]
+
+    def active_codes(self):
+        return sorted(code for code, op in self.operators.items() if op['status'] == 'ACTIVE')
+
+def _load_index():
+    columns = [Operator.operator, Operator.name, Operator.full_name, Operator.crm_name,
+               Operator.supervisor_group, Operator.status, Operator.employee_id]
+    rows = db.session.query(*columns).all()
+    return OperatorIndex([dict(zip([c.key for c in columns], row)) for row in rows])
+
+def roster_index():
+    """The in-memory roster index, reloaded after imports and every ROSTER_CACHE_SECONDS"""
+    return _index_cache.get_or_set('index', _load_index)
+
+def invalidate_roster():
+    _index_cache.invalidate()
+
+def normalize_operator(value):
+    """
+    Map an entered operator name to its roster code.
+
+    Accepts the code or any name on the roster, ignoring case and punctuation.
+    Without a roster loaded the value is returned as entered.
+
+    Raises:
+        UnknownOperator: the name is not on the roster or the operator is inactive
+    """
+    value = ' '.join(str(value or '').split())
+    index = roster_index()
+    if not len(index):
+        return value
+
+    op = index.lookup(value)
+    if op is None:
+        raise UnknownOperator(f'Operator "{value}" is not on the roster')
+    if op['status'] != 'ACTIVE':
+        raise UnknownOperator(f'Operator "{op["operator"]}" is inactive on the roster')
+    return op['operator']
+
+def import_roster(stream, filename, month=None):
+    """
+    Load a monthly FTE roster (CSV or xlsx, same layout as AUGUST_FTE.csv).
+
+    Operators are matched on the OPERATOR column and updated in place.
+    Operators missing from the file are marked INACTIVE, so the table always
+    mirrors the latest roster while keeping the supervisor groups of people
+    who left for older payments.
+
+    Returns:
+        RosterImportResult
+    """
+    from app.utils.import_helpers import read_rows
+
+    rows = read_rows(stream, filename)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError('The roster file is empty')
+    columns = [ROSTER_COLUMNS.get(str(h or '').strip().upper()) for h in header]
+    if 'operator' not in columns:
+        raise ValueError('The roster has no OPERATOR column')
+
+    month = month or datetime.utcnow().strftime('%Y-%m')
+    now = datetime.utcnow()
+    result = RosterImportResult()
+    existing = {op.operator: op for op in Operator.query.all()}
+    seen = set()
+    # New operators go in with one executemany rather than an INSERT each
+    added = []
+
+    for row_number, row in enumerate(rows, start=2):
+        values = {column: _clean(value) for column, value in zip(columns, row) if column}
+        code = (values.get('operator') or '').upper()
+        if not code:
+            if any(values.values()):
+                result.errors.append((row_number, 'No OPERATOR code'))
+            continue
+        if code in seen:
+            result.errors.append((row_number, f'Operator {code} is listed twice, the first row was kept'))
+            continue
+        seen.add(code)
+
+        values['operator'] = code
+        values['status'] = 'INACTIVE' if (values.get('status') or 'ACTIVE').upper() == 'INACTIVE' else 'ACTIVE'
+        values['roster_month'] = month
+        values['updated_at'] = now
+
+        op = existing.get(code)
+        if op is None:
+            added.append(dict(dict.fromkeys(ROSTER_COLUMNS.values()), **values))
+            result.added += 1
+        else:
+            for column, value in values.items():
+                setattr(op, column, value)
+            result.updated += 1
+
+    for code, op in existing.items():
+        if code not in seen and op.status != 'INACTIVE':
+            op.status = 'INACTIVE'
+            op.updated_at = now
+            result.deactivated += 1
+
+    if added:
+        db.session.execute(Operator.__table__.insert(), added)
+    db.session.commit()
+    invalidate_roster()
+    return result
@@ -0,0 +1,104 @@
+from sqlalchemy import DDL, event, text
+from app import db
+from app.models import PaymentRecord
+
+# Columns indexed for partial-text search
+FTS_COLUMNS = ('loan_id', 'customer_name', 'operator_name')
+
+# The trigram tokenizer needs at least three characters to match anything
+FTS_MIN_TERM_LENGTH = 3
+
+# External-content FTS5 table over payment_record, kept in sync by triggers
+FTS_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS payment_record_fts USING fts5(
+        loan_id, customer_name, operator_name,
+        content='payment_record', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS payment_record_fts_ai AFTER INSERT ON payment_record BEGIN
+        INSERT INTO payment_record_fts (rowid, loan_id, customer_name, operator_name)
+        VALUES (new.id, new.loan_id, new.customer_name, new.operator_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS payment_record_fts_ad AFTER DELETE ON payment_record BEGIN
+        INSERT INTO payment_record_fts (payment_record_fts, rowid, loan_id, customer_name, operator_name)
+        VALUES ('delete', old.id, old.loan_id, old.customer_name, old.operator_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS payment_record_fts_au AFTER UPDATE OF loan_id, customer_name, operator_name
+    ON payment_record BEGIN
+        INSERT INTO payment_record_fts (payment_record_fts, rowid, loan_id, customer_name, operator_name)
+        VALUES ('delete', old.id, old.loan_id, old.customer_name, old.operator_name);
+        INSERT INTO payment_record_fts (rowid, loan_id, customer_name, operator_name)
+        VALUES (new.id, new.loan_id, new.customer_name, new.operator_name);
+    END
+    """,
+]
+
+# Create the search index whenever db.create_all() creates payment_record
+for _statement in FTS_STATEMENTS:
+    event.listen(PaymentRecord.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+# Cache of whether the FTS table exists, per database URL
+_fts_available = {}
+
+def search_index_available():
+    """Return True if the payment_record_fts table can be used for searches"""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    key = str(engine.url)
+    if key not in _fts_available:
+        found = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'payment_record_fts'")
+        ).first()
+        _fts_available[key] = found is not None
+    return _fts_available[key]
+
+def rebuild_search_index(connection):
+    """Create the FTS table and triggers if missing, then reindex every payment record"""
+    for statement in FTS_STATEMENTS:
+        connection.execute(text(statement))
+    connection.execute(text("INSERT INTO payment_record_fts (payment_record_fts) VALUES ('rebuild')"))
+    _fts_available.clear()
+
+def _fts_phrase(term):
+    """Quote a search term as an FTS5 phrase"""
+    return '"' + term.replace('"', '""') + '"'
+
+def apply_text_filters(query, **terms):
+    """
+    Filter a PaymentRecord query by partial matches on the text columns.
+
+    Terms of three characters or more are answered from the trigram index when
+    it is available; shorter terms (or other databases) fall back to ILIKE.
+
+    Usage: apply_text_filters(query, loan_id='LN12', operator_name='house')
+    """
+    use_fts = search_index_available()
+    match_clauses = []
+
+    for column, term in terms.items():
+        if column not in FTS_COLUMNS:
+            raise ValueError(f"{column} is not a searchable column")
+        term = (term or '').strip()
+        if not term:
+            continue
+
+        if use_fts and len(term) >= FTS_MIN_TERM_LENGTH:
+            match_clauses.append(f"{column} : {_fts_phrase(term)}")
+        else:
+            query = query.filter(getattr(PaymentRecord, column).ilike(f'%{term}%'))
+
+    if match_clauses:
+        query = query.filter(
+            text("payment_record.id IN (SELECT rowid FROM payment_record_fts WHERE payment_record_fts MATCH :fts_query)")
+            .bindparams(fts_query=' AND '.join(match_clauses))
+        )
+
+    return query
@@ -0,0 +1,121 @@
+import threading
+from sqlalchemy import event, text
+from sqlalchemy.pool import QueuePool
+
+# Defaults for the SQLITE_* settings in config.Config
+SQLITE_DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',          # readers no longer block the writer
+    'SQLITE_SYNCHRONOUS': 'NORMAL',        # safe with WAL, fsync only at checkpoints
+    'SQLITE_BUSY_TIMEOUT': 5000,           # ms to wait for a lock before "database is locked"
+    'SQLITE_CACHE_SIZE': -20000,           # page cache per connection (negative = KiB)
+    'SQLITE_MMAP_SIZE': 268435456,         # bytes of the file read through mmap
+    'SQLITE_POOL_SIZE': 10,                # connections kept open
+    'SQLITE_MAX_OVERFLOW': 10,             # extra connections under load
+    'SQLITE_POOL_TIMEOUT': 30,             # seconds to wait for a free connection
+    'SQLITE_MAINTENANCE_INTERVAL': 600,    # seconds between optimize/checkpoint runs, 0 = off
+}
+
+def sqlite_settings(config):
+    """Merge the SQLITE_* settings from a config mapping over the defaults"""
+    return {key: config.get(key, default) for key, default in SQLITE_DEFAULTS.items()}
+
+def connection_pragmas(settings):
+    """PRAGMA statements for a new connection, in the order they must run"""
+    return [
+        f"PRAGMA journal_mode={settings['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={settings['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(settings['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA cache_size={int(settings['SQLITE_CACHE_SIZE'])}",
+        f"PRAGMA mmap_size={int(settings['SQLITE_MMAP_SIZE'])}",
+    ]
+
+def apply_pragmas(dbapi_connection, pragmas):
+    """Run the tuning pragmas on a raw sqlite3 connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in pragmas:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+def engine_options(settings):
+    """SQLALCHEMY_ENGINE_OPTIONS for a file-backed SQLite database"""
+    return {
+        'poolclass': QueuePool,
+        'pool_size': settings['SQLITE_POOL_SIZE'],
+        'max_overflow': settings['SQLITE_MAX_OVERFLOW'],
+        'pool_timeout': settings['SQLITE_POOL_TIMEOUT'],
+        'pool_pre_ping': False,
+        'connect_args': {
+            # Pooled connections move between request and worker threads
+            'check_same_thread': False,
+            'timeout': settings['SQLITE_BUSY_TIMEOUT'] / 1000,
+        },
+    }
+
+def run_maintenance(app):
+    """Refresh planner statistics and fold the WAL back into the database file"""
+    from app import db
+
+    with app.app_context():
+        with db.engine.connect() as connection:
+            connection.execute(text("PRAGMA optimize"))
+            connection.execute(text("PRAGMA wal_checkpoint(PASSIVE)"))
+
+def _maintenance_loop(app, interval, stopped):
+    while not stopped.wait(interval):
+        try:
+            run_maintenance(app)
+        except Exception as e:
+            app.logger.warning(f"SQLite maintenance failed: {e}")
+
+def _tuned(app):
+    """True if the app's database is a SQLite file, the only kind this module tunes"""
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    return uri.startswith('sqlite') and ':memory:' not in uri and uri.rstrip('/') != 'sqlite:'
+
+def init_sqlite_tuning(app):
+    """
+    Configure the SQLite engine for concurrent use. Call right after
+    db.init_app(), before anything connects.
+
+    Sets a sized connection pool and runs the per-connection pragmas (WAL,
+    synchronous, busy timeout, cache and mmap sizes) on every connection of
+    this app's engine, and no other. Other databases and in-memory SQLite are
+    left untouched.
+    """
+    from app import db
+
+    if not _tuned(app):
+        return
+
+    settings = sqlite_settings(app.config)
+    pragmas = connection_pragmas(settings)
+
+    options = engine_options(settings)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    engine = db.get_engine(app)
+    event.listen(engine, 'connect', lambda dbapi_connection, record: apply_pragmas(dbapi_connection, pragmas))
+
+def start_sqlite_maintenance(app):
+    """
+    Start a background thread that runs PRAGMA optimize and a passive WAL
+    checkpoint every SQLITE_MAINTENANCE_INTERVAL seconds.
+
+    Only the long-running web process (run.py) starts it; one-shot scripts
+    and tests don't.
+    """
+    if not _tuned(app):
+        return
+
+    interval = sqlite_settings(app.config)['SQLITE_MAINTENANCE_INTERVAL']
+    if interval and 'sqlite_maintenance' not in app.extensions:
+        stopped = threading.Event()
+        thread = threading.Thread(
+            target=_maintenance_loop, args=(app, interval, stopped),
+            name='sqlite-maintenance', daemon=True
+        )
+        thread.start()
+        app.extensions['sqlite_maintenance'] = stopped
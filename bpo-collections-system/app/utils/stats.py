@@ -0,0 +1,161 @@
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from app import db
+from app.models import PaymentRecord, PaymentProof, Dispute, StatsCounter
+from app.utils.cache import TTLCache
+
+# Counters read by the Team Leader dashboard. Per-day entry counts are stored
+# as 'records_on:YYYY-MM-DD'.
+COUNTER_NAMES = ('total_records', 'records_with_proofs', 'pending_disputes')
+
+# Triggers keep stats_counter in step with every insert, delete and dispute
+# status change, including bulk statements that bypass the ORM.
+STATS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_payment_record_ai AFTER INSERT ON payment_record BEGIN
+        UPDATE stats_counter SET value = value + 1 WHERE name = 'total_records';
+        INSERT OR IGNORE INTO stats_counter (name, value) VALUES ('records_on:' || date(new.created_at), 0);
+        UPDATE stats_counter SET value = value + 1 WHERE name = 'records_on:' || date(new.created_at);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_payment_record_ad AFTER DELETE ON payment_record BEGIN
+        UPDATE stats_counter SET value = value - 1 WHERE name = 'total_records';
+        UPDATE stats_counter SET value = value - 1 WHERE name = 'records_on:' || date(old.created_at);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_payment_proof_ai AFTER INSERT ON payment_proof BEGIN
+        UPDATE stats_counter SET value = value + 1 WHERE name = 'records_with_proofs'
+            AND (SELECT count(*) FROM payment_proof WHERE payment_id = new.payment_id) = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_payment_proof_ad AFTER DELETE ON payment_proof BEGIN
+        UPDATE stats_counter SET value = value - 1 WHERE name = 'records_with_proofs'
+            AND NOT EXISTS (SELECT 1 FROM payment_proof WHERE payment_id = old.payment_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_dispute_ai AFTER INSERT ON dispute WHEN new.status = 'pending' BEGIN
+        UPDATE stats_counter SET value = value + 1 WHERE name = 'pending_disputes';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_dispute_au AFTER UPDATE OF status ON dispute
+    WHEN (old.status = 'pending') <> (new.status = 'pending') BEGIN
+        UPDATE stats_counter SET value = value + (CASE WHEN new.status = 'pending' THEN 1 ELSE -1 END)
+            WHERE name = 'pending_disputes';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_dispute_ad AFTER DELETE ON dispute WHEN old.status = 'pending' BEGIN
+        UPDATE stats_counter SET value = value - 1 WHERE name = 'pending_disputes';
+    END
+    """,
+]
+
+# Dashboard numbers are cached briefly and dropped whenever this process commits
+# a change to the underlying tables
+_stats_cache = TTLCache(ttl=30)
+
+def recount_stats(connection):
+    """Create the triggers if missing and recompute every counter from the tables"""
+    for statement in STATS_TRIGGERS:
+        connection.execute(text(statement))
+
+    connection.execute(text("DELETE FROM stats_counter"))
+    connection.execute(text("""
+        INSERT INTO stats_counter (name, value)
+        SELECT 'total_records', count(*) FROM payment_record
+        UNION ALL
+        SELECT 'records_with_proofs', count(DISTINCT payment_id) FROM payment_proof
+        UNION ALL
+        SELECT 'pending_disputes', count(*) FROM dispute WHERE status = 'pending'
+    """))
+    connection.execute(text("""
+        INSERT INTO stats_counter (name, value)
+        SELECT 'records_on:' || date(created_at), count(*) FROM payment_record
+        WHERE created_at IS NOT NULL GROUP BY date(created_at)
+    """))
+    _counters_present.clear()
+    invalidate_stats()
+
+@event.listens_for(db.Model.metadata, 'after_create')
+def _create_stats(target, connection, tables=(), **kw):
+    # Only fill the counters when create_all() has just made the table
+    if connection.dialect.name == 'sqlite' and StatsCounter.__table__ in tables:
+        recount_stats(connection)
+
+@event.listens_for(Session, 'after_flush')
+def _mark_stats_dirty(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (PaymentRecord, PaymentProof, Dispute)):
+            session.info['stats_dirty'] = True
+            return
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('stats_dirty', False):
+        invalidate_stats()
+
+def invalidate_stats():
+    """Drop cached dashboard numbers (call after bulk statements that skip the ORM)"""
+    _stats_cache.invalidate()
+
+# Cache of whether stats_counter exists, per database URL
+_counters_present = {}
+
+def _counters_available():
+    """Return True if the trigger-maintained stats_counter table can be read"""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    key = str(engine.url)
+    if key not in _counters_present:
+        found = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'stats_payment_record_ai'")
+        ).first()
+        _counters_present[key] = found is not None
+    return _counters_present[key]
+
+def _read_counters(today):
+    """Read the dashboard counters from stats_counter in one query"""
+    names = COUNTER_NAMES + (f'records_on:{today.isoformat()}',)
+    values = dict(
+        db.session.query(StatsCounter.name, StatsCounter.value)
+        .filter(StatsCounter.name.in_(names))
+        .all()
+    )
+    return {
+        'total_records': values.get('total_records', 0),
+        'today_records': values.get(f'records_on:{today.isoformat()}', 0),
+        'records_with_proofs': values.get('records_with_proofs', 0),
+        'pending_disputes': values.get('pending_disputes', 0),
+    }
+
+def _count_directly(today):
+    """Compute the dashboard counters with aggregate queries (databases without the triggers)"""
+    start = datetime.combine(today, time.min)
+    return {
+        'total_records': PaymentRecord.query.count(),
+        'today_records': PaymentRecord.query.filter(
+            PaymentRecord.created_at >= start,
+            PaymentRecord.created_at < start + timedelta(days=1)
+        ).count(),
+        'records_with_proofs': db.session.query(db.func.count(db.distinct(PaymentProof.payment_id))).scalar(),
+        'pending_disputes': Dispute.query.filter_by(status='pending').count(),
+    }
+
+def get_dashboard_stats():
+    """Return total, today's, with-proof and pending-dispute counts for the TL dashboard"""
+    today = date.today()
+
+    def compute():
+        if _counters_available():
+            return _read_counters(today)
+        return _count_directly(today)
+
+    return _stats_cache.get_or_set(today, compute)
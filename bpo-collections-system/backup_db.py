@@ -0,0 +1,65 @@
+import argparse
+import time
+from datetime import datetime
+from app import create_app, db
+from app.utils.backups import BackupError, backup_from_config, backup_settings, list_backups, \
+    default_backup_dir, verify_backup
+
+parser = argparse.ArgumentParser(description='Back up the SQLite database while the app is running')
+parser.add_argument('--label', default='manual', help='name part of the backup file, rotation is per label')
+parser.add_argument('--compress', action='store_true', help='gzip the backup (overrides BACKUP_COMPRESS)')
+parser.add_argument('--keep', type=int, help='backups to keep for this label (overrides BACKUP_KEEP)')
+parser.add_argument('--schedule', action='store_true',
+                    help='keep running and back up every BACKUP_INTERVAL_HOURS (label "scheduled")')
+parser.add_argument('--list', action='store_true', help='list existing backups and exit')
+parser.add_argument('--verify', metavar='PATH', help='integrity-check an existing backup and exit')
+args = parser.parse_args()
+
+app = create_app()
+
+if args.compress:
+    app.config['BACKUP_COMPRESS'] = True
+if args.keep is not None:
+    app.config['BACKUP_KEEP'] = args.keep
+
+def show_progress(copied, total):
+    print(f"\r  {copied}/{total} pages", end='', flush=True)
+
+def run_backup(db_path, label):
+    started = time.perf_counter()
+    path = backup_from_config(db_path, app.config, label=label, progress=show_progress)
+    print(f"\nBackup written to {path} in {time.perf_counter() - started:.1f}s (integrity check ok)")
+
+with app.app_context():
+    if db.engine.dialect.name != 'sqlite':
+        print("Online backups are for the SQLite database; use pg_dump for PostgreSQL.")
+        raise SystemExit(1)
+
+    db_path = db.engine.url.database
+    backup_dir = backup_settings(app.config)['BACKUP_DIR'] or default_backup_dir(db_path)
+
+    try:
+        if args.verify:
+            verify_backup(args.verify)
+            print(f"{args.verify}: integrity check ok")
+        elif args.list:
+            for path in list_backups(backup_dir):
+                print(path)
+        elif args.schedule:
+            hours = backup_settings(app.config)['BACKUP_INTERVAL_HOURS']
+            print(f"Backing up {db_path} every {hours} hours to {backup_dir} (Ctrl+C to stop)")
+            while True:
+                print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Starting backup")
+                try:
+                    run_backup(db_path, 'scheduled')
+                except BackupError as e:
+                    print(f"\nBackup failed: {e}")
+                time.sleep(hours * 3600)
+        else:
+            print(f"Backing up {db_path}...")
+            run_backup(db_path, args.label)
+    except BackupError as e:
+        print(f"\nBackup failed: {e}")
+        raise SystemExit(1)
+    except KeyboardInterrupt:
+        print("\nStopped.")
@@ -0,0 +1,136 @@
+"""
+Benchmark concurrent data entry while a DA export is streaming, with SQLite's
+default rollback journal and with the WAL tuning from app/utils/sqlite_tuning.py.
+
+Seeds a scratch SQLite database (500k payment records by default), then runs a
+reader that streams the whole table in export-sized batches while writer
+threads insert one payment per transaction, like the data entry form. Writer
+commit latency and "database is locked" failures are reported for both modes.
+
+Usage:
+    python benchmarks/bench_concurrency.py [--rows 500000] [--writers 4] [--db /tmp/bench_concurrency.db]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.bench_indexes import seed
+from app.utils.sqlite_tuning import SQLITE_DEFAULTS, connection_pragmas, apply_pragmas
+
+EXPORT_BATCH_SIZE = 2000
+
+# Before the tuning: rollback journal, full fsync, pysqlite's 5s lock timeout
+DEFAULT_PRAGMAS = ["PRAGMA journal_mode=DELETE", "PRAGMA synchronous=FULL"]
+
+def connect(path, pragmas):
+    conn = sqlite3.connect(path, timeout=SQLITE_DEFAULTS['SQLITE_BUSY_TIMEOUT'] / 1000,
+                           check_same_thread=False)
+    apply_pragmas(conn, pragmas)
+    return conn
+
+def export_reader(path, pragmas, result):
+    """Stream every record in batches inside one read transaction, like an export"""
+    conn = connect(path, pragmas)
+    started = time.perf_counter()
+    conn.execute("BEGIN")
+    cursor = conn.execute(
+        "SELECT loan_id, customer_name, amount, date_paid, operator_name, campaign, dpd, created_at "
+        "FROM payment_record ORDER BY id"
+    )
+    rows = 0
+    while True:
+        batch = cursor.fetchmany(EXPORT_BATCH_SIZE)
+        if not batch:
+            break
+        rows += len(batch)
+        # Stand-in for the workbook writing done per batch
+        time.sleep(0.002)
+    conn.execute("COMMIT")
+    conn.close()
+    result['rows'] = rows
+    result['seconds'] = time.perf_counter() - started
+
+def data_entry_writer(path, pragmas, stop, latencies, errors):
+    """Insert one payment per transaction until the export finishes"""
+    conn = connect(path, pragmas)
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            conn.execute(
+                "INSERT INTO payment_record (campaign, dpd, loan_id, amount, date_paid, operator_name, "
+                "customer_name, created_at) VALUES ('TALA', 30, 'LNBENCH', 1500, '2025-08-01', "
+                "'HOUSE_1', 'Bench Customer', ?)", (datetime.utcnow().isoformat(sep=' '),)
+            )
+            conn.commit()
+            latencies.append((time.perf_counter() - started) * 1000)
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            errors.append(str(e))
+        time.sleep(0.01)
+    conn.close()
+
+def run(path, pragmas, writers):
+    stop = threading.Event()
+    latencies, errors, export = [], [], {}
+
+    threads = [
+        threading.Thread(target=data_entry_writer, args=(path, pragmas, stop, latencies, errors))
+        for _ in range(writers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    reader = threading.Thread(target=export_reader, args=(path, pragmas, export))
+    reader.start()
+    reader.join()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    print(f"  export streamed {export['rows']} rows in {export['seconds']:.1f}s")
+    print(f"  writes committed during export: {len(latencies)}, failed: {len(errors)}")
+    if latencies:
+        print(f"  commit latency ms: median {statistics.median(latencies):.1f}, "
+              f"p99 {p99:.1f}, max {latencies[-1]:.1f}")
+    if errors:
+        print(f"  first error: {errors[0]}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500000, help='payment records to seed')
+    parser.add_argument('--writers', type=int, default=4, help='concurrent data entry threads')
+    parser.add_argument('--db', default='/tmp/bench_concurrency.db', help='scratch database path')
+    args = parser.parse_args()
+
+    seed_path = args.db + '.seed'
+    if os.path.exists(seed_path):
+        os.remove(seed_path)
+    conn = sqlite3.connect(seed_path)
+    seed(conn, args.rows)
+    conn.commit()
+    conn.close()
+
+    for label, pragmas in [('default rollback journal', DEFAULT_PRAGMAS),
+                           ('tuned (WAL)', connection_pragmas(SQLITE_DEFAULTS))]:
+        # Fresh copy per mode so both start from the same file
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+        shutil.copyfile(seed_path, args.db)
+        print(f"{label}:")
+        run(args.db, pragmas, args.writers)
+        print()
+
+    os.remove(seed_path)
+
+if __name__ == '__main__':
+    main()
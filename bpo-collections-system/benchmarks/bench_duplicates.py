@@ -0,0 +1,93 @@
+"""
+Benchmark the duplicate payment scan from app/utils/duplicates.py.
+
+Seeds a scratch SQLite database (3M payment records by default), plants
+duplicates of every kind, then times a full first scan and an incremental
+scan after a day's worth of new entries.
+
+Usage:
+    python benchmarks/bench_duplicates.py [--rows 3000000] [--new 20000] [--db /tmp/bench_duplicates.db]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine
+from benchmarks.bench_indexes import seed, create_indexes
+from app.models import DuplicateCandidate, DuplicateScan
+from app.utils.duplicates import scan_duplicates
+
+PLANTED = 1000  # duplicates of each kind
+
+def plant_duplicates(conn, first_id, count):
+    """Copy `count` records starting at first_id three ways: same loan, renamed loan, shared proof"""
+    conn.execute("""
+        INSERT INTO payment_record (campaign, dpd, loan_id, amount, date_paid, operator_name, customer_name, created_at)
+        SELECT campaign, dpd, loan_id, amount, date(date_paid, '+1 day'), operator_name, customer_name, created_at
+        FROM payment_record WHERE id >= ? AND id < ?
+    """, (first_id, first_id + count))
+    conn.execute("""
+        INSERT INTO payment_record (campaign, dpd, loan_id, amount, date_paid, operator_name, customer_name, created_at)
+        SELECT campaign, dpd, loan_id || 'X', amount, date_paid, operator_name, upper(customer_name), created_at
+        FROM payment_record WHERE id >= ? AND id < ?
+    """, (first_id + count, first_id + 2 * count))
+    conn.execute("""
+        INSERT INTO payment_proof (payment_id, file_path, file_type, content_hash, uploaded_at)
+        SELECT payment_id + 1, file_path, file_type, content_hash, uploaded_at
+        FROM payment_proof WHERE payment_id >= ? AND payment_id < ?
+    """, (first_id + 2 * count, first_id + 4 * count))
+    conn.commit()
+
+def timed_scan(engine, label):
+    started = time.perf_counter()
+    result = scan_duplicates(engine)
+    print(f"{label:<18} {time.perf_counter() - started:>6.2f}s  {result.records_scanned:>8} records  "
+          f"{result.proofs_scanned:>8} proofs  found {result.found}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=3000000, help='payment records to seed')
+    parser.add_argument('--new', type=int, default=20000, help='records added before the incremental scan')
+    parser.add_argument('--db', default='/tmp/bench_duplicates.db', help='scratch database path')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+
+    conn = sqlite3.connect(args.db)
+    seed(conn, args.rows)
+    conn.execute("ALTER TABLE payment_proof ADD COLUMN content_hash VARCHAR(64)")
+    conn.execute("UPDATE payment_proof SET content_hash = printf('%064d', id)")
+    create_indexes(conn.cursor())
+    plant_duplicates(conn, 1, PLANTED)
+    conn.commit()
+
+    engine = create_engine(f'sqlite:///{args.db}')
+    DuplicateCandidate.__table__.create(engine)
+    DuplicateScan.__table__.create(engine)
+    print(f"Seeded {args.rows} records with {PLANTED} planted duplicates of each kind\n")
+
+    timed_scan(engine, 'full first scan')
+
+    # A day of data entry, some of it repeating recent payments
+    last_id = conn.execute("SELECT max(id) FROM payment_record").fetchone()[0]
+    conn.execute("""
+        INSERT INTO payment_record (campaign, dpd, loan_id, amount, date_paid, operator_name, customer_name, created_at)
+        SELECT campaign, dpd, 'NEW' || id, amount + 1, date_paid, operator_name, 'New ' || id, created_at
+        FROM payment_record WHERE id > ? AND id <= ?
+    """, (args.rows - args.new, args.rows))
+    plant_duplicates(conn, args.rows - PLANTED * 4, PLANTED)
+    print(f"Added {conn.execute('SELECT max(id) FROM payment_record').fetchone()[0] - last_id} records")
+
+    timed_scan(engine, 'incremental scan')
+    timed_scan(engine, 'nothing new')
+
+    conn.close()
+    engine.dispose()
+    os.remove(args.db)
+
+if __name__ == '__main__':
+    main()
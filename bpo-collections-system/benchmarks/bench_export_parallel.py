@@ -0,0 +1,81 @@
+"""
+Benchmark the all-campaigns export written in-process against the process
+pool in app/utils/parallel_export.py.
+
+Seeds a scratch SQLite database (200k payment records by default), exports
+every campaign once in-process and then with each --processes count, and
+reports the time and speedup of each. Every parallel workbook is checked
+against the in-process one: all parts of the file except its creation time
+must be byte for byte the same.
+
+Usage:
+    python benchmarks/bench_export_parallel.py [--rows 200000] [--processes 2,4,8] [--db /tmp/bench_export.db]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.bench_indexes import seed, create_indexes
+
+def workbook_parts(path):
+    """Uncompressed contents of a workbook, leaving out the creation timestamp"""
+    with zipfile.ZipFile(path) as workbook:
+        return {name: workbook.read(name) for name in workbook.namelist() if name != 'docProps/core.xml'}
+
+def timed_export(app, processes, repeat):
+    from app.utils.export_helpers import export_campaign_data
+
+    timings = []
+    for _ in range(repeat):
+        with app.app_context():
+            started = time.perf_counter()
+            path, _, record_count = export_campaign_data(processes=processes)
+            timings.append(time.perf_counter() - started)
+        parts = workbook_parts(path)
+        os.remove(path)
+    return statistics.median(timings), record_count, parts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='payment records to seed')
+    parser.add_argument('--processes', default='2,4,8', help='comma separated process pool sizes to try')
+    parser.add_argument('--part-rows', type=int, default=20000, help='rows of one sheet per worker task')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per setting (median is reported)')
+    parser.add_argument('--db', default='/tmp/bench_export.db', help='scratch database path')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+
+    conn = sqlite3.connect(args.db)
+    seed(conn, args.rows)
+    conn.execute("ALTER TABLE payment_record ADD COLUMN is_duplicate BOOLEAN NOT NULL DEFAULT 0")
+    create_indexes(conn.cursor())
+    conn.commit()
+    conn.close()
+
+    # config.Config reads DATABASE_URL when it is imported
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(args.db)
+    from app import create_app
+    app = create_app()
+    app.config['EXPORT_PARALLEL_MIN_ROWS'] = 0
+    app.config['EXPORT_PART_ROWS'] = args.part_rows
+
+    print(f"{os.cpu_count()} CPU cores, {args.rows} records\n")
+    print(f"{'export':<24}{'time':>10}{'speedup':>10}  output")
+
+    baseline, record_count, expected = timed_export(app, 0, args.repeat)
+    print(f"{'in-process':<24}{baseline:>9.2f}s{1:>9.2f}x  {record_count} records")
+
+    for processes in [int(count) for count in args.processes.split(',')]:
+        elapsed, record_count, parts = timed_export(app, processes, args.repeat)
+        same = 'identical' if parts == expected else 'DIFFERENT'
+        print(f"{f'{processes} processes':<24}{elapsed:>9.2f}s{baseline / elapsed:>9.2f}x  {same}")
+
+if __name__ == '__main__':
+    main()
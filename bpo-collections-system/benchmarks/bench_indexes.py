@@ -0,0 +1,195 @@
+"""
+Benchmark the hot listing, export and dispute queue queries before and after
+the indexes from migration v0004 (migrations/versions) are created.
+
+Seeds a scratch SQLite database (1M payment records by default), prints the
+EXPLAIN QUERY PLAN and median latency of each query without indexes, then
+creates the indexes and repeats.
+
+Usage:
+    python benchmarks/bench_indexes.py [--rows 1000000] [--db /tmp/bench_indexes.db]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from migrations.versions.v0004_query_indexes import INDEXES
+
+CAMPAIGNS = ['LANDERS', 'MPL', 'MAYA CREDIT', 'TALA', 'OLP', 'KVIKU', 'SKYRO']
+
+SCHEMA = """
+CREATE TABLE payment_record (
+    id INTEGER PRIMARY KEY,
+    campaign VARCHAR(50) NOT NULL,
+    dpd INTEGER NOT NULL,
+    loan_id VARCHAR(100) NOT NULL,
+    amount FLOAT NOT NULL,
+    date_paid DATE NOT NULL,
+    operator_name VARCHAR(100) NOT NULL,
+    customer_name VARCHAR(100) NOT NULL,
+    created_at DATETIME
+);
+CREATE TABLE payment_proof (
+    id INTEGER PRIMARY KEY,
+    payment_id INTEGER NOT NULL,
+    file_path VARCHAR(255) NOT NULL,
+    file_type VARCHAR(50) NOT NULL,
+    uploaded_at DATETIME
+);
+CREATE TABLE dispute (
+    id INTEGER PRIMARY KEY,
+    entry_id INTEGER NOT NULL,
+    reason VARCHAR(50) NOT NULL,
+    corrected_details TEXT NOT NULL,
+    status VARCHAR(20),
+    created_by VARCHAR(100) NOT NULL,
+    created_at DATETIME,
+    validated_by VARCHAR(100),
+    validated_at DATETIME,
+    validation_comments TEXT,
+    da_verified_by VARCHAR(100),
+    da_verified_at DATETIME,
+    da_comments TEXT
+);
+"""
+
+# (label, sql, params) mirroring the queries issued by the routes and export helpers
+QUERIES = [
+    ('search: newest page',
+     "SELECT * FROM payment_record ORDER BY created_at DESC LIMIT 20", ()),
+    ('search: campaign page',
+     "SELECT * FROM payment_record WHERE campaign = ? ORDER BY created_at DESC LIMIT 20", ('TALA',)),
+    ('filter: campaign + date range page',
+     "SELECT * FROM payment_record WHERE campaign = ? AND date_paid >= ? AND date_paid <= ? "
+     "ORDER BY created_at DESC LIMIT 10", ('MPL', '2025-08-01', '2025-08-07')),
+    ('filter: campaign count',
+     "SELECT count(*) FROM payment_record WHERE campaign = ?", ('KVIKU',)),
+    ('export: campaign + month',
+     "SELECT loan_id, customer_name, amount, date_paid, operator_name, campaign, dpd, created_at "
+     "FROM payment_record WHERE campaign = ? AND date_paid >= ? AND date_paid <= ? ORDER BY id",
+     ('LANDERS', '2025-08-01', '2025-08-31')),
+    ('export: sheet order for a week',
+     "SELECT campaign FROM payment_record WHERE date_paid >= ? AND date_paid <= ? "
+     "GROUP BY campaign ORDER BY min(id)", ('2025-08-01', '2025-08-07')),
+    ('TL queue: pending disputes',
+     "SELECT * FROM dispute JOIN payment_record ON dispute.entry_id = payment_record.id "
+     "WHERE dispute.status = 'pending' ORDER BY dispute.created_at DESC", ()),
+    ('DA queue: pending_da_review',
+     "SELECT * FROM dispute JOIN payment_record ON dispute.entry_id = payment_record.id "
+     "WHERE dispute.status = 'pending_da_review' ORDER BY dispute.validated_at DESC", ()),
+    ('disputes for a record',
+     "SELECT * FROM dispute WHERE entry_id = ?", (4242,)),
+    ('proofs for a page of records',
+     "SELECT * FROM payment_proof WHERE payment_id IN (101, 202, 303, 404, 505, 606, 707, 808, 909, 1010)", ()),
+    ('loan id lookup',
+     "SELECT * FROM payment_record WHERE loan_id = ?", ('LN00424242',)),
+]
+
+def create_indexes(cursor):
+    """Create the migration's indexes on the scratch database and refresh planner statistics"""
+    for name, table, columns in INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+    cursor.execute("ANALYZE")
+
+def seed(conn, rows):
+    """Fill the scratch database with synthetic payments, proofs and disputes"""
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+    cursor = conn.cursor()
+    cursor.executescript(SCHEMA)
+
+    batch = []
+    for i in range(1, rows + 1):
+        created = start + timedelta(seconds=i * 25)
+        batch.append((
+            i, rng.choice(CAMPAIGNS), rng.randint(1, 180), f'LN{i:08d}',
+            round(rng.uniform(100, 20000), 2), (created.date() - timedelta(days=rng.randint(0, 3))).isoformat(),
+            f'HOUSE_{rng.randint(1, 330)}', f'Customer {i}', created.isoformat(sep=' ')
+        ))
+        if len(batch) == 50000:
+            cursor.executemany("INSERT INTO payment_record VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        cursor.executemany("INSERT INTO payment_record VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+
+    cursor.executemany(
+        "INSERT INTO payment_proof (payment_id, file_path, file_type, uploaded_at) VALUES (?, ?, 'receipt', ?)",
+        ((i, f'uploads/payment_proofs/{i}.png', start.isoformat(sep=' ')) for i in range(1, rows + 1, 2))
+    )
+
+    statuses = ['pending'] * 2 + ['pending_da_review'] * 2 + ['approved'] * 10 + ['rejected'] * 6
+    disputes = []
+    for i in range(max(rows // 50, 1)):
+        created = start + timedelta(minutes=i * 7)
+        status = rng.choice(statuses)
+        validated = (created + timedelta(hours=4)).isoformat(sep=' ') if status != 'pending' else None
+        disputes.append((rng.randint(1, rows), 'wrong_amount', 'Correct amount', status, 'teamleader',
+                         created.isoformat(sep=' '), validated))
+    cursor.executemany(
+        "INSERT INTO dispute (entry_id, reason, corrected_details, status, created_by, created_at, validated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", disputes
+    )
+    conn.commit()
+
+def run_queries(conn, repeat):
+    """Return {label: (plan lines, median ms)} for every benchmark query"""
+    results = {}
+    for label, sql, params in QUERIES:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[label] = (plan, statistics.median(timings))
+    return results
+
+def print_results(title, results):
+    print(f"\n=== {title} ===")
+    for label, (plan, ms) in results.items():
+        print(f"{label:<38} {ms:>10.2f} ms")
+        for line in plan:
+            print(f"    {line}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='payment records to seed')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per query (median is reported)')
+    parser.add_argument('--db', default='/tmp/bench_indexes.db', help='scratch database path')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+
+    conn = sqlite3.connect(args.db)
+    started = time.perf_counter()
+    seed(conn, args.rows)
+    print(f"Seeded {args.rows} payment records in {time.perf_counter() - started:.1f}s")
+
+    before = run_queries(conn, args.repeat)
+    print_results('Without indexes', before)
+
+    started = time.perf_counter()
+    create_indexes(conn.cursor())
+    conn.commit()
+    print(f"\nCreated indexes in {time.perf_counter() - started:.1f}s")
+
+    after = run_queries(conn, args.repeat)
+    print_results('With indexes', after)
+
+    print("\n=== Speedup ===")
+    for label in before:
+        print(f"{label:<38} {before[label][1]:>10.2f} ms -> {after[label][1]:>8.2f} ms "
+              f"({before[label][1] / max(after[label][1], 0.001):.1f}x)")
+
+    conn.close()
+    os.remove(args.db)
+
+if __name__ == '__main__':
+    main()
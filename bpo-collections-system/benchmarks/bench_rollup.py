@@ -0,0 +1,112 @@
+"""
+Benchmark month-to-date and year-to-date collection totals computed from
+payment_record against the trigger-maintained payment_rollup table from
+app/utils/rollups.py.
+
+Seeds a scratch SQLite database (1M payment records by default) with a given
+number of operators, builds the rollup and times the summary query for each
+grouping. The rollup pays off in proportion to how many payments share a
+campaign, operator, day and DPD bucket, so try a few --operators values.
+
+Usage:
+    python benchmarks/bench_rollup.py [--rows 1000000] [--operators 40] [--db /tmp/bench_rollup.db]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.bench_indexes import seed, create_indexes
+from app.utils.rollups import ROLLUP_TRIGGERS, dpd_bucket_sql
+
+ROLLUP_SCHEMA = """
+CREATE TABLE payment_rollup (
+    date_paid DATE NOT NULL,
+    campaign VARCHAR(50) NOT NULL,
+    operator_name VARCHAR(100) NOT NULL,
+    dpd_bucket VARCHAR(10) NOT NULL,
+    record_count INTEGER NOT NULL,
+    amount_sum FLOAT NOT NULL,
+    amount_min FLOAT,
+    amount_max FLOAT,
+    PRIMARY KEY (date_paid, campaign, operator_name, dpd_bucket)
+) WITHOUT ROWID
+"""
+
+# (label, group expression on payment_record, group column on payment_rollup)
+GROUPINGS = [
+    ('by campaign', 'campaign', 'campaign'),
+    ('by operator', 'operator_name', 'operator_name'),
+    ('by DPD bucket', dpd_bucket_sql('dpd'), 'dpd_bucket'),
+]
+
+DIRECT_SQL = ("SELECT {group}, count(*), sum(amount), min(amount), max(amount) FROM payment_record "
+              "WHERE date_paid >= ? AND date_paid <= ? GROUP BY 1")
+ROLLUP_SQL = ("SELECT {group}, sum(record_count), sum(amount_sum), min(amount_min), max(amount_max) "
+              "FROM payment_rollup WHERE date_paid >= ? AND date_paid <= ? GROUP BY 1")
+
+def timed(conn, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='payment records to seed')
+    parser.add_argument('--operators', type=int, default=40, help='distinct operator names')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per query (median is reported)')
+    parser.add_argument('--db', default='/tmp/bench_rollup.db', help='scratch database path')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+
+    conn = sqlite3.connect(args.db)
+    seed(conn, args.rows)
+    conn.execute("ALTER TABLE payment_record ADD COLUMN is_duplicate BOOLEAN NOT NULL DEFAULT 0")
+    conn.execute("UPDATE payment_record SET operator_name = 'HOUSE_' || (id % ?)", (args.operators,))
+    create_indexes(conn.cursor())
+
+    started = time.perf_counter()
+    conn.execute(ROLLUP_SCHEMA)
+    for statement in ROLLUP_TRIGGERS:
+        conn.execute(statement)
+    conn.execute(f"""
+        INSERT INTO payment_rollup
+        SELECT date_paid, campaign, operator_name, {dpd_bucket_sql('dpd')},
+            count(*), sum(amount), min(amount), max(amount)
+        FROM payment_record GROUP BY 1, 2, 3, 4
+    """)
+    conn.commit()
+    groups = conn.execute("SELECT count(*) FROM payment_rollup").fetchone()[0]
+    print(f"Built rollup of {args.rows} records into {groups} groups in {time.perf_counter() - started:.1f}s\n")
+
+    last_day = conn.execute("SELECT max(date_paid) FROM payment_record").fetchone()[0]
+    periods = [('month to date', last_day[:8] + '01'), ('year to date', last_day[:5] + '01-01')]
+
+    print(f"{'query':<32}{'payment_record':>16}{'payment_rollup':>16}")
+    for period, start in periods:
+        for label, record_group, rollup_group in GROUPINGS:
+            direct = timed(conn, DIRECT_SQL.format(group=record_group), (start, last_day), args.repeat)
+            rolled = timed(conn, ROLLUP_SQL.format(group=rollup_group), (start, last_day), args.repeat)
+            print(f"{period + ', ' + label:<32}{direct:>13.1f} ms{rolled:>13.1f} ms")
+
+    # Cost the triggers add to data entry
+    started = time.perf_counter()
+    for i in range(5000):
+        conn.execute(
+            "INSERT INTO payment_record (campaign, dpd, loan_id, amount, date_paid, operator_name, customer_name, "
+            "created_at) VALUES ('TALA', 45, ?, 1500, ?, 'HOUSE_1', 'Bench Customer', ?)",
+            (f'LNBENCH{i}', last_day, last_day + ' 12:00:00')
+        )
+    conn.commit()
+    print(f"\n5000 single-row inserts with rollup triggers: {time.perf_counter() - started:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark partial-text search with ILIKE '%term%' against the FTS5 trigram
+index used by app/utils/search.py.
+
+Seeds a scratch SQLite database (1M payment records by default) and times the
+search page query (newest 20 matches) for a few typical keystroke searches.
+
+Usage:
+    python benchmarks/bench_search.py [--rows 1000000] [--db /tmp/bench_search.db]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.bench_indexes import seed, create_indexes
+from app.utils.search import FTS_STATEMENTS
+
+# (label, column, term)
+SEARCHES = [
+    ('partial loan id', 'loan_id', '0042424'),
+    ('loan id prefix', 'loan_id', 'LN0099'),
+    ('customer name', 'customer_name', 'tomer 77777'),
+    ('operator name', 'operator_name', 'HOUSE_31'),
+]
+
+PAGE_SQL = "SELECT * FROM payment_record WHERE {where} ORDER BY created_at DESC LIMIT 20"
+
+def timed(conn, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='payment records to seed')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per query (median is reported)')
+    parser.add_argument('--db', default='/tmp/bench_search.db', help='scratch database path')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+
+    conn = sqlite3.connect(args.db)
+    seed(conn, args.rows)
+    create_indexes(conn.cursor())
+
+    started = time.perf_counter()
+    for statement in FTS_STATEMENTS:
+        conn.execute(statement)
+    conn.execute("INSERT INTO payment_record_fts (payment_record_fts) VALUES ('rebuild')")
+    conn.commit()
+    print(f"Built trigram index over {args.rows} records in {time.perf_counter() - started:.1f}s\n")
+
+    print(f"{'search':<18} {'ILIKE':>12} {'FTS5':>12}")
+    for label, column, term in SEARCHES:
+        like_ms = timed(conn, PAGE_SQL.format(where=f"{column} LIKE ?"), (f'%{term}%',), args.repeat)
+        fts_ms = timed(
+            conn,
+            PAGE_SQL.format(where="id IN (SELECT rowid FROM payment_record_fts WHERE payment_record_fts MATCH ?)"),
+            (f'{column} : "{term}"',),
+            args.repeat
+        )
+        print(f"{label:<18} {like_ms:>9.2f} ms {fts_ms:>9.2f} ms")
+
+    conn.close()
+    os.remove(args.db)
+
+if __name__ == '__main__':
+    main()
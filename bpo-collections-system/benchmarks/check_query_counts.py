@@ -0,0 +1,175 @@
+"""
+Check that every page and API endpoint runs a bounded number of SQL queries.
+
+Seeds a scratch SQLite database through the app's models (payments with
+proofs, disputes in every status, duplicate candidates and export history),
+requests each endpoint and reads its query count from the X-Query-Count
+header added by app/utils/query_stats.py. The data is then grown --scale
+times and every endpoint is requested again. An endpoint fails if it ran more
+queries on the larger data (a query per row) or more than its budget.
+
+The dispute export, which runs outside a request, is counted the same way.
+tests/test_query_counts.py runs these budgets under pytest, with the form
+posts as well.
+
+Usage:
+    python benchmarks/check_query_counts.py [--rows 50] [--scale 10] [--db /tmp/check_queries.db]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CAMPAIGNS = ['LANDERS', 'MPL', 'MAYA CREDIT', 'TALA', 'OLP', 'KVIKU', 'SKYRO']
+
+# (role, method, url, most queries allowed)
+ENDPOINTS = [
+    ('team_leader', 'GET', '/team-leader/data-entry', 6),
+    ('team_leader', 'GET', '/team-leader/search', 6),
+    ('team_leader', 'GET', '/team-leader/search?campaign=TALA&date_from=2025-08-01', 6),
+    ('team_leader', 'GET', '/team-leader/dispute-validation', 8),
+    ('team_leader', 'GET', '/team-leader/dispute-validation?campaign=TALA', 8),
+    ('team_leader', 'GET', '/team-leader/import-payments', 2),
+    ('team_leader', 'GET', '/team-leader/operators?q=HOUSE', 2),
+    ('team_leader', 'GET', '/team-leader/record-proofs/1', 3),
+    ('team_leader', 'GET', '/api/v1/payments', 3),
+    ('team_leader', 'GET', '/api/v1/disputes?status=pending', 3),
+    ('team_leader', 'GET', '/api/v1/proofs?payment_ids=1,2,3,4,5', 3),
+    ('data_analyst', 'GET', '/data-analyst/dispute-review', 8),
+    ('data_analyst', 'GET', '/data-analyst/campaign-filter', 5),
+    ('data_analyst', 'GET', '/data-analyst/export-data', 4),
+    ('data_analyst', 'GET', '/data-analyst/summary', 4),
+    ('data_analyst', 'GET', '/data-analyst/summary/data', 3),
+    ('data_analyst', 'GET', '/data-analyst/export-jobs/1', 3),
+]
+
+def seed(db, rows):
+    """Add rows payments, each with two proofs, and disputes, duplicate candidates and exports in proportion"""
+    from app.models import (Dispute, DuplicateCandidate, ExportHistory, PaymentProof, PaymentRecord,
+                            User)
+
+    if not User.query.first():
+        db.session.add(User(username='tl', password='', role='team_leader'))
+        db.session.add(User(username='da', password='', role='data_analyst'))
+
+    first = (db.session.query(db.func.max(PaymentRecord.id)).scalar() or 0) + 1
+    now = datetime.utcnow()
+    records = [
+        PaymentRecord(campaign=random.choice(CAMPAIGNS), dpd=i % 180, loan_id=f'LN{i:07d}', amount=100 + i,
+                      date_paid=date(2025, 8, 1) + timedelta(days=i % 28), operator_name=f'HOUSE_{i % 20}',
+                      customer_name=f'Customer {i}')
+        for i in range(first, first + rows)
+    ]
+    db.session.add_all(records)
+    db.session.flush()
+
+    for i, record in enumerate(records):
+        for kind in ('receipt', 'screenshot'):
+            db.session.add(PaymentProof(payment_id=record.id, file_path=f'uploads/{record.loan_id}_{kind}.png',
+                                        file_type=kind, content_hash=f'{record.id}-{kind}'))
+        if i % 2 == 0:
+            status = ('pending', 'pending_da_review', 'approved', 'rejected')[i // 2 % 4]
+            db.session.add(Dispute(
+                entry_id=record.id, reason='wrong_amount', corrected_details='Amount', corrected_amount=1.0,
+                status=status, created_by='tl', validated_by='tl', validated_at=now,
+                da_verified_by='da' if status == 'approved' else None,
+                da_verified_at=now if status == 'approved' else None
+            ))
+        if i % 4 == 1:
+            db.session.add(DuplicateCandidate(entry_id=record.id, duplicate_of_id=records[i - 1].id,
+                                              rule='loan_amount'))
+        if i % 10 == 0:
+            db.session.add(ExportHistory(export_type='campaign', record_count=rows, filename=f'export_{i}.csv',
+                                         created_by='da'))
+    db.session.commit()
+
+def count_requests(app):
+    """{(role, url): queries run} for every endpoint"""
+    from app.models import User
+
+    counts = {}
+    for role in ('team_leader', 'data_analyst'):
+        client = app.test_client()
+        # Log in directly rather than through the form, so passwords and CSRF don't matter
+        with app.test_request_context():
+            user = User.query.filter_by(role=role).first()
+            user_id = user.id
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        for endpoint_role, method, url, _ in ENDPOINTS:
+            if endpoint_role == role:
+                response = client.open(url, method=method)
+                counts[(role, url)] = (response.status_code, int(response.headers.get('X-Query-Count', -1)))
+    return counts
+
+def count_dispute_export(app, db):
+    """Queries run by export_dispute_data, which streams outside a request"""
+    from sqlalchemy import event
+    from app.utils.export_helpers import export_dispute_data
+
+    counter = [0]
+    def count(*args):
+        counter[0] += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            path, _, _ = export_dispute_data(export_format='csv')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+    os.remove(path)
+    return counter[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50, help='payment records in the first round')
+    parser.add_argument('--scale', type=int, default=10, help='how many times larger the second round is')
+    parser.add_argument('--db', default='/tmp/check_queries.db', help='scratch database path')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+
+    # config.Config reads DATABASE_URL when it is imported
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(args.db)
+    from app import create_app, db
+    app = create_app()
+    app.config['QUERY_STATS_HEADERS'] = True
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        seed(db, args.rows)
+    small = count_requests(app)
+    small_export = count_dispute_export(app, db)
+
+    with app.app_context():
+        seed(db, args.rows * (args.scale - 1))
+    large = count_requests(app)
+    large_export = count_dispute_export(app, db)
+
+    failures = 0
+    print(f"{'endpoint':<62}{args.rows:>8}{args.rows * args.scale:>8}{'budget':>8}")
+    rows = [(f'{method} {url}', small[(role, url)], large[(role, url)], budget)
+            for role, method, url, budget in ENDPOINTS]
+    rows.append(('export_dispute_data()', (200, small_export), (200, large_export), 2))
+    for label, (status, before), (_, after), budget in rows:
+        problems = []
+        if status >= 400:
+            problems.append(f'HTTP {status}')
+        if after > before:
+            problems.append('grows with the data')
+        if max(before, after) > budget:
+            problems.append('over budget')
+        failures += bool(problems)
+        print(f"{label:<62}{before:>8}{after:>8}{budget:>8}  {', '.join(problems) or 'ok'}")
+
+    print(f"\n{failures} of {len(rows)} failed" if failures else f"\nAll {len(rows)} within budget")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+import argparse
+import os
+import sys
+from app import create_app
+from app.utils.export_helpers import EXPORT_FORMATS
+from app.utils.export_jobs import submit_export_job
+from app.utils.file_serving import project_root
+
+parser = argparse.ArgumentParser(description='Export what changed since the last export of a feed, e.g. from a daily cron job')
+parser.add_argument('feed', help='feed name; each feed keeps its own watermark')
+parser.add_argument('--type', choices=['campaign', 'dispute'], default='campaign',
+                    help='new payment records (campaign) or newly approved disputes (dispute)')
+parser.add_argument('--campaign', help='only this campaign (campaign exports)')
+parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv', help='file format (default: csv)')
+parser.add_argument('--no-headers', action='store_true', help='leave out the header row')
+args = parser.parse_args()
+
+app = create_app()
+
+with app.app_context():
+    job = submit_export_job(args.type, args.campaign, None, None, not args.no_headers, 'feed:' + args.feed,
+                            args.format, feed=args.feed, background=False)
+
+    if job.status in ('queued', 'running'):
+        sys.exit(f"Export #{job.id} of feed {args.feed} is still {job.status}; try again once it finishes.")
+    if job.status == 'failed':
+        sys.exit(f"Export #{job.id} failed: {job.error_message}")
+
+    since = job.delta_since.strftime('%Y-%m-%d %H:%M:%S') if job.delta_since else 'the start'
+    print(f"Exported {job.record_count} records changed from {since} to "
+          f"{job.delta_until.strftime('%Y-%m-%d %H:%M:%S')} UTC")
+    print(os.path.join(project_root(), 'exports', job.filename))
@@ -0,0 +1,27 @@
+import argparse
+import time
+from app import create_app, db
+from app.utils.duplicates import RULES, scan_duplicates
+
+parser = argparse.ArgumentParser(description='Flag likely duplicate payment records for Team Leader review')
+parser.add_argument('--window-days', type=int,
+                    help='max days between the date paid of two duplicates (overrides DUPLICATE_WINDOW_DAYS)')
+parser.add_argument('--full', action='store_true',
+                    help='compare every record again instead of only those added since the last scan')
+args = parser.parse_args()
+
+app = create_app()
+
+with app.app_context():
+    window_days = args.window_days if args.window_days is not None else app.config['DUPLICATE_WINDOW_DAYS']
+    print(f"Scanning for duplicate payments ({'full' if args.full else 'new records only'}, "
+          f"{window_days} day window)...")
+    started = time.perf_counter()
+
+    result = scan_duplicates(db.engine, window_days=window_days, full=args.full)
+
+    print(f"Scanned {result.records_scanned} records and {result.proofs_scanned} proofs "
+          f"in {time.perf_counter() - started:.1f}s")
+    for rule, label in RULES.items():
+        print(f"  {label}: {result.found[rule]} new candidates")
+    print(f"{result.total} candidates are waiting on the Dispute Validation page.")
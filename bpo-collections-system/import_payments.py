@@ -0,0 +1,28 @@
+import argparse
+import time
+from app import create_app
+from app.utils.import_helpers import import_payments, IMPORT_BATCH_SIZE
+
+parser = argparse.ArgumentParser(description='Bulk import payment records from a CSV or Excel (xlsx) file')
+parser.add_argument('path', help='CSV or xlsx file to import')
+parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='rows inserted per transaction')
+args = parser.parse_args()
+
+app = create_app()
+
+with app.app_context():
+    print(f"Importing payments from {args.path}...")
+    started = time.perf_counter()
+    
+    with open(args.path, 'rb') as stream:
+        result = import_payments(stream, args.path, batch_size=args.batch_size)
+    
+    elapsed = time.perf_counter() - started
+    print(f"Imported {result.inserted} records in {elapsed:.1f}s ({result.inserted / max(elapsed, 0.001):.0f} rows/s)")
+    
+    if result.rejected:
+        print(f"Rejected {result.rejected} rows:")
+        for row_number, message in result.errors:
+            print(f"  Row {row_number}: {message}")
+        if result.rejected > len(result.errors):
+            print(f"  ... and {result.rejected - len(result.errors)} more")
@@ -0,0 +1,27 @@
+import argparse
+import os
+import re
+from app import create_app
+from app.utils.roster import import_roster, roster_index
+
+parser = argparse.ArgumentParser(description='Load a monthly FTE roster (e.g. ../AUGUST_FTE.csv) into the operator table')
+parser.add_argument('path', help='CSV or xlsx roster with OPERATOR, STATUS, GROUP, ... columns')
+parser.add_argument('--month', help='roster month as YYYY-MM (default: the current month)')
+args = parser.parse_args()
+
+if args.month and not re.match(r'^\d{4}-\d{2}$', args.month):
+    parser.error('--month must look like 2025-08')
+
+app = create_app()
+
+with app.app_context():
+    print(f"Importing roster from {args.path}...")
+    with open(args.path, 'rb') as stream:
+        result = import_roster(stream, os.path.basename(args.path), month=args.month)
+
+    print(f"Added {result.added}, updated {result.updated}, marked {result.deactivated} as no longer listed.")
+    print(f"{len(roster_index().active_codes())} active operators on the roster.")
+    if result.errors:
+        print(f"Skipped {len(result.errors)} rows:")
+        for row_number, message in result.errors:
+            print(f"  Row {row_number}: {message}")
@@ -1,6 +1,7 @@
 from app import create_app, db
 from app.models import User
 from werkzeug.security import generate_password_hash
+import migrations
 
 print("Creating database...")
 app = create_app()
@@ -10,6 +11,9 @@ with app.app_context():
     db.create_all()
     print("Database tables created at:", app.config['SQLALCHEMY_DATABASE_URI'])
     
+    # Record the schema version; migrations skip what create_all already made
+    migrations.upgrade(db.engine)
+    
     # Create test users
     if not User.query.first():
         # Create a team leader user
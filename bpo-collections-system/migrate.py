@@ -0,0 +1,41 @@
+import argparse
+import os
+from app import create_app, db
+from app.utils.backups import backup_from_config
+import migrations
+
+parser = argparse.ArgumentParser(description='Apply versioned database migrations (see migrations/)')
+parser.add_argument('--list', action='store_true', help='show applied and pending migrations and exit')
+parser.add_argument('--stamp', action='store_true',
+                    help='mark every migration as applied without running it (fresh db.create_all() databases)')
+args = parser.parse_args()
+
+app = create_app()
+
+with app.app_context():
+    engine = db.engine
+    print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+
+    if args.list:
+        with engine.begin() as connection:
+            done = migrations.applied_versions(connection)
+        for version, name in migrations.discover():
+            state = 'applied' if version in done else 'pending'
+            print(f"  {version} [{state}] {name.rsplit('.', 1)[-1]}")
+    elif args.stamp:
+        migrations.stamp(engine)
+        print("All migrations marked as applied.")
+    else:
+        to_apply = migrations.pending(engine)
+        if to_apply and engine.dialect.name == 'sqlite' and os.path.exists(engine.url.database):
+            # Online backup: consistent even if the app is writing, and verified
+            backup_path = backup_from_config(engine.url.database, app.config, label='migrate')
+            print(f"Created backup at {backup_path}")
+
+        try:
+            migrations.upgrade(engine)
+            print("Migration completed successfully!")
+        except Exception as e:
+            print(f"Error during migration: {str(e)}")
+            print("Migration failed. The failing version was rolled back; earlier versions stay applied.")
+            raise SystemExit(1)
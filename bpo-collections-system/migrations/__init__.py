@@ -0,0 +1,110 @@
+"""
+Versioned, database-neutral schema migrations.
+
+Each module in migrations/versions is named vNNNN_description.py and defines
+an upgrade(connection) function written against SQLAlchemy Core, so the same
+migration runs on SQLite and PostgreSQL. Applied versions are recorded in the
+schema_version table. Migrations check for what they add, so databases built
+by the old migrate_*.py scripts or by db.create_all() upgrade cleanly.
+
+Run them with: python migrate.py
+"""
+import importlib
+import os
+import re
+from datetime import datetime
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+
+VERSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'versions')
+VERSION_PATTERN = re.compile(r'^v(\d{4})_(\w+)\.py$')
+
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', String(10), primary_key=True),
+    Column('description', String(200)),
+    Column('applied_at', DateTime),
+)
+
+def discover():
+    """Return [(version, module name)] for every migration, in order"""
+    found = []
+    for filename in sorted(os.listdir(VERSIONS_DIR)):
+        match = VERSION_PATTERN.match(filename)
+        if match:
+            found.append((match.group(1), f"migrations.versions.{filename[:-3]}"))
+    return found
+
+def load(module_name):
+    return importlib.import_module(module_name)
+
+def applied_versions(connection):
+    """Versions already recorded in schema_version"""
+    schema_version.create(connection, checkfirst=True)
+    return {row[0] for row in connection.execute(select(schema_version.c.version))}
+
+def _record(connection, version, module):
+    connection.execute(schema_version.insert().values(
+        version=version,
+        description=(module.__doc__ or '').strip().splitlines()[0] if module.__doc__ else '',
+        applied_at=datetime.utcnow()
+    ))
+
+def pending(engine):
+    """Migrations not yet applied, as [(version, module)]"""
+    with engine.begin() as connection:
+        done = applied_versions(connection)
+    return [(version, load(name)) for version, name in discover() if version not in done]
+
+def upgrade(engine, log=print):
+    """Apply every pending migration, each in its own transaction"""
+    to_apply = pending(engine)
+    if not to_apply:
+        log("Database is up to date.")
+        return []
+
+    for version, module in to_apply:
+        log(f"Applying {version}: {(module.__doc__ or '').strip().splitlines()[0]}")
+        with engine.begin() as connection:
+            module.upgrade(connection)
+            _record(connection, version, module)
+    return [version for version, _ in to_apply]
+
+def stamp(engine):
+    """Mark every migration as applied (for databases made with db.create_all())"""
+    with engine.begin() as connection:
+        done = applied_versions(connection)
+        for version, name in discover():
+            if version not in done:
+                _record(connection, version, load(name))
+
+# Helpers for migrations -----------------------------------------------------
+
+def has_table(connection, table):
+    return inspect(connection).has_table(table)
+
+def column_names(connection, table):
+    return {column['name'] for column in inspect(connection).get_columns(table)}
+
+def add_column(connection, table, name, ddl):
+    """ALTER TABLE ... ADD COLUMN unless the column exists. Returns True if added."""
+    if name in column_names(connection, table):
+        return False
+    preparer = connection.dialect.identifier_preparer
+    connection.execute(text(f"ALTER TABLE {preparer.quote(table)} ADD COLUMN {preparer.quote(name)} {ddl}"))
+    return True
+
+def drop_column(connection, table, name):
+    """Drop a column if it exists (SQLite 3.35+ and PostgreSQL)"""
+    if name not in column_names(connection, table):
+        return False
+    preparer = connection.dialect.identifier_preparer
+    connection.execute(text(f"ALTER TABLE {preparer.quote(table)} DROP COLUMN {preparer.quote(name)}"))
+    return True
+
+def create_index(connection, name, table, columns):
+    """CREATE INDEX IF NOT EXISTS, supported by both SQLite and PostgreSQL"""
+    preparer = connection.dialect.identifier_preparer
+    column_list = ', '.join(preparer.quote(column) for column in columns)
+    connection.execute(text(
+        f"CREATE INDEX IF NOT EXISTS {preparer.quote(name)} ON {preparer.quote(table)} ({column_list})"
+    ))
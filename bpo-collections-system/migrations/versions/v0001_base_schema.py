@@ -0,0 +1,82 @@
+"""Base schema: users, payment records, proofs, disputes and export history
+
+Replaces migrate_db.py and migrate_multiple_proofs.py. Tables are created as
+they were before any later migration; very old databases that still keep a
+single proof_image_path on payment_record have it moved to payment_proof.
+"""
+from sqlalchemy import (Column, Date, DateTime, Float, ForeignKey, Integer, MetaData, String, Table,
+                        Text, select, text)
+from migrations import column_names, drop_column, has_table
+
+metadata = MetaData()
+
+Table(
+    'user', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('username', String(100), unique=True, nullable=False),
+    Column('password', String(200), nullable=False),
+    Column('role', String(20), nullable=False),
+)
+
+payment_record = Table(
+    'payment_record', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('campaign', String(50), nullable=False),
+    Column('dpd', Integer, nullable=False),
+    Column('loan_id', String(100), nullable=False),
+    Column('amount', Float, nullable=False),
+    Column('date_paid', Date, nullable=False),
+    Column('operator_name', String(100), nullable=False),
+    Column('customer_name', String(100), nullable=False),
+    Column('created_at', DateTime),
+)
+
+payment_proof = Table(
+    'payment_proof', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('payment_id', Integer, ForeignKey('payment_record.id', ondelete='CASCADE'), nullable=False),
+    Column('file_path', String(255), nullable=False),
+    Column('file_type', String(50), nullable=False),
+    Column('uploaded_at', DateTime),
+)
+
+Table(
+    'dispute', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('entry_id', Integer, ForeignKey('payment_record.id'), nullable=False),
+    Column('reason', String(50), nullable=False),
+    Column('corrected_details', Text, nullable=False),
+    Column('status', String(20)),
+    Column('created_by', String(100), nullable=False),
+    Column('created_at', DateTime),
+    Column('validated_by', String(100)),
+    Column('validated_at', DateTime),
+    Column('validation_comments', Text),
+)
+
+Table(
+    'export_history', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('export_type', String(20), nullable=False),
+    Column('campaign', String(50)),
+    Column('start_date', Date),
+    Column('end_date', Date),
+    Column('record_count', Integer, nullable=False),
+    Column('filename', String(200), nullable=False),
+    Column('created_by', String(100), nullable=False),
+    Column('created_at', DateTime),
+)
+
+def upgrade(connection):
+    had_proofs = has_table(connection, 'payment_proof')
+    metadata.create_all(connection, checkfirst=True)
+
+    # Single-proof databases: move proof_image_path into payment_proof
+    if 'proof_image_path' in column_names(connection, 'payment_record'):
+        if not had_proofs or not connection.execute(select(payment_proof.c.id).limit(1)).first():
+            connection.execute(text(
+                "INSERT INTO payment_proof (payment_id, file_path, file_type, uploaded_at) "
+                "SELECT id, proof_image_path, 'receipt', created_at FROM payment_record "
+                "WHERE proof_image_path IS NOT NULL AND proof_image_path != ''"
+            ))
+        drop_column(connection, 'payment_record', 'proof_image_path')
@@ -0,0 +1,10 @@
+"""Add Data Analyst verification fields to disputes
+
+Replaces migrate_disputes.py.
+"""
+from migrations import add_column
+
+def upgrade(connection):
+    add_column(connection, 'dispute', 'da_verified_by', 'VARCHAR(100)')
+    add_column(connection, 'dispute', 'da_verified_at', 'TIMESTAMP')
+    add_column(connection, 'dispute', 'da_comments', 'TEXT')
@@ -0,0 +1,13 @@
+"""Add background job tracking fields to export history
+
+Replaces migrate_export_jobs.py. Existing exports were produced synchronously,
+so they default to completed.
+"""
+from migrations import add_column
+
+def upgrade(connection):
+    add_column(connection, 'export_history', 'status', "VARCHAR(20) DEFAULT 'completed'")
+    add_column(connection, 'export_history', 'progress', 'INTEGER DEFAULT 100')
+    add_column(connection, 'export_history', 'total_rows', 'INTEGER')
+    add_column(connection, 'export_history', 'error_message', 'TEXT')
+    add_column(connection, 'export_history', 'completed_at', 'TIMESTAMP')
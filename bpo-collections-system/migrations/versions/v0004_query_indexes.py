@@ -0,0 +1,26 @@
+"""Add indexes for listing, export and dispute queue queries
+
+Replaces migrate_indexes.py.
+"""
+from sqlalchemy import text
+from migrations import create_index
+
+# Indexes declared on the models in app/models.py
+INDEXES = [
+    ('ix_payment_record_created_at', 'payment_record', ('created_at',)),
+    ('ix_payment_record_date_paid', 'payment_record', ('date_paid',)),
+    ('ix_payment_record_loan_id', 'payment_record', ('loan_id',)),
+    ('ix_payment_record_campaign_created_at', 'payment_record', ('campaign', 'created_at')),
+    ('ix_payment_record_campaign_date_paid', 'payment_record', ('campaign', 'date_paid')),
+    ('ix_payment_proof_payment_id', 'payment_proof', ('payment_id',)),
+    ('ix_dispute_entry_id', 'dispute', ('entry_id',)),
+    ('ix_dispute_status_created_at', 'dispute', ('status', 'created_at')),
+    ('ix_dispute_status_validated_at', 'dispute', ('status', 'validated_at')),
+]
+
+def upgrade(connection):
+    for name, table, columns in INDEXES:
+        create_index(connection, name, table, columns)
+
+    # Let the query planner know about the new indexes
+    connection.execute(text("ANALYZE"))
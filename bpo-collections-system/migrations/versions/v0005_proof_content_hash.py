@@ -0,0 +1,66 @@
+"""Store payment proofs content-addressed and deduplicated
+
+Replaces migrate_proof_store.py. Adds payment_proof.content_hash and relinks
+every existing proof file to uploads/payment_proofs/<ab>/<cd>/<sha256><ext>.
+Files are copied during the migration; the old flat files are removed only
+once the transaction has committed.
+"""
+import hashlib
+import os
+import shutil
+from sqlalchemy import event, text
+from migrations import add_column, create_index
+
+CHUNK_SIZE = 64 * 1024
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def hash_file(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def upgrade(connection):
+    add_column(connection, 'payment_proof', 'content_hash', 'VARCHAR(64)')
+    create_index(connection, 'ix_payment_proof_content_hash', 'payment_proof', ('content_hash',))
+
+    proofs = connection.execute(text(
+        "SELECT id, file_path FROM payment_proof WHERE content_hash IS NULL"
+    )).fetchall()
+
+    replaced_files = set()
+    for proof_id, file_path in proofs:
+        source = os.path.join(PROJECT_ROOT, file_path or '')
+        if not file_path or not os.path.isfile(source):
+            print(f"  Proof {proof_id}: file {file_path} not found, skipping")
+            continue
+
+        content_hash = hash_file(source)
+        extension = os.path.splitext(file_path)[1].lower()
+        new_path = '/'.join(['uploads', 'payment_proofs', content_hash[:2], content_hash[2:4],
+                             f"{content_hash}{extension}"])
+        target = os.path.join(PROJECT_ROOT, new_path)
+
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Copy rather than move so a rollback leaves the old layout intact
+            shutil.copy2(source, target)
+
+        connection.execute(
+            text("UPDATE payment_proof SET file_path = :path, content_hash = :hash WHERE id = :id"),
+            {'path': new_path, 'hash': content_hash, 'id': proof_id}
+        )
+        if os.path.normpath(source) != os.path.normpath(target):
+            replaced_files.add(source)
+
+    def remove_replaced_files(conn):
+        for path in replaced_files:
+            if os.path.exists(path):
+                os.remove(path)
+
+    if replaced_files:
+        print(f"  Rehomed {len(replaced_files)} proof files")
+        event.listen(connection, 'commit', remove_replaced_files, once=True)
@@ -0,0 +1,115 @@
+"""Add the dashboard counter table, and on SQLite the search index and counter triggers
+
+Replaces the first run of rebuild_search_index.py and rebuild_stats.py. Other
+databases search with ILIKE and count directly, so they only get the table.
+
+The SQL is a frozen copy of what app/utils/search.py and app/utils/stats.py
+installed when this migration was written; later changes there need their own
+migration.
+"""
+from sqlalchemy import Column, Integer, MetaData, String, Table, text
+
+metadata = MetaData()
+
+Table(
+    'stats_counter', metadata,
+    Column('name', String(50), primary_key=True),
+    Column('value', Integer, nullable=False, default=0),
+)
+
+SEARCH_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS payment_record_fts USING fts5(
+        loan_id, customer_name, operator_name,
+        content='payment_record', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS payment_record_fts_ai AFTER INSERT ON payment_record BEGIN
+        INSERT INTO payment_record_fts (rowid, loan_id, customer_name, operator_name)
+        VALUES (new.id, new.loan_id, new.customer_name, new.operator_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS payment_record_fts_ad AFTER DELETE ON payment_record BEGIN
+        INSERT INTO payment_record_fts (payment_record_fts, rowid, loan_id, customer_name, operator_name)
+        VALUES ('delete', old.id, old.loan_id, old.customer_name, old.operator_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS payment_record_fts_au AFTER UPDATE OF loan_id, customer_name, operator_name
+    ON payment_record BEGIN
+        INSERT INTO payment_record_fts (payment_record_fts, rowid, loan_id, customer_name, operator_name)
+        VALUES ('delete', old.id, old.loan_id, old.customer_name, old.operator_name);
+        INSERT INTO payment_record_fts (rowid, loan_id, customer_name, operator_name)
+        VALUES (new.id, new.loan_id, new.customer_name, new.operator_name);
+    END
+    """,
+    "INSERT INTO payment_record_fts (payment_record_fts) VALUES ('rebuild')",
+]
+
+STATS_STATEMENTS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_payment_record_ai AFTER INSERT ON payment_record BEGIN
+        UPDATE stats_counter SET value = value + 1 WHERE name = 'total_records';
+        INSERT OR IGNORE INTO stats_counter (name, value) VALUES ('records_on:' || date(new.created_at), 0);
+        UPDATE stats_counter SET value = value + 1 WHERE name = 'records_on:' || date(new.created_at);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_payment_record_ad AFTER DELETE ON payment_record BEGIN
+        UPDATE stats_counter SET value = value - 1 WHERE name = 'total_records';
+        UPDATE stats_counter SET value = value - 1 WHERE name = 'records_on:' || date(old.created_at);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_payment_proof_ai AFTER INSERT ON payment_proof BEGIN
+        UPDATE stats_counter SET value = value + 1 WHERE name = 'records_with_proofs'
+            AND (SELECT count(*) FROM payment_proof WHERE payment_id = new.payment_id) = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_payment_proof_ad AFTER DELETE ON payment_proof BEGIN
+        UPDATE stats_counter SET value = value - 1 WHERE name = 'records_with_proofs'
+            AND NOT EXISTS (SELECT 1 FROM payment_proof WHERE payment_id = old.payment_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_dispute_ai AFTER INSERT ON dispute WHEN new.status = 'pending' BEGIN
+        UPDATE stats_counter SET value = value + 1 WHERE name = 'pending_disputes';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_dispute_au AFTER UPDATE OF status ON dispute
+    WHEN (old.status = 'pending') <> (new.status = 'pending') BEGIN
+        UPDATE stats_counter SET value = value + (CASE WHEN new.status = 'pending' THEN 1 ELSE -1 END)
+            WHERE name = 'pending_disputes';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_dispute_ad AFTER DELETE ON dispute WHEN old.status = 'pending' BEGIN
+        UPDATE stats_counter SET value = value - 1 WHERE name = 'pending_disputes';
+    END
+    """,
+    "DELETE FROM stats_counter",
+    """
+    INSERT INTO stats_counter (name, value)
+    SELECT 'total_records', count(*) FROM payment_record
+    UNION ALL
+    SELECT 'records_with_proofs', count(DISTINCT payment_id) FROM payment_proof
+    UNION ALL
+    SELECT 'pending_disputes', count(*) FROM dispute WHERE status = 'pending'
+    """,
+    """
+    INSERT INTO stats_counter (name, value)
+    SELECT 'records_on:' || date(created_at), count(*) FROM payment_record
+    WHERE created_at IS NOT NULL GROUP BY date(created_at)
+    """,
+]
+
+def upgrade(connection):
+    metadata.create_all(connection, checkfirst=True)
+
+    if connection.dialect.name == 'sqlite':
+        for statement in SEARCH_STATEMENTS + STATS_STATEMENTS:
+            connection.execute(text(statement))
@@ -0,0 +1,94 @@
+"""Add the daily collection rollup for the Data Analyst summary
+
+On SQLite the table is filled and kept current by triggers. Other databases
+aggregate payment_record directly, so they only get the table.
+
+The triggers are a frozen copy of the ones app/utils/rollups.py installed when
+this migration was written. v0011 replaces them to leave out duplicates.
+"""
+from sqlalchemy import Column, Date, Float, Integer, MetaData, String, Table, text
+
+metadata = MetaData()
+
+Table(
+    'payment_rollup', metadata,
+    Column('date_paid', Date, primary_key=True),
+    Column('campaign', String(50), primary_key=True),
+    Column('operator_name', String(100), primary_key=True),
+    Column('dpd_bucket', String(10), primary_key=True),
+    Column('record_count', Integer, nullable=False, default=0),
+    Column('amount_sum', Float, nullable=False, default=0),
+    Column('amount_min', Float),
+    Column('amount_max', Float),
+    sqlite_with_rowid=False,
+)
+
+def _bucket(column):
+    return (f"CASE WHEN {column} <= 0 THEN '0' WHEN {column} <= 30 THEN '1-30' WHEN {column} <= 60 THEN '31-60' "
+            f"WHEN {column} <= 90 THEN '61-90' WHEN {column} <= 120 THEN '91-120' "
+            f"WHEN {column} <= 180 THEN '121-180' ELSE '180+' END")
+
+def _add_row(prefix):
+    return f"""
+        INSERT OR IGNORE INTO payment_rollup
+            (campaign, operator_name, date_paid, dpd_bucket, record_count, amount_sum, amount_min, amount_max)
+        VALUES ({prefix}.campaign, {prefix}.operator_name, {prefix}.date_paid, {_bucket(prefix + '.dpd')}, 0, 0,
+            {prefix}.amount, {prefix}.amount);
+        UPDATE payment_rollup SET
+            record_count = record_count + 1,
+            amount_sum = amount_sum + {prefix}.amount,
+            amount_min = min(amount_min, {prefix}.amount),
+            amount_max = max(amount_max, {prefix}.amount)
+        WHERE campaign = {prefix}.campaign AND operator_name = {prefix}.operator_name
+            AND date_paid = {prefix}.date_paid AND dpd_bucket = {_bucket(prefix + '.dpd')};
+    """
+
+def _remove_row(prefix):
+    group = (f"campaign = {prefix}.campaign AND operator_name = {prefix}.operator_name "
+             f"AND date_paid = {prefix}.date_paid")
+    members = f"{group} AND {_bucket('dpd')} = {_bucket(prefix + '.dpd')}"
+    return f"""
+        UPDATE payment_rollup SET
+            record_count = record_count - 1,
+            amount_sum = amount_sum - {prefix}.amount,
+            amount_min = (SELECT min(amount) FROM payment_record WHERE {members}),
+            amount_max = (SELECT max(amount) FROM payment_record WHERE {members})
+        WHERE {group} AND dpd_bucket = {_bucket(prefix + '.dpd')};
+        DELETE FROM payment_rollup WHERE {group} AND dpd_bucket = {_bucket(prefix + '.dpd')} AND record_count <= 0;
+    """
+
+ROLLUP_STATEMENTS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS rollup_payment_record_ai AFTER INSERT ON payment_record BEGIN
+        {_add_row('new')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS rollup_payment_record_ad AFTER DELETE ON payment_record BEGIN
+        {_remove_row('old')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS rollup_payment_record_au
+    AFTER UPDATE OF campaign, operator_name, date_paid, dpd, amount ON payment_record BEGIN
+        {_remove_row('old')}
+        {_add_row('new')}
+    END
+    """,
+    "DELETE FROM payment_rollup",
+    f"""
+    INSERT INTO payment_rollup
+        (campaign, operator_name, date_paid, dpd_bucket, record_count, amount_sum, amount_min, amount_max)
+    SELECT campaign, operator_name, date_paid, {_bucket('dpd')},
+        count(*), sum(amount), min(amount), max(amount)
+    FROM payment_record
+    GROUP BY campaign, operator_name, date_paid, {_bucket('dpd')}
+    """,
+]
+
+def upgrade(connection):
+    metadata.create_all(connection, checkfirst=True)
+
+    if connection.dialect.name == 'sqlite':
+        for statement in ROLLUP_STATEMENTS:
+            connection.execute(text(statement))
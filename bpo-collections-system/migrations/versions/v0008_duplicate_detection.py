@@ -0,0 +1,41 @@
+"""Add the duplicate payment candidates and scan history tables
+
+Candidates are found by find_duplicates.py (or the scan button on the TL
+dispute page); the newest scan row is where the next scan picks up.
+"""
+from sqlalchemy import (Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table,
+                        UniqueConstraint)
+
+metadata = MetaData()
+
+# Referenced by the foreign keys only, never created here
+Table('payment_record', metadata, Column('id', Integer, primary_key=True))
+
+duplicate_candidate = Table(
+    'duplicate_candidate', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('entry_id', Integer, ForeignKey('payment_record.id', ondelete='CASCADE'), nullable=False),
+    Column('duplicate_of_id', Integer, ForeignKey('payment_record.id', ondelete='CASCADE'), nullable=False,
+           index=True),
+    Column('rule', String(20), nullable=False),
+    Column('status', String(20), nullable=False, default='open'),
+    Column('detected_at', DateTime),
+    Column('resolved_by', String(100)),
+    Column('resolved_at', DateTime),
+    UniqueConstraint('entry_id', 'duplicate_of_id', name='uq_duplicate_candidate_pair'),
+    Index('ix_duplicate_candidate_status_detected_at', 'status', 'detected_at'),
+)
+
+duplicate_scan = Table(
+    'duplicate_scan', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('started_at', DateTime),
+    Column('finished_at', DateTime),
+    Column('last_record_id', Integer, nullable=False, default=0),
+    Column('last_proof_id', Integer, nullable=False, default=0),
+    Column('records_scanned', Integer, nullable=False, default=0),
+    Column('candidates_found', Integer, nullable=False, default=0),
+)
+
+def upgrade(connection):
+    metadata.create_all(connection, tables=[duplicate_candidate, duplicate_scan], checkfirst=True)
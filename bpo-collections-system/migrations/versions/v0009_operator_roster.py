@@ -0,0 +1,26 @@
+"""Add the operator roster table
+
+Filled from the monthly FTE file with import_roster.py. Until a roster is
+imported, operator names are accepted as entered.
+"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+Table(
+    'operator', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('operator', String(100), nullable=False, unique=True),
+    Column('employee_id', String(50)),
+    Column('name', String(200)),
+    Column('full_name', String(200)),
+    Column('crm_name', String(200)),
+    Column('supervisor_group', String(50)),
+    Column('status', String(20), nullable=False, default='ACTIVE'),
+    Column('roster_month', String(7)),
+    Column('updated_at', DateTime),
+    Index('ix_operator_supervisor_group', 'supervisor_group'),
+)
+
+def upgrade(connection):
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,20 @@
+"""Add indexes for the sortable dispute queue columns
+
+Each sort on the TL and DA queues reads one status through a (status, column)
+index, so pages stay cheap however large the backlog grows.
+"""
+from sqlalchemy import text
+from migrations import create_index
+
+# Indexes declared on Dispute in app/models.py
+INDEXES = [
+    ('ix_dispute_status_reason', 'dispute', ('status', 'reason')),
+    ('ix_dispute_status_created_by', 'dispute', ('status', 'created_by')),
+    ('ix_dispute_status_validated_by', 'dispute', ('status', 'validated_by')),
+]
+
+def upgrade(connection):
+    for name, table, columns in INDEXES:
+        create_index(connection, name, table, columns)
+
+    connection.execute(text("ANALYZE dispute"))
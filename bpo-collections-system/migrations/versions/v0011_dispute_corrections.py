@@ -0,0 +1,113 @@
+"""Add structured dispute corrections and payment record history
+
+Approved disputes now write their corrections to payment_record, keeping the
+replaced values in payment_record_version. Records marked as duplicates are
+left out of the rollup, so on SQLite its triggers are replaced and it is
+recomputed. The triggers are a frozen copy of the ones app/utils/rollups.py
+installed when this migration was written.
+"""
+from sqlalchemy import (Boolean, Column, Date, DateTime, Float, ForeignKey, Integer, MetaData, String, Table,
+                        UniqueConstraint, text)
+from migrations import add_column
+
+metadata = MetaData()
+
+# Referenced tables, as far as the foreign keys need them
+Table('payment_record', metadata, Column('id', Integer, primary_key=True))
+Table('dispute', metadata, Column('id', Integer, primary_key=True))
+
+Table(
+    'payment_record_version', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('payment_id', Integer, ForeignKey('payment_record.id', ondelete='CASCADE'), nullable=False),
+    Column('version', Integer, nullable=False),
+    Column('dispute_id', Integer, ForeignKey('dispute.id'), nullable=False, index=True),
+    Column('operator_name', String(100), nullable=False),
+    Column('amount', Float, nullable=False),
+    Column('date_paid', Date, nullable=False),
+    Column('is_duplicate', Boolean, nullable=False, default=False),
+    Column('replaced_by', String(100), nullable=False),
+    Column('replaced_at', DateTime),
+    UniqueConstraint('payment_id', 'version', name='uq_payment_record_version'),
+)
+
+def _bucket(column):
+    return (f"CASE WHEN {column} <= 0 THEN '0' WHEN {column} <= 30 THEN '1-30' WHEN {column} <= 60 THEN '31-60' "
+            f"WHEN {column} <= 90 THEN '61-90' WHEN {column} <= 120 THEN '91-120' "
+            f"WHEN {column} <= 180 THEN '121-180' ELSE '180+' END")
+
+def _add_row(prefix):
+    return f"""
+        INSERT OR IGNORE INTO payment_rollup
+            (campaign, operator_name, date_paid, dpd_bucket, record_count, amount_sum, amount_min, amount_max)
+        SELECT {prefix}.campaign, {prefix}.operator_name, {prefix}.date_paid, {_bucket(prefix + '.dpd')}, 0, 0,
+            {prefix}.amount, {prefix}.amount
+        WHERE NOT {prefix}.is_duplicate;
+        UPDATE payment_rollup SET
+            record_count = record_count + 1,
+            amount_sum = amount_sum + {prefix}.amount,
+            amount_min = min(amount_min, {prefix}.amount),
+            amount_max = max(amount_max, {prefix}.amount)
+        WHERE campaign = {prefix}.campaign AND operator_name = {prefix}.operator_name
+            AND date_paid = {prefix}.date_paid AND dpd_bucket = {_bucket(prefix + '.dpd')} AND NOT {prefix}.is_duplicate;
+    """
+
+def _remove_row(prefix):
+    group = (f"campaign = {prefix}.campaign AND operator_name = {prefix}.operator_name "
+             f"AND date_paid = {prefix}.date_paid")
+    members = f"{group} AND {_bucket('dpd')} = {_bucket(prefix + '.dpd')} AND NOT is_duplicate"
+    return f"""
+        UPDATE payment_rollup SET
+            record_count = record_count - 1,
+            amount_sum = amount_sum - {prefix}.amount,
+            amount_min = (SELECT min(amount) FROM payment_record WHERE {members}),
+            amount_max = (SELECT max(amount) FROM payment_record WHERE {members})
+        WHERE {group} AND dpd_bucket = {_bucket(prefix + '.dpd')} AND NOT {prefix}.is_duplicate;
+        DELETE FROM payment_rollup WHERE {group} AND dpd_bucket = {_bucket(prefix + '.dpd')} AND record_count <= 0;
+    """
+
+ROLLUP_STATEMENTS = [
+    "DROP TRIGGER IF EXISTS rollup_payment_record_ai",
+    "DROP TRIGGER IF EXISTS rollup_payment_record_ad",
+    "DROP TRIGGER IF EXISTS rollup_payment_record_au",
+    f"""
+    CREATE TRIGGER rollup_payment_record_ai AFTER INSERT ON payment_record BEGIN
+        {_add_row('new')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER rollup_payment_record_ad AFTER DELETE ON payment_record BEGIN
+        {_remove_row('old')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER rollup_payment_record_au
+    AFTER UPDATE OF campaign, operator_name, date_paid, dpd, amount, is_duplicate ON payment_record BEGIN
+        {_remove_row('old')}
+        {_add_row('new')}
+    END
+    """,
+    "DELETE FROM payment_rollup",
+    f"""
+    INSERT INTO payment_rollup
+        (campaign, operator_name, date_paid, dpd_bucket, record_count, amount_sum, amount_min, amount_max)
+    SELECT campaign, operator_name, date_paid, {_bucket('dpd')},
+        count(*), sum(amount), min(amount), max(amount)
+    FROM payment_record
+    WHERE NOT is_duplicate
+    GROUP BY campaign, operator_name, date_paid, {_bucket('dpd')}
+    """,
+]
+
+def upgrade(connection):
+    add_column(connection, 'payment_record', 'is_duplicate', 'BOOLEAN NOT NULL DEFAULT FALSE')
+    add_column(connection, 'dispute', 'corrected_operator', 'VARCHAR(100)')
+    add_column(connection, 'dispute', 'corrected_amount', 'FLOAT')
+    add_column(connection, 'dispute', 'corrected_date_paid', 'DATE')
+    add_column(connection, 'dispute', 'mark_duplicate', 'BOOLEAN NOT NULL DEFAULT FALSE')
+    add_column(connection, 'dispute', 'applied_at', 'TIMESTAMP')
+    metadata.tables['payment_record_version'].create(connection, checkfirst=True)
+
+    if connection.dialect.name == 'sqlite':
+        for statement in ROLLUP_STATEMENTS:
+            connection.execute(text(statement))
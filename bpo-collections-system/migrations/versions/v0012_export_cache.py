@@ -0,0 +1,40 @@
+"""Add the export cache key to export_history, and the data_version write counters
+
+On SQLite, triggers on payment_record and dispute keep data_version current.
+Other databases only get the table and columns, and exports there are always
+rebuilt. The triggers are a frozen copy of the ones app/utils/export_cache.py
+installed when this migration was written.
+"""
+from sqlalchemy import Column, Integer, MetaData, String, Table, text
+from migrations import add_column
+
+metadata = MetaData()
+
+Table(
+    'data_version', metadata,
+    Column('name', String(50), primary_key=True),
+    Column('version', Integer, nullable=False, default=0),
+)
+
+DATA_VERSION_STATEMENTS = [
+    "INSERT OR IGNORE INTO data_version (name, version) VALUES ('payment_record', 0)",
+    "INSERT OR IGNORE INTO data_version (name, version) VALUES ('dispute', 0)",
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS data_version_{table}_{suffix} AFTER {operation} ON {table} BEGIN
+        UPDATE data_version SET version = version + 1 WHERE name = '{table}';
+    END
+    """
+    for table in ('payment_record', 'dispute')
+    for suffix, operation in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))
+]
+
+def upgrade(connection):
+    add_column(connection, 'export_history', 'export_format', "VARCHAR(10) DEFAULT 'xlsx'")
+    add_column(connection, 'export_history', 'include_headers', 'BOOLEAN DEFAULT TRUE')
+    add_column(connection, 'export_history', 'data_version', 'VARCHAR(50)')
+    metadata.create_all(connection, checkfirst=True)
+
+    if connection.dialect.name == 'sqlite':
+        for statement in DATA_VERSION_STATEMENTS:
+            connection.execute(text(statement))
@@ -0,0 +1,12 @@
+"""Add the feed and window of incremental exports to export_history
+
+Also indexes disputes by approval time, so a dispute delta reads only the
+disputes approved since the feed's last export.
+"""
+from migrations import add_column, create_index
+
+def upgrade(connection):
+    add_column(connection, 'export_history', 'feed', 'VARCHAR(100)')
+    add_column(connection, 'export_history', 'delta_since', 'TIMESTAMP')
+    add_column(connection, 'export_history', 'delta_until', 'TIMESTAMP')
+    create_index(connection, 'ix_dispute_status_da_verified_at', 'dispute', ('status', 'da_verified_at'))
@@ -0,0 +1,19 @@
+from app import create_app, db
+from app.utils.rollups import rebuild_rollup
+
+print("Rebuilding daily collection rollup...")
+app = create_app()
+
+with app.app_context():
+    if db.engine.dialect.name != 'sqlite':
+        print("Collection summaries are aggregated directly on this database, nothing to do.")
+    else:
+        # Makes sure the table and triggers exist, then recomputes every group
+        db.create_all()
+        with db.engine.begin() as connection:
+            rebuild_rollup(connection)
+        
+        from app.models import PaymentRollup
+        print(f"Rollup holds {PaymentRollup.query.count()} campaign/operator/day/DPD groups.")
+    
+    print("Rollup rebuild complete!")
@@ -0,0 +1,18 @@
+from app import create_app, db
+from app.utils.search import rebuild_search_index
+
+print("Rebuilding payment record search index...")
+app = create_app()
+
+with app.app_context():
+    if db.engine.dialect.name != 'sqlite':
+        print("Full-text search index is only used with SQLite, nothing to do.")
+    else:
+        # Creates the FTS table and triggers on databases made before they existed
+        with db.engine.begin() as connection:
+            rebuild_search_index(connection)
+        
+        from app.models import PaymentRecord
+        print(f"Indexed {PaymentRecord.query.count()} payment records.")
+    
+    print("Search index rebuild complete!")
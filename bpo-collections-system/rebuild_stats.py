@@ -0,0 +1,19 @@
+from app import create_app, db
+from app.utils.stats import recount_stats, get_dashboard_stats
+
+print("Recounting dashboard statistics...")
+app = create_app()
+
+with app.app_context():
+    if db.engine.dialect.name != 'sqlite':
+        print("Dashboard counters are computed directly on this database, nothing to do.")
+    else:
+        # Makes sure the table and triggers exist, then recounts from scratch
+        db.create_all()
+        with db.engine.begin() as connection:
+            recount_stats(connection)
+        
+        for name, value in get_dashboard_stats().items():
+            print(f"{name}: {value}")
+    
+    print("Statistics recount complete!")
@@ -1,14 +1,18 @@
 from app import create_app, db
 from app.models import User
+from app.utils.sqlite_tuning import start_sqlite_maintenance
 from werkzeug.security import generate_password_hash
 import os
 
 app = create_app()
+# Periodic PRAGMA optimize and WAL checkpoints, for the web process only
+start_sqlite_maintenance(app)
 
 # Create a context to work with the app
 with app.app_context():
     # Make sure the instance folder exists
-    os.makedirs(os.path.dirname(app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')), exist_ok=True)
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite:///'):
+        os.makedirs(os.path.dirname(app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')), exist_ok=True)
     
     # Create all tables
     db.create_all()
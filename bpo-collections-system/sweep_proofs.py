@@ -0,0 +1,10 @@
+from app import create_app
+from app.utils.file_helpers import sweep_proof_blobs
+
+print("Sweeping unreferenced proof files...")
+app = create_app()
+
+with app.app_context():
+    # Uploads that were rolled back, and files released within their grace period
+    deleted = sweep_proof_blobs()
+    print(f"Deleted {deleted} files untouched for {app.config['PROOF_BLOB_GRACE_SECONDS']} seconds.")
@@ -0,0 +1,41 @@
+import base64
+
+import pytest
+
+def _get(app, password='secret'):
+    credentials = base64.b64encode(f'api-tl:{password}'.encode()).decode()
+    return app.test_client().get('/api/v1/payments', headers={'Authorization': f'Basic {credentials}'})
+
+@pytest.fixture
+def api_user(app):
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from app.models import User
+
+    with app.app_context():
+        user = User(username='api-tl', password=generate_password_hash('secret'), role='team_leader')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+def test_changed_password_stops_cached_credentials(app, api_user):
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from app.models import User
+
+    assert _get(app).status_code == 200
+    with app.app_context():
+        User.query.get(api_user).password = generate_password_hash('changed')
+        db.session.commit()
+    assert _get(app).status_code == 401
+    assert _get(app, 'changed').status_code == 200
+
+def test_deleted_user_stops_cached_credentials(app, api_user):
+    from app import db
+    from app.models import User
+
+    assert _get(app).status_code == 200
+    with app.app_context():
+        db.session.delete(User.query.get(api_user))
+        db.session.commit()
+    assert _get(app).status_code == 401
@@ -0,0 +1,47 @@
+import sqlite3
+
+import pytest
+
+from app.utils.backups import backup_database, list_backups
+
+@pytest.fixture
+def wal_database(tmp_path):
+    path = str(tmp_path / 'collections.db')
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("CREATE TABLE payment_record (id INTEGER PRIMARY KEY, customer_name TEXT)")
+    connection.executemany("INSERT INTO payment_record (customer_name) VALUES (?)", [('x' * 500,)] * 5000)
+    connection.commit()
+    connection.close()
+    return path
+
+def test_wal_backup_is_stepped_while_the_app_writes(wal_database, tmp_path):
+    writer = sqlite3.connect(wal_database, timeout=5)
+    steps = []
+
+    def progress(copied, total):
+        steps.append(copied)
+        # Another connection commits between every step
+        writer.execute("INSERT INTO payment_record (customer_name) VALUES ('new')")
+        writer.commit()
+
+    try:
+        path = backup_database(wal_database, backup_dir=str(tmp_path / 'backups'), pages_per_step=50,
+                               step_sleep=0, progress=progress)
+    finally:
+        writer.close()
+
+    assert len(steps) > 10
+    assert steps == sorted(steps)  # never restarted
+    copy = sqlite3.connect(path)
+    try:
+        # The snapshot from before the first step, none of the writes made during the copy
+        assert copy.execute("SELECT count(*) FROM payment_record").fetchone()[0] == 5000
+    finally:
+        copy.close()
+
+def test_backups_in_the_same_second_are_all_kept(wal_database, tmp_path):
+    backup_dir = str(tmp_path / 'backups')
+    paths = [backup_database(wal_database, backup_dir=backup_dir, label='migrate') for _ in range(3)]
+    assert len(set(paths)) == 3
+    assert sorted(list_backups(backup_dir, 'migrate')) == sorted(paths)
@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import make_records
+
+@pytest.fixture
+def disputes(app):
+    """Ids of three disputes correcting the amount of records 1-3, all pending"""
+    from app import db
+    from app.models import Dispute
+
+    with app.app_context():
+        db.session.add_all(make_records(3))
+        db.session.flush()
+        disputes = [Dispute(entry_id=i, reason='wrong_amount', corrected_details='Amount', corrected_amount=999.0,
+                            status='pending', created_by='tl') for i in (1, 2, 3)]
+        db.session.add_all(disputes)
+        db.session.commit()
+        return [dispute.id for dispute in disputes]
+
+def test_validate_dispute_goes_through_workflow(app, login, disputes):
+    from app.models import Dispute, PaymentRecord
+
+    client = login('team_leader')
+    response = client.post('/team-leader/validate-dispute', data={'dispute_id': disputes[0], 'action': 'approve'})
+    assert response.status_code == 302
+    with app.app_context():
+        dispute = Dispute.query.get(disputes[0])
+        assert dispute.status == 'pending_da_review'
+        assert dispute.validated_by == 'team_leader'
+        assert dispute.applied_at is None
+        assert PaymentRecord.query.get(dispute.entry_id).amount == 100
+
+    # A second approval isn't a valid transition and changes nothing
+    client.post('/team-leader/validate-dispute', data={'dispute_id': disputes[0], 'action': 'approve'})
+    with app.app_context():
+        assert Dispute.query.get(disputes[0]).status == 'pending_da_review'
+
+def test_bulk_approval_applies_exactly_the_disputes_it_moved(app, disputes, monkeypatch):
+    from app import db
+    from app.models import Dispute, PaymentRecord
+    from app.utils import dispute_workflow
+
+    now = datetime(2025, 9, 1, 12, 0)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return now
+
+    monkeypatch.setattr(dispute_workflow, 'datetime', FrozenDatetime)
+    with app.app_context():
+        Dispute.query.filter(Dispute.id.in_(disputes[:2])).update({'status': 'pending_da_review'})
+        # Approved elsewhere at the same instant, its corrections left for whoever approved it
+        Dispute.query.filter_by(id=disputes[2]).update({'status': 'approved', 'da_verified_at': now})
+        db.session.commit()
+
+        updated = dispute_workflow.bulk_transition('data_analyst', 'approve', disputes, 'da')
+        db.session.commit()
+
+        assert updated == 2
+        applied = {dispute.id: dispute.applied_at for dispute in Dispute.query}
+        assert applied == {disputes[0]: now, disputes[1]: now, disputes[2]: None}
+        amounts = [record.amount for record in PaymentRecord.query.order_by(PaymentRecord.id)]
+        assert amounts == [999.0, 999.0, 102]
+
+def test_bulk_transition_refreshes_dashboard_counts(app, disputes):
+    from app import db
+    from app.utils.dispute_workflow import bulk_transition
+    from app.utils.stats import get_dashboard_stats
+
+    with app.app_context():
+        assert get_dashboard_stats()['pending_disputes'] == 3
+        assert bulk_transition('team_leader', 'reject', disputes, 'tl') == 3
+        db.session.commit()
+        assert get_dashboard_stats()['pending_disputes'] == 0
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import make_records
+
+@pytest.fixture
+def stuck_job(app):
+    """A feed export left 'running' three hours ago by a worker that was stopped"""
+    from app import db
+    from app.models import ExportHistory
+
+    with app.app_context():
+        db.session.add_all(make_records(5))
+        job = ExportHistory(export_type='campaign', feed='recon', record_count=0, filename='', created_by='da',
+                            status='running', progress=0, export_format='csv',
+                            created_at=datetime.utcnow() - timedelta(hours=3))
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+def test_abandoned_export_no_longer_blocks_feed(app, stuck_job):
+    from app.models import ExportHistory
+    from app.utils.export_feeds import feed_window, pending_feed_export
+    from app.utils.export_jobs import submit_export_job
+
+    with app.test_request_context():
+        assert pending_feed_export('campaign', 'recon') is None
+        assert ExportHistory.query.get(stuck_job).status == 'failed'
+        since, until = feed_window('campaign', 'recon')
+        assert since is None
+
+        job = submit_export_job('campaign', None, None, None, True, 'da', 'csv', feed='recon', background=False)
+        assert job.id != stuck_job
+        assert job.status == 'completed'
+        assert job.record_count == 5
+
+def test_recent_export_still_blocks_feed(app, stuck_job):
+    from app import db
+    from app.models import ExportHistory
+    from app.utils.export_jobs import submit_export_job
+
+    with app.test_request_context():
+        ExportHistory.query.get(stuck_job).created_at = datetime.utcnow() - timedelta(minutes=5)
+        db.session.commit()
+
+        job = submit_export_job('campaign', None, None, None, True, 'da', 'csv', feed='recon', background=False)
+        assert job.id == stuck_job
+        assert job.status == 'running'
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from conftest import make_records
+
+def _submit(**options):
+    from app.utils.export_jobs import submit_export_job
+
+    values = dict(export_type='campaign', campaign='TALA', start_date=None, end_date=None, include_headers=True,
+                  created_by='da', export_format='csv', background=False)
+    values.update(options)
+    return submit_export_job(**values)
+
+@pytest.fixture
+def records(app):
+    from app import db
+
+    with app.app_context():
+        db.session.add_all(make_records(14))
+        db.session.commit()
+
+def test_export_job_completes(app, records):
+    with app.test_request_context():
+        job = _submit()
+        assert job.status == 'completed'
+        assert job.record_count == 2
+        assert job.completed_at is not None
+        assert os.path.exists(os.path.join(app.root_path, '..', 'exports', job.filename))
+
+@pytest.mark.parametrize('target', ['data_version', 'export_campaign_data'])
+def test_export_job_failure_is_recorded(app, records, monkeypatch, target):
+    from app.utils import export_helpers, export_jobs
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('disk full')
+
+    # data_version runs before the job is marked running, the export after
+    monkeypatch.setattr(export_jobs if target == 'data_version' else export_helpers, target, fail)
+    with app.test_request_context():
+        job = _submit()
+        assert job.status == 'failed'
+        assert job.error_message == 'disk full'
+        assert job.completed_at is not None
+
+def test_export_job_failed_final_commit_is_recorded(app, records, monkeypatch):
+    from app.utils import export_jobs
+
+    record_outcome = export_jobs._record_outcome
+
+    def fail_on_completion(job_id, **values):
+        if values['status'] == 'completed':
+            raise RuntimeError('database is locked')
+        record_outcome(job_id, **values)
+
+    monkeypatch.setattr(export_jobs, '_record_outcome', fail_on_completion)
+    with app.test_request_context():
+        job = _submit()
+        assert job.status == 'failed'
+        assert job.error_message == 'database is locked'
+
+def test_export_cleanup_failure_keeps_job_completed(app, records, monkeypatch):
+    from app.utils import export_jobs
+
+    def fail():
+        raise OSError('permission denied')
+
+    monkeypatch.setattr(export_jobs, 'clean_export_dir', fail)
+    with app.test_request_context():
+        job = _submit()
+        assert job.status == 'completed'
@@ -0,0 +1,136 @@
+import re
+from datetime import datetime
+
+from sqlalchemy import create_engine, inspect, text
+
+import migrations
+from conftest import _clear_database
+
+def _quiet(message):
+    pass
+
+def _fresh_url(database_url, tmp_path, name):
+    """A second empty database: another file on SQLite, the same (cleared) one on PostgreSQL"""
+    if database_url.startswith('sqlite'):
+        return 'sqlite:///' + str(tmp_path / f'{name}.db')
+    _clear_database(database_url)
+    return database_url
+
+def _schema(engine):
+    """Tables with their columns, index names and (on SQLite) normalised trigger SQL"""
+    inspector = inspect(engine)
+    tables = {
+        table: sorted(column['name'] for column in inspector.get_columns(table))
+        for table in inspector.get_table_names()
+        if table != 'schema_version' and not table.startswith(('payment_record_fts', 'sqlite_'))
+    }
+    indexes = {index['name'] for table in tables for index in inspector.get_indexes(table)}
+    triggers = {}
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as connection:
+            for name, sql in connection.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")):
+                sql = re.sub(r'\s+', ' ', sql).replace(' IF NOT EXISTS', '')
+                triggers[name] = re.sub(r'\s*([(),;])\s*', r'\1', sql)
+    return tables, indexes, triggers
+
+def _create_all(url):
+    """Build a database from the current models, as init_db.py does"""
+    from app import db
+    # The after_create listeners installing the SQLite triggers live in these modules
+    import app.utils.export_cache  # noqa: F401
+    import app.utils.rollups  # noqa: F401
+    import app.utils.search  # noqa: F401
+    import app.utils.stats  # noqa: F401
+
+    engine = create_engine(url)
+    db.Model.metadata.create_all(engine)
+    return engine
+
+def _baseline(url):
+    """A database as it was before any migration, with a little data in it"""
+    baseline = migrations.load('migrations.versions.v0001_base_schema')
+    engine = create_engine(url)
+    baseline.metadata.create_all(engine)
+    now = datetime(2025, 8, 1, 9, 30)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO \"user\" (username, password, role) VALUES ('tl', '', 'team_leader')"))
+        for i in range(3):
+            connection.execute(text(
+                "INSERT INTO payment_record (campaign, dpd, loan_id, amount, date_paid, operator_name, "
+                "customer_name, created_at) VALUES ('TALA', :dpd, :loan_id, :amount, '2025-08-01', 'HOUSE_1', "
+                ":customer, :now)"
+            ), {'dpd': 10 * i, 'loan_id': f'LN{i:07d}', 'amount': 100.0 + i, 'customer': f'Customer {i}',
+                'now': now})
+        # The file is missing, so v0005 leaves the proof where it is
+        connection.execute(text(
+            "INSERT INTO payment_proof (payment_id, file_path, file_type, uploaded_at) "
+            "VALUES (1, 'uploads/missing-test-proof.png', 'receipt', :now)"
+        ), {'now': now})
+        connection.execute(text(
+            "INSERT INTO dispute (entry_id, reason, corrected_details, status, created_by, created_at) "
+            "VALUES (2, 'wrong_amount', 'Amount', 'pending', 'tl', :now)"
+        ), {'now': now})
+    return engine
+
+def test_baseline_upgrades_to_current_schema(database_url, tmp_path):
+    engine = _baseline(database_url)
+    try:
+        applied = migrations.upgrade(engine, log=_quiet)
+        assert applied == [version for version, _ in migrations.discover()]
+        assert migrations.upgrade(engine, log=_quiet) == []
+        migrated = _schema(engine)
+
+        with engine.connect() as connection:
+            assert connection.execute(text("SELECT count(*) FROM payment_record")).scalar() == 3
+            assert connection.execute(text("SELECT count(*) FROM dispute WHERE status = 'pending'")).scalar() == 1
+            if engine.dialect.name == 'sqlite':
+                counters = dict(connection.execute(text("SELECT name, value FROM stats_counter")).fetchall())
+                assert counters['total_records'] == 3
+                assert counters['records_with_proofs'] == 1
+                assert counters['pending_disputes'] == 1
+                assert connection.execute(text("SELECT sum(record_count) FROM payment_rollup")).scalar() == 3
+                found = connection.execute(text(
+                    "SELECT rowid FROM payment_record_fts WHERE payment_record_fts MATCH '\"Customer 2\"'"
+                )).scalars().all()
+                assert found == [3]
+    finally:
+        engine.dispose()
+
+    reference_engine = _create_all(_fresh_url(database_url, tmp_path, 'reference'))
+    try:
+        reference = _schema(reference_engine)
+    finally:
+        reference_engine.dispose()
+
+    migrated_tables, migrated_indexes, migrated_triggers = migrated
+    reference_tables, reference_indexes, reference_triggers = reference
+    assert migrated_tables == reference_tables
+    assert reference_indexes <= migrated_indexes
+    assert migrated_triggers == reference_triggers
+
+def test_migrated_triggers_keep_rollup_current(database_url, tmp_path):
+    engine = _baseline(database_url)
+    try:
+        migrations.upgrade(engine, log=_quiet)
+        if engine.dialect.name != 'sqlite':
+            return
+        with engine.begin() as connection:
+            connection.execute(text("UPDATE payment_record SET is_duplicate = 1 WHERE id = 1"))
+            connection.execute(text("UPDATE payment_record SET amount = 500 WHERE id = 2"))
+        with engine.connect() as connection:
+            count, total = connection.execute(text(
+                "SELECT sum(record_count), sum(amount_sum) FROM payment_rollup"
+            )).first()
+        assert (count, total) == (2, 500.0 + 102.0)
+    finally:
+        engine.dispose()
+
+def test_create_all_database_upgrades_cleanly(database_url):
+    engine = _create_all(database_url)
+    try:
+        before = _schema(engine)
+        migrations.upgrade(engine, log=_quiet)
+        assert migrations.pending(engine) == []
+        assert _schema(engine) == before
+    finally:
+        engine.dispose()
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import make_records
+
+@pytest.fixture
+def disputes(app):
+    """Nine disputes, four of them never validated (validated_at NULL), with one timestamp shared"""
+    from app import db
+    from app.models import Dispute
+
+    with app.app_context():
+        db.session.add_all(make_records(9))
+        db.session.flush()
+        start = datetime(2025, 8, 1)
+        validated = [start, start + timedelta(days=1), start + timedelta(days=1), None, start + timedelta(days=2),
+                     None, None, start + timedelta(days=3), None]
+        for entry_id, validated_at in enumerate(validated, 1):
+            db.session.add(Dispute(entry_id=entry_id, reason='wrong_amount', corrected_details='Amount',
+                                   status='pending', created_by='tl', validated_at=validated_at))
+        db.session.commit()
+
+def _expected(descending):
+    from app.models import Dispute
+
+    disputes = Dispute.query.all()
+    with_value = sorted((d for d in disputes if d.validated_at), key=lambda d: (d.validated_at, d.id),
+                        reverse=descending)
+    without = sorted((d for d in disputes if not d.validated_at), key=lambda d: d.id, reverse=descending)
+    return [d.id for d in (with_value + without if descending else without + with_value)]
+
+def _walk(descending, per_page):
+    """Page forward to the end and back to the start, returning the ids seen each way"""
+    from app.models import Dispute
+    from app.utils.pagination import keyset_paginate
+
+    def page(cursor):
+        return keyset_paginate(Dispute.query, Dispute, cursor=cursor, per_page=per_page, sort='validated_at',
+                               descending=descending)
+
+    # A cursor that restarts at the first page would page forever
+    pages = [page(None)]
+    while pages[-1].has_next and len(pages) < 10:
+        pages.append(page(pages[-1].next_cursor))
+    backwards = [pages[-1]]
+    while backwards[-1].has_prev and len(backwards) < 10:
+        backwards.append(page(backwards[-1].prev_cursor))
+    return pages, backwards
+
+@pytest.mark.parametrize('descending', [True, False])
+@pytest.mark.parametrize('per_page', [2, 3, 4])
+def test_null_sort_values_page_across_boundary(app, disputes, descending, per_page):
+    with app.app_context():
+        expected = _expected(descending)
+        pages, backwards = _walk(descending, per_page)
+
+        forward = [[d.id for d in p.items] for p in pages]
+        assert sum(forward, []) == expected
+        assert all(len(ids) == per_page for ids in forward[:-1])
+        assert [[d.id for d in p.items] for p in reversed(backwards)] == forward
+
+def _deep_page_plans(app, query, model, **options):
+    """EXPLAIN QUERY PLAN details of the statements fetching the second page"""
+    from sqlalchemy import event
+    from app import db
+    from app.utils.pagination import keyset_paginate
+
+    first = keyset_paginate(query, model, per_page=5, **options)
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        keyset_paginate(query, model, cursor=first.next_cursor, per_page=5, **options)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    with db.engine.connect() as connection:
+        return [' '.join(row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters))
+                for statement, parameters in statements]
+
+@pytest.mark.parametrize('campaign', [None, 'TALA'])
+def test_deep_pages_search_the_index(app, campaign):
+    from app import db
+    from app.models import PaymentRecord
+
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            pytest.skip('checks the SQLite query plan')
+        db.session.add_all(make_records(100))
+        db.session.commit()
+
+        query = PaymentRecord.query
+        bound = 'created_at<?'
+        if campaign:
+            query = query.filter(PaymentRecord.campaign == campaign)
+            bound = 'campaign=? AND created_at<?'
+        for plan in _deep_page_plans(app, query, PaymentRecord):
+            assert 'SEARCH payment_record USING INDEX' in plan and f'({bound})' in plan, plan
+
+def test_deep_queue_pages_search_the_index(app, disputes):
+    from app import db
+    from app.models import Dispute
+
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            pytest.skip('checks the SQLite query plan')
+        plans = _deep_page_plans(app, Dispute.query.filter(Dispute.status == 'pending'), Dispute,
+                                 sort='validated_at', descending=False)
+        assert plans
+        for plan in plans:
+            assert 'SEARCH dispute USING INDEX ix_dispute_status_validated_at (status=? AND validated_at>?)' in plan, plan
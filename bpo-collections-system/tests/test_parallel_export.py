@@ -0,0 +1,91 @@
+import openpyxl
+import pytest
+
+from conftest import make_records
+
+@pytest.fixture
+def records(app):
+    from app import db
+
+    app.config.update(EXPORT_PARALLEL_MIN_ROWS=0, EXPORT_PART_ROWS=3)
+    with app.app_context():
+        db.session.add_all(make_records(30))
+        db.session.commit()
+
+def _sheets(path):
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return {sheet.title: [row for row in sheet.iter_rows(values_only=True)] for sheet in workbook.worksheets}
+    finally:
+        workbook.close()
+
+def _delete_after_planning(monkeypatch, times):
+    """Delete one exported record right after each of the first `times` plans"""
+    from app import db
+    from app.models import PaymentRecord
+    from app.utils import parallel_export
+
+    plan_parts = parallel_export._plan_parts
+    plans = []
+
+    def plan_then_delete(*args):
+        parts = plan_parts(*args)
+        plans.append(parts)
+        if len(plans) <= times:
+            db.session.delete(PaymentRecord.query.order_by(PaymentRecord.id).first())
+            db.session.commit()
+        return parts
+
+    monkeypatch.setattr(parallel_export, '_plan_parts', plan_then_delete)
+    return plans
+
+def test_parallel_export_matches_in_process_export(app, records):
+    from app.utils.export_helpers import export_campaign_data
+
+    with app.app_context():
+        parallel_path, _, parallel_count = export_campaign_data(processes=2)
+        path, _, count = export_campaign_data(processes=0)
+
+    assert parallel_count == count == 30
+    assert _sheets(parallel_path) == _sheets(path)
+
+def test_worker_engines_get_the_sqlite_pragmas(app, monkeypatch):
+    from app import db
+    from app.utils import parallel_export
+
+    monkeypatch.setattr(parallel_export, '_engines', {})
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            assert parallel_export.worker_connection_settings() == ({}, [])
+            return
+        database = (parallel_export.worker_database_url(),) + parallel_export.worker_connection_settings()
+        engine = parallel_export._engine(*database)
+        try:
+            with engine.connect() as connection:
+                assert connection.exec_driver_sql('PRAGMA busy_timeout').scalar() == 5000
+                assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        finally:
+            engine.dispose()
+
+def test_parts_changed_after_planning_are_rendered_again(app, records, monkeypatch):
+    from app.utils.export_helpers import export_campaign_data
+
+    plans = _delete_after_planning(monkeypatch, times=1)
+    with app.app_context():
+        path, _, count = export_campaign_data(processes=2)
+
+    assert len(plans) == 2
+    assert count == 29
+    summary = _sheets(path)['Summary']
+    assert len(summary) == 30
+    assert 'LN0000000' not in [row[0] for row in summary]
+
+def test_export_fails_when_data_keeps_changing(app, records, monkeypatch):
+    from app.utils import parallel_export
+    from app.utils.export_helpers import export_campaign_data
+
+    plans = _delete_after_planning(monkeypatch, times=parallel_export.RENDER_ATTEMPTS)
+    with app.app_context():
+        with pytest.raises(parallel_export.ExportDataChanged):
+            export_campaign_data(processes=2)
+    assert len(plans) == parallel_export.RENDER_ATTEMPTS
@@ -0,0 +1,38 @@
+import os
+from types import SimpleNamespace
+
+def _proof(app, content, name='receipt.png'):
+    """A proof of an uploaded file, without a database row"""
+    relative_path = os.path.join('uploads', name)
+    path = os.path.join(app.root_path, '..', relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return SimpleNamespace(id=1, content_hash='ab' * 32, file_path=relative_path)
+
+def test_failed_preview_is_not_rendered_again(app, monkeypatch):
+    from app.utils import previews
+
+    renders = []
+    render_preview = previews.render_preview
+
+    def counted(source_path, target_path):
+        renders.append(source_path)
+        return render_preview(source_path, target_path)
+
+    monkeypatch.setattr(previews, 'render_preview', counted)
+    with app.app_context():
+        proof = _proof(app, b'not an image')
+        assert previews.get_proof_preview(proof) is None
+        assert previews.get_proof_preview(proof) is None
+        assert len(renders) == 1
+
+        # Tried again once the retry period is over
+        marker = previews.preview_path(proof.content_hash) + '.failed'
+        then = os.path.getmtime(marker) - previews.PREVIEW_RETRY_SECONDS - 1
+        os.utime(marker, (then, then))
+        assert previews.get_proof_preview(proof) is None
+        assert len(renders) == 2
+
+        previews.remove_preview(proof.content_hash)
+        assert not os.path.exists(marker)
@@ -0,0 +1,94 @@
+import io
+import os
+import time
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from conftest import make_records
+
+def _upload(content, filename='receipt.png'):
+    return FileStorage(stream=io.BytesIO(content), filename=filename)
+
+def _age(app, relative_path, seconds):
+    """Make a stored blob look untouched for seconds"""
+    path = os.path.join(app.root_path, '..', relative_path)
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+def _stored(app, relative_path):
+    return os.path.exists(os.path.join(app.root_path, '..', relative_path))
+
+def test_failed_upload_leaves_no_temp_file(app):
+    from app.utils.file_helpers import proofs_root, store_proof_file
+
+    class Broken(io.BytesIO):
+        def read(self, size=-1):
+            raise OSError('connection reset')
+
+    with app.app_context():
+        with pytest.raises(OSError):
+            store_proof_file(FileStorage(stream=Broken(), filename='receipt.png'))
+        assert not [name for name in os.listdir(proofs_root()) if name.startswith('.upload-')]
+
+def test_released_blob_is_kept_through_grace_period(app):
+    from app import db
+    from app.models import PaymentProof
+    from app.utils.file_helpers import store_proof_file
+
+    with app.app_context():
+        record = make_records(1)[0]
+        db.session.add(record)
+        db.session.flush()
+        path, content_hash = store_proof_file(_upload(b'receipt'))
+        proof = PaymentProof(payment_id=record.id, file_path=path, file_type='receipt', content_hash=content_hash)
+        db.session.add(proof)
+        db.session.commit()
+
+        # Deleted right after upload: another upload may still be committing a reference to it
+        db.session.delete(proof)
+        db.session.commit()
+        assert _stored(app, path)
+
+        _age(app, path, 7200)
+        db.session.add(PaymentProof(payment_id=record.id, file_path=path, file_type='receipt',
+                                    content_hash=content_hash))
+        db.session.commit()
+        db.session.delete(PaymentProof.query.one())
+        db.session.commit()
+        assert not _stored(app, path)
+
+def test_reused_blob_survives_release(app):
+    from app.utils.file_helpers import release_proof_blobs, store_proof_file
+
+    with app.app_context():
+        path, content_hash = store_proof_file(_upload(b'shared'))
+        _age(app, path, 7200)
+        # Deduplicated onto the old blob, its PaymentProof row not yet committed
+        assert store_proof_file(_upload(b'shared')) == (path, content_hash)
+        assert release_proof_blobs([content_hash]) == 0
+        assert _stored(app, path)
+
+def test_sweep_deletes_only_idle_unreferenced_blobs(app):
+    from app import db
+    from app.models import PaymentProof
+    from app.utils.file_helpers import store_proof_file, sweep_proof_blobs
+
+    with app.app_context():
+        record = make_records(1)[0]
+        db.session.add(record)
+        db.session.flush()
+        kept, kept_hash = store_proof_file(_upload(b'kept'))
+        db.session.add(PaymentProof(payment_id=record.id, file_path=kept, file_type='receipt',
+                                    content_hash=kept_hash))
+        db.session.commit()
+        # Stored, then the transaction adding its row rolled back
+        orphan, _ = store_proof_file(_upload(b'orphan'))
+        recent, _ = store_proof_file(_upload(b'recent'))
+        for path in (kept, orphan):
+            _age(app, path, 7200)
+
+        assert sweep_proof_blobs() == 1
+        assert _stored(app, kept)
+        assert not _stored(app, orphan)
+        assert _stored(app, recent)
@@ -0,0 +1,132 @@
+"""
+The query budgets of benchmarks/check_query_counts.py as tests.
+
+Every page, API endpoint and form post is run on seeded data and again on ten
+times as much. It fails if it ran more queries the second time (a query per
+row) or more than its budget.
+"""
+import io
+import random
+
+import pytest
+
+from benchmarks.check_query_counts import ENDPOINTS, count_dispute_export, seed
+
+ROWS = 20
+SCALE = 10
+
+def _png(name):
+    from PIL import Image
+
+    stream = io.BytesIO()
+    Image.new('RGB', (4, 4), 'white').save(stream, 'PNG')
+    stream.seek(0)
+    return stream, name
+
+def _ids(status, count):
+    from app.models import Dispute
+
+    return [dispute.id for dispute in Dispute.query.filter_by(status=status).order_by(Dispute.id).limit(count)]
+
+def _latest_loans(count):
+    from app.models import PaymentRecord
+
+    return [record.loan_id for record in PaymentRecord.query.order_by(PaymentRecord.id.desc()).limit(count)]
+
+def _csv(rows, start):
+    lines = ['campaign,dpd,loan_id,amount,date_paid,operator_name,customer_name']
+    lines += [f'TALA,{i % 90 + 1},LNI{i:07d},{100 + i},2025-08-{i % 28 + 1:02d},HOUSE_{i % 20},Customer {i}'
+              for i in range(start, start + rows)]
+    return io.BytesIO('\n'.join(lines).encode()), 'payments.csv'
+
+# (role, name, most queries allowed, builds (method, url, request keyword arguments) for a post of `size`
+# disputes or rows where the form takes a list); ten times the data is also ten times the list
+POSTS = [
+    ('team_leader', 'bulk approve', 4, lambda size: ('POST', '/team-leader/dispute-validation', {
+        'data': {'dispute_ids': _ids('pending', size), 'action': 'approve'}})),
+    ('team_leader', 'bulk reject', 4, lambda size: ('POST', '/team-leader/dispute-validation', {
+        'data': {'dispute_ids': _ids('pending', size), 'action': 'reject'}})),
+    ('data_analyst', 'bulk verify', 10, lambda size: ('POST', '/data-analyst/dispute-review', {
+        'data': {'dispute_ids': _ids('pending_da_review', size), 'action': 'approve'}})),
+    ('team_leader', 'create dispute', 4, lambda size: ('POST', '/team-leader/create-dispute', {
+        'data': {'entry_id': 1, 'reason': 'wrong_amount', 'corrected_amount': '99.5'}})),
+    ('team_leader', 'payment import', 4, lambda size: ('POST', '/team-leader/import-payments', {
+        'data': {'import_file': _csv(size, size * 1000)}, 'content_type': 'multipart/form-data'})),
+    ('team_leader', 'data entry with proofs', 5, lambda size: ('POST', '/team-leader/data-entry', {
+        'data': {'campaign': 'TALA', 'dpd': '5', 'loan_id': f'LNE{size:07d}', 'amount': '250',
+                 'date_paid': '2025-08-10', 'operator_name': 'HOUSE_1', 'customer_name': 'Customer E',
+                 'proof_types': 'receipt', 'proof_images': [_png('a.png'), _png('b.png')]},
+        'content_type': 'multipart/form-data'})),
+    ('team_leader', 'attach proofs', 5, lambda size: ('POST', '/team-leader/attach-proofs', {
+        'data': {'proofs-proof_types': 'receipt',
+                 'proofs-proof_images': [_png(f'{loan_id}_receipt.png') for loan_id in _latest_loans(2)]},
+        'content_type': 'multipart/form-data'})),
+    ('team_leader', 'API proofs batch', 5, lambda size: ('POST', '/api/v1/proofs/batch', {
+        'data': {'proof_type': 'receipt',
+                 'files': [_png(f'{loan_id}_receipt.png') for loan_id in _latest_loans(2)]},
+        'content_type': 'multipart/form-data'})),
+]
+
+@pytest.fixture
+def grow(app):
+    """grow(rows) seeds rows more payments, with proofs, disputes, duplicates and exports in proportion"""
+    from app import db
+
+    random.seed(0)
+
+    def grow(rows):
+        with app.app_context():
+            seed(db, rows)
+
+    return grow
+
+def _query_count(client, method, url, **kwargs):
+    response = client.open(url, method=method, **kwargs)
+    assert response.status_code < 400, response.get_data(as_text=True)[:500]
+    return int(response.headers['X-Query-Count'])
+
+def _post_query_count(client, method, url, **kwargs):
+    """Like _query_count, for a post that must not have failed: no error flashed, or shown on the page"""
+    response = client.open(url, method=method, **kwargs)
+    assert response.status_code < 400, response.get_data(as_text=True)[:500]
+    assert b'alert-danger' not in response.data
+    with client.session_transaction() as session:
+        errors = [message for category, message in session.pop('_flashes', []) if category == 'danger']
+    assert not errors
+    return int(response.headers['X-Query-Count'])
+
+@pytest.mark.parametrize('role,method,url,budget', ENDPOINTS, ids=[f'{method} {url}' for _, method, url, _ in ENDPOINTS])
+def test_endpoint_query_budget(app, login, grow, role, method, url, budget):
+    grow(ROWS)
+    client = login(role)
+    before = _query_count(client, method, url)
+    grow(ROWS * (SCALE - 1))
+    after = _query_count(client, method, url)
+
+    assert after <= before, f'{method} {url} ran {before} queries on {ROWS} records, {after} on {ROWS * SCALE}'
+    assert after <= budget
+
+@pytest.mark.parametrize('role,name,budget,build', POSTS, ids=[name for _, name, _, _ in POSTS])
+def test_post_query_budget(app, login, grow, role, name, budget, build):
+    client = login(role)
+    counts = []
+    for rows, size in ((ROWS, 2), (ROWS * (SCALE - 1), 2 * SCALE)):
+        grow(rows)
+        with app.test_request_context():
+            method, url, kwargs = build(size)
+        counts.append(_post_query_count(client, method, url, **kwargs))
+
+    before, after = counts
+    assert after <= before, f'{name} ran {before} queries on {ROWS} records, {after} on {ROWS * SCALE}'
+    assert after <= budget
+
+def test_dispute_export_query_budget(app, grow):
+    from app import db
+
+    grow(ROWS)
+    before = count_dispute_export(app, db)
+    grow(ROWS * (SCALE - 1))
+    after = count_dispute_export(app, db)
+
+    assert after <= before
+    assert after <= 2
@@ -0,0 +1,50 @@
+import io
+
+from sqlalchemy import event
+
+def _roster(operators, status='ACTIVE'):
+    lines = ['OPERATOR,STATUS,NAME,GROUP']
+    lines += [f'HOUSE_{i},{status},Operator {i},GROUP {i % 3}' for i in range(operators)]
+    return io.BytesIO('\n'.join(lines).encode())
+
+def _import(app, stream, month):
+    """(RosterImportResult, statements run) for one roster import"""
+    from app import db
+    from app.utils.roster import import_roster
+
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            result = import_roster(stream, 'roster.csv', month=month)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+    return result, len(statements)
+
+def test_roster_import_runs_a_fixed_number_of_queries(app):
+    from app.models import Operator
+
+    # New operators, then mostly new ones, then only updates: the roster is read
+    # once and the inserts and updates each go in one executemany
+    counts = []
+    for operators, month in ((20, '2025-08'), (200, '2025-09'), (200, '2025-10')):
+        result, count = _import(app, _roster(operators), month)
+        counts.append(count)
+    assert (result.added, result.updated) == (0, 200)
+    assert max(counts) <= 3, counts
+
+    with app.app_context():
+        assert Operator.query.filter_by(roster_month='2025-10', status='ACTIVE').count() == 200
+
+def test_roster_import_marks_missing_operators_inactive(app):
+    from app.models import Operator
+
+    _import(app, _roster(5), '2025-08')
+    result, _ = _import(app, _roster(3), '2025-09')
+    assert (result.added, result.updated, result.deactivated) == (0, 3, 2)
+    with app.app_context():
+        assert Operator.query.filter_by(status='INACTIVE').count() == 2
@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import create_engine
+
+def _pragmas(engine):
+    with engine.connect() as connection:
+        return (connection.exec_driver_sql('PRAGMA journal_mode').scalar(),
+                connection.exec_driver_sql('PRAGMA cache_size').scalar())
+
+@pytest.fixture
+def sqlite_app(app):
+    from app import db
+
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            pytest.skip('tunes SQLite only')
+    return app
+
+def test_pragmas_apply_to_the_app_engine_only(sqlite_app, tmp_path):
+    from app import db
+
+    with sqlite_app.app_context():
+        assert _pragmas(db.engine) == ('wal', -20000)
+
+    other = create_engine('sqlite:///' + str(tmp_path / 'scratch.db'))
+    try:
+        assert _pragmas(other) == ('delete', -2000)
+    finally:
+        other.dispose()
+
+def test_maintenance_thread_only_starts_when_asked(sqlite_app):
+    from app.utils.sqlite_tuning import start_sqlite_maintenance
+
+    assert 'sqlite_maintenance' not in sqlite_app.extensions
+    sqlite_app.config['SQLITE_MAINTENANCE_INTERVAL'] = 600
+    start_sqlite_maintenance(sqlite_app)
+    try:
+        assert 'sqlite_maintenance' in sqlite_app.extensions
+    finally:
+        sqlite_app.extensions.pop('sqlite_maintenance').set()
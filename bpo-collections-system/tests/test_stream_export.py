@@ -0,0 +1,35 @@
+import pytest
+
+from conftest import make_records
+
+URL = '/data-analyst/export-data/stream?export_type=campaign&export_format=csv&include_headers=y'
+
+@pytest.fixture
+def records(app):
+    from app import db
+
+    with app.app_context():
+        db.session.add_all(make_records(14))
+        db.session.commit()
+
+def _history(app):
+    from app.models import ExportHistory
+
+    with app.app_context():
+        return [(job.status, job.record_count) for job in ExportHistory.query.all()]
+
+def test_streamed_export_is_logged(app, login, records):
+    response = login('data_analyst').get(URL)
+    assert response.status_code == 200
+    assert len(response.get_data(as_text=True).splitlines()) == 15
+    assert _history(app) == [('completed', 14)]
+
+def test_head_request_leaves_no_history(app, login, records):
+    response = login('data_analyst').head(URL)
+    assert response.status_code == 200
+    assert _history(app) == []
+
+def test_dropped_download_is_marked_failed(app, login, records):
+    response = login('data_analyst').get(URL, buffered=False)
+    response.close()
+    assert _history(app) == [('failed', 0)]